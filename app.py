@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 import sys
 import os
 
@@ -13,6 +13,31 @@ if scrapers_path not in sys.path:
 
 # Import the scraper manager
 from scraper_manager import scrape_car
+import parse_pool
+import deadline
+import provenance
+
+# Run HTML extraction in worker processes so parsing scales with cores.
+# PARSE_WORKERS=0 keeps extraction inline in the request thread.
+parse_pool.configure(int(os.environ.get('PARSE_WORKERS', os.cpu_count() or 1)))
+
+# With SCRAPE_BROKER set (e.g. redis://localhost:6379/0), /scrape hands jobs
+# to the scrape_worker.py fleet instead of scraping in this process.
+broker = None
+if os.environ.get('SCRAPE_BROKER'):
+    import scrape_broker
+    broker = scrape_broker.connect(os.environ['SCRAPE_BROKER'])
+SCRAPE_TIMEOUT = float(os.environ.get('SCRAPE_TIMEOUT', 120))
+
+# With SCRAPER_UPSTREAM set (e.g. http://127.0.0.1:8900), requests to the listing
+# sites go to a fake_upstream.py stand-in instead (load testing).
+if os.environ.get('SCRAPER_UPSTREAM'):
+    import fake_upstream
+    fake_upstream.route(os.environ['SCRAPER_UPSTREAM'])
+
+# /export limits: URLs per request and scrapes in flight for one export
+EXPORT_MAX_URLS = int(os.environ.get('EXPORT_MAX_URLS', 200))
+EXPORT_CONCURRENCY = int(os.environ.get('EXPORT_CONCURRENCY', 4))
 
 app = Flask(__name__)
 
@@ -37,6 +62,34 @@ def scrape_endpoint():
                 'error': 'Invalid URL format. URL must start with http:// or https://'
             }), 400
         
+        # Optional time budget: the best result found within budget_ms is returned
+        budget_ms = request.args.get('budget_ms')
+        if budget_ms is not None:
+            try:
+                budget_ms = int(budget_ms)
+                if budget_ms <= 0:
+                    raise ValueError
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': 'budget_ms must be a positive integer (milliseconds)'
+                }), 400
+        
+        # Optional early mode: answer once Title, Price, Mileage and VIN are found,
+        # skipping the image/feature passes unless listed in include
+        early = request.args.get('early', '').lower() in ('1', 'true', 'yes')
+        include = tuple(part.strip() for part in request.args.get('include', '').split(',') if part.strip())
+        unknown = [part for part in include if part not in provenance.OPTIONAL_PASSES]
+        if unknown:
+            return jsonify({
+                'success': False,
+                'error': f"include may only list {', '.join(provenance.OPTIONAL_PASSES)}"
+            }), 400
+        
+        # Optional projection, e.g. fields=Price,Mileage: only those fields are
+        # extracted and returned (plus URL)
+        fields = provenance.parse_fields(request.args.get('fields'))
+        
         # Check if URL contains car data instead of being a proper URL
         if any(keyword in url.lower() for keyword in ['odometer', 'colour', 'transmission', 'engine', 'body', 'features', 'details', 'build year', 'compliance', 'make:', 'model:', 'vin']):
             return jsonify({
@@ -48,13 +101,35 @@ def scrape_endpoint():
         
         # Call your real scraper function with better error handling
         try:
-            car_data = scrape_car(url)
+            if broker is not None:
+                # Leave the worker a moment past the budget to post its result
+                timeout = SCRAPE_TIMEOUT if budget_ms is None else min(SCRAPE_TIMEOUT, budget_ms / 1000 + 2)
+                job = broker.wait(broker.submit(url, budget_ms=budget_ms), timeout=timeout)
+                if job is None:
+                    return jsonify({
+                        'success': False,
+                        'error': f'Scraping timed out after {timeout:.0f}s'
+                    }), 504
+                if job['status'] != 'done':
+                    raise Exception(job['error'])
+                car_data = provenance.project(job['data'], fields)
+                partial = job['partial']
+                sources = None
+            else:
+                with deadline.budget(budget_ms) as active, provenance.trace(early, include, only=fields) as trace:
+                    car_data = scrape_car(url)
+                partial = bool(active and active.skipped)
+                sources = trace.for_data(car_data)
             print(f"✅ Scraping successful: {len(car_data)} fields")
             
-            return jsonify({
+            response = {
                 'success': True,
+                'partial': partial,
                 'data': car_data
-            })
+            }
+            if sources is not None:
+                response['provenance'] = sources
+            return jsonify(response)
             
         except Exception as scraper_error:
             print(f"❌ Scraper error: {str(scraper_error)}")
@@ -70,6 +145,93 @@ def scrape_endpoint():
             'error': f'Server error: {str(e)}'
         }), 500
 
+@app.route('/export', methods=['POST'])
+def export_endpoint():
+    """
+    Scrape a batch of URLs (or take already-scraped results) and return them
+    as one Parquet or Arrow file
+
+    JSON body: {"urls": [...]} and/or {"results": [...]}, optional
+    "format": "parquet" (default) or "arrow". URLs that fail to scrape (or
+    time out on the broker) are left out; X-Export-Failed counts them.
+    """
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+    try:
+        import columnar_export
+        from bulk_scrape import scrape_one
+    except ImportError as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    body = request.get_json(silent=True) or {}
+    urls = body.get('urls') or []
+    results = list(body.get('results') or [])
+    fmt = body.get('format', request.args.get('format', 'parquet'))
+    
+    if fmt not in columnar_export.FORMATS:
+        return jsonify({
+            'success': False,
+            'error': f"format must be one of {', '.join(columnar_export.FORMATS)}"
+        }), 400
+    if not isinstance(urls, list) or not all(isinstance(url, str) and url.startswith(('http://', 'https://')) for url in urls):
+        return jsonify({
+            'success': False,
+            'error': 'urls must be a list of http(s) URLs'
+        }), 400
+    if not all(isinstance(item, dict) for item in results):
+        return jsonify({
+            'success': False,
+            'error': 'results must be a list of scraped car objects'
+        }), 400
+    if not urls and not results:
+        return jsonify({
+            'success': False,
+            'error': 'Provide urls to scrape or results to convert'
+        }), 400
+    if len(urls) > EXPORT_MAX_URLS:
+        return jsonify({
+            'success': False,
+            'error': f'At most {EXPORT_MAX_URLS} URLs per export (use bulk_scrape.py --export for more)'
+        }), 400
+    
+    print(f"📦 Exporting {len(urls)} URLs and {len(results)} results as {fmt}")
+    failed = []
+    if urls:
+        if broker is not None:
+            jobs = [broker.submit(url) for url in urls]
+            for url, job_id in zip(urls, jobs):
+                job = broker.wait(job_id, timeout=SCRAPE_TIMEOUT)
+                if job is not None and job['status'] == 'done':
+                    results.append(job['data'])
+                else:
+                    failed.append(url)
+        else:
+            with ThreadPoolExecutor(EXPORT_CONCURRENCY) as pool:
+                for line in pool.map(scrape_one, urls):
+                    results.append(line)
+                    if not line['success']:
+                        failed.append(line['url'])
+        if failed:
+            print(f"⚠️ {len(failed)} of {len(urls)} URLs failed or timed out, left out of the export")
+    
+    buffer = io.BytesIO()
+    try:
+        rows = columnar_export.export(results, buffer, fmt)
+    except ImportError as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    except columnar_export.pa.ArrowException as e:
+        return jsonify({
+            'success': False,
+            'error': f'Could not convert the results to {fmt}: {str(e)}'
+        }), 422
+    
+    mimetype = 'application/vnd.apache.parquet' if fmt == 'parquet' else 'application/vnd.apache.arrow.file'
+    return Response(buffer.getvalue(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=cars.{fmt}',
+        'X-Export-Rows': str(rows),
+        'X-Export-Failed': str(len(failed)),
+    })
+
 @app.route('/sites', methods=['GET'])
 def get_sites():
     """
@@ -88,6 +250,23 @@ def get_sites():
         'sites': {site: site_info.get(site, site) for site in sites}
     })
 
+@app.route('/workers', methods=['GET'])
+def get_workers():
+    """
+    Job counts and per-worker stats of the scrape fleet
+    """
+    if broker is None:
+        return jsonify({
+            'success': False,
+            'error': 'No worker fleet configured (set SCRAPE_BROKER)'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'jobs': broker.counts(),
+        'workers': broker.workers()
+    })
+
 @app.route('/', methods=['GET'])
 def home():
     """
@@ -100,8 +279,10 @@ def home():
         'message': 'Car Scraper API',
         'supported_sites': sites,
         'endpoints': {
-            '/scrape': 'GET /scrape?url=<car-url> - Scrape car data',
-            '/sites': 'GET /sites - List supported websites'
+            '/scrape': 'GET /scrape?url=<car-url>[&budget_ms=<ms>][&early=1][&include=images,features][&fields=Price,Mileage] - Scrape car data (partial: true if the budget cut it short; provenance: tier/selector/cost/confidence per field)',
+            '/export': 'POST /export {"urls": [...], "format": "parquet"|"arrow"} - Scrape a batch and download it as a columnar file',
+            '/sites': 'GET /sites - List supported websites',
+            '/workers': 'GET /workers - Scrape fleet stats (when SCRAPE_BROKER is set)'
         },
         'example': 'http://127.0.0.1:5000/scrape?url=https://www.cars.com/vehicledetail/example/'
     })
@@ -110,4 +291,4 @@ if __name__ == '__main__':
     print("🚀 Starting Car Scraper API...")
     print("📍 API available at: http://127.0.0.1:5000")
     print("🔍 Using REAL scraper from cars_com.py")
-    app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='127.0.0.1', port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Vectorized normalization of bulk scrape results
+
+Turns a batch of scraper dicts into typed Arrow columns in one pass per
+column, using Arrow's compute kernels (C++ regex, casts and arithmetic)
+instead of a Python regex per record:
+
+- price: decimal(12, 2), with a currency column (AUD/USD written in the
+  text, otherwise the site's currency: Manheim AUD, cars.com/Carfax USD)
+- odometer_km: int64, "32,000 miles" converted from miles, "45,000 KM" as is
+- year: int16, from Year or, failing that, the first 19xx/20xx in Title
+
+Values that are missing, "N/A" or unparseable come out as nulls.
+
+    table = normalize(results)               # pyarrow.Table
+    columns = to_numpy(table)                # {'price': float64 array, ...}
+
+    python batch_normalize.py results.jsonl  # summary of a bulk_scrape output
+
+Needs pyarrow (and numpy for to_numpy): pip install pyarrow numpy
+"""
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+MILES_TO_KM = 1.609344
+
+PRICE_TYPE = None if pa is None else pa.decimal128(12, 2)
+
+# Whole-number digits that fit PRICE_TYPE; longer prices come out as nulls
+PRICE_DIGITS = 10
+
+# Odometer readings above this (km) are typos or phone numbers, not distances
+MAX_ODOMETER_KM = 10_000_000
+
+# Currencies recognised in price text; anything else falls back to the site's
+CURRENCIES = ('AUD', 'USD', 'SAR', 'EUR', 'GBP')
+
+# (URL substring, currency of a bare "$") per site
+SITE_CURRENCY = (
+    ('manheim.com.au', 'AUD'),
+    ('cars.com', 'USD'),
+    ('carfax.com', 'USD'),
+)
+
+_NUMBER = r'(?P<number>\d[\d,]*(?:\.\d+)?)'
+
+def _require_arrow():
+    if pa is None:
+        raise ImportError("Batch normalization needs pyarrow: pip install pyarrow")
+
+def unwrap(results: list) -> list:
+    """The data dicts of a batch: bulk_scrape lines are unwrapped, failures dropped"""
+    batch = []
+    for item in results:
+        if 'success' in item:
+            if not item['success'] or not item.get('data'):
+                continue
+            item = item['data']
+        batch.append(item)
+    return batch
+
+def _scraped(item: dict) -> dict:
+    """A scraper dict as is, or the display fields of a CarRecord dict"""
+    if 'URL' not in item and 'url' in item:
+        # CarRecord.to_dict() output: rebuild the display strings it came from
+        unit = 'KM' if item.get('mileage_unit') == 'km' else 'miles'
+        return {
+            'URL': item['url'],
+            'Title': item.get('title'),
+            'Price': f"{item['price']} {item.get('currency') or ''}" if item.get('price') else None,
+            'Mileage': f"{item['mileage']} {unit}" if item.get('mileage') is not None else None,
+            'Year': item.get('year'),
+        }
+    return item
+
+def string_column(batch: list, key: str):
+    """One string column, with N/A and empty values as nulls"""
+    values = [item.get(key) for item in batch]
+    try:
+        column = pa.array(values, pa.string())
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # Mixed types (e.g. Year as int in some records): stringify the odd ones
+        column = pa.array([None if value is None or isinstance(value, (list, dict)) else str(value)
+                           for value in values], pa.string())
+    blank = pc.or_(pc.equal(pc.utf8_trim_whitespace(column), ''), pc.equal(column, 'N/A'))
+    return pc.if_else(blank, pa.scalar(None, pa.string()), column)
+
+def _first_number(column):
+    """First number in each string ("$22,500" -> "22500"), null when there is none"""
+    number = pc.struct_field(pc.extract_regex(column, _NUMBER), [0])
+    return pc.replace_substring(number, ',', '')
+
+def _decimal_prices(numbers):
+    """
+    Digit strings ("22500.555") as PRICE_TYPE, rounded half up to cents
+
+    Cast from the digits rather than through float64, so nothing is lost on
+    the way; prices too large for PRICE_TYPE become nulls instead of raising.
+    """
+    parts = pc.extract_regex(numbers, r'^0*(?P<whole>\d*?)(?:\.(?P<fraction>\d*))?$')
+    whole, fraction = pc.struct_field(parts, [0]), pc.struct_field(parts, [1])
+    whole = pc.if_else(pc.equal(whole, ''), '0', whole)
+    # Three decimals are enough to round to cents
+    fraction = pc.utf8_slice_codeunits(pc.binary_join_element_wise(fraction, '000', ''), 0, 3)
+    digits = pc.binary_join_element_wise(whole, fraction, '.')
+    digits = pc.if_else(pc.less_equal(pc.utf8_length(whole), PRICE_DIGITS), digits, pa.scalar(None, pa.string()))
+    wide = pa.decimal128(PRICE_DIGITS + 4, 3)
+    price = pc.round(pc.cast(digits, wide), 2, round_mode='half_up')
+    # Rounding can carry 9999999999.995 past the largest PRICE_TYPE value
+    fits = pc.less(price, pc.cast(pa.scalar('1' + '0' * PRICE_DIGITS), wide))
+    return pc.cast(pc.if_else(fits, price, pa.scalar(None, wide)), PRICE_TYPE)
+
+def parse_prices(prices, urls):
+    """
+    Vectorized price parsing
+
+    Returns:
+        tuple: (decimal128 price array, string currency array)
+    """
+    price = _decimal_prices(_first_number(prices))
+
+    upper = pc.utf8_upper(prices)
+    currency = pa.nulls(len(prices), pa.string())
+    for code in reversed(CURRENCIES):
+        currency = pc.if_else(pc.match_substring(upper, code), code, currency)
+
+    site_currency = pa.nulls(len(urls), pa.string())
+    for site, code in SITE_CURRENCY:
+        site_currency = pc.if_else(pc.match_substring(urls, site), code, site_currency)
+
+    currency = pc.coalesce(currency, site_currency)
+    currency = pc.if_else(pc.is_null(price), pa.scalar(None, pa.string()), currency)
+    return price, currency
+
+def parse_odometer_km(mileages):
+    """Vectorized odometer parsing into whole kilometres (int64)"""
+    distance = pc.cast(_first_number(mileages), pa.float64())
+    in_km = pc.match_substring_regex(mileages, r'(?i)\bkms?\b|kilomet')
+    km = pc.round(pc.if_else(in_km, distance, pc.multiply(distance, MILES_TO_KM)))
+    km = pc.if_else(pc.less_equal(km, MAX_ODOMETER_KM), km, pa.scalar(None, pa.float64()))
+    return pc.cast(km, pa.int64())
+
+def parse_years(years, titles):
+    """Vectorized model year (int16): the Year field, else the first year in the title"""
+    def year_of(column):
+        found = pc.struct_field(pc.extract_regex(column, r'(?P<year>\b(?:19|20)\d{2}\b)'), [0])
+        return pc.cast(found, pa.int16())
+    return pc.coalesce(year_of(years), year_of(titles))
+
+def normalize(results: list):
+    """
+    Normalize a batch of scrape results into typed columns
+
+    Args:
+        results (list): Scraper dicts, bulk_scrape result lines ({'url',
+            'success', 'data'}; failures are skipped) or CarRecord dicts
+
+    Returns:
+        pyarrow.Table: url, price, currency, odometer_km, year
+    """
+    _require_arrow()
+    batch = [_scraped(item) for item in unwrap(results)]
+
+    urls = string_column(batch, 'URL')
+    price, currency = parse_prices(string_column(batch, 'Price'), urls)
+    return pa.table({
+        'url': urls,
+        'price': price,
+        'currency': currency,
+        'odometer_km': parse_odometer_km(string_column(batch, 'Mileage')),
+        'year': parse_years(string_column(batch, 'Year'), string_column(batch, 'Title')),
+    })
+
+def to_numpy(table) -> dict:
+    """
+    NumPy columns of a normalized table
+
+    Returns:
+        dict: price/odometer_km/year as float64 (NaN for missing), url and
+        currency as object arrays
+    """
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if pa.types.is_decimal(column.type) or pa.types.is_integer(column.type):
+            column = pc.cast(column, pa.float64())
+        columns[name] = column.to_numpy(zero_copy_only=False)
+    return columns
+
+def read_jsonl(path: str) -> list:
+    """Load a bulk_scrape output file"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normalize bulk scrape results into typed columns")
+    parser.add_argument('results', help="JSONL output of bulk_scrape.py")
+    args = parser.parse_args(argv)
+
+    table = normalize(read_jsonl(args.results))
+    print(f"📊 {table.num_rows} listings")
+    for name in ('price', 'odometer_km', 'year'):
+        column = table.column(name)
+        print(f"   {name}: {table.num_rows - column.null_count} parsed, "
+              f"min {pc.min(column).as_py()}, max {pc.max(column).as_py()}")
+    print(f"   currencies: {pc.value_counts(table.column('currency')).to_pylist()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Extractor benchmarks on recorded listing pages
+
+Replays the saved pages in fixtures/<site>/ through each site's extractor
+and its scrape entry point, with the network stubbed out (every request
+is answered from the fixtures, nothing leaves the machine), and reports
+per page:
+
+- parse ms: the BeautifulSoup parse inside the extractor
+- extract ms: the rest of the extractor (extract_car_data / parse_page);
+  both are timed within the same call, so neither is the difference of two
+  separately noisy medians
+- scrape ms: the scrape entry point end to end (scrape_car_real,
+  manheim.scrape_car, carfax.scrape_car), rate limits and retries included
+- peak KB / blocks: tracemalloc peak and live allocations of one extraction
+- accuracy: fields equal to the page's expected values (<name>.json)
+
+    python benchmark.py                        # every fixture, summary per site
+    python benchmark.py --site carfax.com -n 50
+    python benchmark.py --save bench.json      # keep the report as a baseline
+    python benchmark.py --baseline bench.json  # exit 1 if slower or less accurate
+
+A fixture is <name>.html with <name>.json next to it:
+{"url": "<listing URL>", "expected": {"Field": "value", "Images": [...]}}.
+Timings are medians over -n runs after one warm-up run.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import statistics
+import tracemalloc
+import contextlib
+from unittest import mock
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import parse_pool
+import rate_limit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Site -> fixture folder, extractor module and its (extract, scrape) functions
+SITES = {
+    'cars.com': ('cars_com', 'cars_com.cars_com_real', 'extract_car_data', 'scrape_car_real'),
+    'manheim.com.au': ('manheim_com_au', 'manheim_com_au.manheim', 'extract_car_data', 'scrape_car'),
+    'carfax.com': ('carfax_com', 'carfax_com.carfax', 'parse_page', 'scrape_car'),
+}
+
+DEFAULT_RUNS = 20
+
+# A timing regresses when it is this much slower than the baseline (and 1 ms or more)
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_MS = 1.0
+
+def load_fixtures(site: str) -> list:
+    """(name, url, html bytes, expected fields) of every fixture of a site"""
+    folder = os.path.join(FIXTURES_DIR, SITES[site][0])
+    fixtures = []
+    for filename in sorted(os.listdir(folder)) if os.path.isdir(folder) else ():
+        if not filename.endswith('.html'):
+            continue
+        name = filename[:-len('.html')]
+        with open(os.path.join(folder, filename), 'rb') as f:
+            content = f.read()
+        with open(os.path.join(folder, name + '.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        fixtures.append((name, meta['url'], content, meta['expected']))
+    return fixtures
+
+@contextlib.contextmanager
+def stubbed_network(pages: dict):
+    """Answer every requests call from pages (URL -> bytes); anything else is a 404"""
+    def request(session, method, url, **kwargs):
+        response = requests.Response()
+        content = pages.get(url)
+        response.status_code = 200 if content is not None else 404
+        response._content = content if content is not None else b''
+        response.headers['Content-Type'] = 'text/html; charset=utf-8'
+        response.encoding = 'utf-8'
+        response.url = url
+        response.request = requests.Request(method, url).prepare()
+        return response
+
+    with mock.patch('requests.Session.request', request):
+        yield
+
+@contextlib.contextmanager
+def _quiet():
+    """The extractors print progress; keep it out of the report (and the timings' I/O)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def _normalize(value) -> str:
+    return ' '.join(str(value).split()).casefold()
+
+def _same(expected, actual) -> bool:
+    if isinstance(expected, list):
+        return isinstance(actual, list) and [_normalize(item) for item in expected] == [_normalize(item) for item in actual]
+    return _normalize(expected) == _normalize(actual)
+
+def accuracy(expected: dict, car_data) -> tuple:
+    """
+    Compare extracted fields with the expected ones
+
+    Returns:
+        tuple: (fields matched, fields expected, {field: (expected, actual)} of the misses)
+    """
+    misses = {}
+    for field, value in expected.items():
+        actual = (car_data or {}).get(field, 'N/A')
+        if not _same(value, actual):
+            misses[field] = (value, actual)
+    return len(expected) - len(misses), len(expected), misses
+
+def _median_ms(function, runs: int) -> float:
+    function()
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+def _phases_ms(module, extract, runs: int) -> tuple:
+    """
+    Median (parse ms, extract ms) of an extractor, split within each call
+
+    The module's BeautifulSoup is wrapped to time the parse, and the rest of
+    the same call counts as extraction.
+    """
+    parse_times = []
+    original = module.BeautifulSoup
+
+    def timed_soup(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            parse_times.append(time.perf_counter() - started)
+
+    parse, rest = [], []
+    with mock.patch.object(module, 'BeautifulSoup', timed_soup):
+        extract()
+        for _ in range(runs):
+            parse_times.clear()
+            started = time.perf_counter()
+            extract()
+            total = time.perf_counter() - started
+            parsed = sum(parse_times)
+            parse.append(parsed * 1000)
+            rest.append((total - parsed) * 1000)
+    return statistics.median(parse), statistics.median(rest)
+
+def _allocations(function) -> tuple:
+    """(peak KB, live blocks allocated) of one call"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return peak / 1024, blocks
+
+def bench_fixture(site: str, name: str, url: str, content: bytes, expected: dict, runs: int) -> dict:
+    """Measure one fixture; see the module docstring for the fields"""
+    _, module_name, extract_name, scrape_name = SITES[site]
+    module = importlib.import_module(module_name)
+    extract = getattr(module, extract_name)
+    scrape = getattr(module, scrape_name)
+
+    with _quiet(), stubbed_network({url: content}):
+        parse_ms, extract_ms = _phases_ms(module, lambda: extract(content, url), runs)
+        scrape_ms = _median_ms(lambda: scrape(url), runs)
+        peak_kb, blocks = _allocations(lambda: extract(content, url))
+        car_data = scrape(url)
+
+    matched, total, misses = accuracy(expected, car_data)
+    return {
+        'site': site,
+        'fixture': name,
+        'bytes': len(content),
+        'parse_ms': round(parse_ms, 3),
+        'extract_ms': round(extract_ms, 3),
+        'scrape_ms': round(scrape_ms, 3),
+        'peak_kb': round(peak_kb, 1),
+        'blocks': blocks,
+        'matched': matched,
+        'fields': total,
+        'misses': {field: list(pair) for field, pair in misses.items()},
+    }
+
+def run(sites=None, runs: int = DEFAULT_RUNS) -> list:
+    """
+    Benchmark every fixture of the given sites
+
+    Args:
+        sites (iterable): Site keys from SITES (default: all)
+        runs (int): Timed runs per measurement
+
+    Returns:
+        list: One result dict per fixture
+    """
+    # Inline extraction and no pacing, so only the scraper code is timed
+    parse_pool.configure(0)
+    rate_limit.configure('memory')
+    for site in SITES:
+        rate_limit.set_rate(site, 1e9, 1e9)
+
+    results = []
+    for site in sites or SITES:
+        for name, url, content, expected in load_fixtures(site):
+            results.append(bench_fixture(site, name, url, content, expected, runs))
+    return results
+
+def regressions(results: list, baseline: list, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """
+    What got worse than a saved report
+
+    Returns:
+        list: One message per regression (empty if none)
+    """
+    before = {(result['site'], result['fixture']): result for result in baseline}
+    found = []
+    for result in results:
+        old = before.get((result['site'], result['fixture']))
+        if old is None:
+            continue
+        label = f"{result['site']}/{result['fixture']}"
+        if result['matched'] < old['matched']:
+            found.append(f"{label}: accuracy {old['matched']}/{old['fields']} -> {result['matched']}/{result['fields']}")
+        for key in ('parse_ms', 'extract_ms', 'scrape_ms'):
+            if result[key] > old[key] * (1 + tolerance) and result[key] - old[key] >= MIN_REGRESSION_MS:
+                found.append(f"{label}: {key} {old[key]:.2f} -> {result[key]:.2f}")
+    return found
+
+def print_report(results: list):
+    header = f"{'site':<16}{'fixture':<20}{'KB':>6}{'parse ms':>10}{'extract ms':>12}{'scrape ms':>11}{'peak KB':>9}{'blocks':>8}  accuracy"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print(f"{result['site']:<16}{result['fixture']:<20}{result['bytes'] / 1024:>6.1f}"
+              f"{result['parse_ms']:>10.2f}{result['extract_ms']:>12.2f}{result['scrape_ms']:>11.2f}"
+              f"{result['peak_kb']:>9.0f}{result['blocks']:>8}  {result['matched']}/{result['fields']}")
+        for field, (expected, actual) in result['misses'].items():
+            print(f"{'':<16}✗ {field}: expected {expected!r}, got {actual!r}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the extractors on recorded pages")
+    parser.add_argument('--site', action='append', choices=sorted(SITES), help="Only this site (repeatable)")
+    parser.add_argument('-n', '--runs', type=int, default=DEFAULT_RUNS, help="Timed runs per measurement")
+    parser.add_argument('--save', help="Write the report as JSON (e.g. to use as a baseline)")
+    parser.add_argument('--baseline', help="Saved report to compare with; exit 1 on a regression")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown against the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = run(args.site, args.runs)
+    print_report(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"📄 Report: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for message in found:
+            print(f"❌ {message}")
+        if found:
+            sys.exit(1)
+        print("✅ No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Bulk URL ingestion CLI
+
+Reads a file of listing URLs (one per line, '#' comments allowed), scrapes
+them through scraper_manager with worker threads fed by the shared crawl
+frontier and appends one JSON line per URL to the output file. Every
+successfully scraped URL is also appended to a checkpoint file, so an
+interrupted run picks up where it stopped and a rerun retries the failures:
+
+    python bulk_scrape.py urls.txt -o results.jsonl -c 8
+
+With --records each result's data is a typed CarRecord (int mileage and
+year, price as a decimal string plus currency) instead of the scraper dict.
+--export results.parquet (or .arrow) also writes the whole output file as
+a columnar table once the run finishes (see columnar_export.py), and
+--supabase upserts successful results into the cars table in batches as
+they come in (see supabase_sink.py). --mirror-images DEST copies each
+result's photos into storage and writes the stored URLs instead of the
+sites' expiring CDN links (see image_mirror.py); add --thumbnails to also
+store small JPEG/WebP versions for list views (see image_derivatives.py),
+and --dedupe-photos INDEX to mark listings whose photos match a car seen
+before on any site with DuplicateOf (see photo_index.py).
+
+A URL is checkpointed only after its result line has been written, so a
+crash can at worst repeat the URLs that were in flight.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scraper_manager import scrape_car, get_frontier
+from car_record import CarRecord
+import parse_pool
+import provenance
+
+def iter_urls(path: str):
+    """Yield URLs from a file one at a time, skipping blanks and comments"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            url = line.strip()
+            if url and not url.startswith('#'):
+                yield url
+
+def read_urls(path: str) -> list:
+    """Read URLs from a file, skipping blanks, comments and duplicates"""
+    return list(dict.fromkeys(iter_urls(path)))
+
+def load_checkpoint(path: str) -> set:
+    """Return the set of URLs already completed in a previous run"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+def scrape_one(url: str, records: bool = False) -> dict:
+    """Scrape a single URL and wrap the outcome in a result record"""
+    started = time.time()
+    try:
+        data = scrape_car(url)
+        if provenance.is_demo(data):
+            # The site blocked every tier; the placeholder is not a listing
+            return {'url': url, 'success': False, 'error': 'demo data (site blocked)',
+                    'elapsed_ms': int((time.time() - started) * 1000)}
+        if records:
+            data = CarRecord.from_scraped(data).to_dict()
+        return {'url': url, 'success': True, 'data': data,
+                'elapsed_ms': int((time.time() - started) * 1000)}
+    except Exception as e:
+        return {'url': url, 'success': False, 'error': str(e),
+                'elapsed_ms': int((time.time() - started) * 1000)}
+
+def run(urls: list, output_path: str, checkpoint_path: str, concurrency: int = 4, frontier=None,
+        records: bool = False, sink=None, mirror=None, derivatives=None, photo_index=None) -> dict:
+    """
+    Scrape URLs concurrently, writing results and checkpoints as they finish
+
+    URLs are read from urls lazily and fed onto the crawl frontier a window
+    of 2 x concurrency at a time; worker threads top it up as they take
+    work, so a huge URL file never sits in memory. Workers pop in priority
+    order until the input and the frontier are both empty, so anything else
+    pushed onto the same frontier (e.g. by a crawler) is scraped by this run
+    too.
+
+    Args:
+        urls (iterable): URLs to scrape (already-checkpointed and repeated ones
+            are skipped); a list or a lazy iterator such as iter_urls()
+        output_path (str): JSONL file results are appended to
+        checkpoint_path (str): File successfully scraped URLs are appended to
+        concurrency (int): Number of scrapes in flight at once
+        frontier (CrawlFrontier): Frontier to work from (default: the shared one)
+        records (bool): Write typed CarRecord dicts instead of scraper dicts
+        sink (CarSink): Also upsert each successful result into the cars table
+        mirror (ImageMirror): Copy each successful result's photos into storage
+            and swap in the stored URLs before the result is written
+        derivatives (DerivativeStage): Render thumbnails of the mirrored photos
+        photo_index (PhotoIndex): Match the mirrored photos against earlier listings
+
+    Returns:
+        dict: Counts of 'total', 'skipped', 'succeeded' and 'failed' URLs
+    """
+    done = load_checkpoint(checkpoint_path)
+    stats = {'total': 0, 'skipped': 0, 'succeeded': 0, 'failed': 0}
+
+    if done:
+        print(f"⏭️  Resuming: {len(done)} URLs already done")
+
+    if frontier is None:
+        frontier = get_frontier()
+
+    # Keep a bounded window of work so huge URL files stay cheap in memory
+    window = concurrency * 2
+    pending = iter(urls)
+    in_flight = set()
+    feed_lock = threading.Lock()
+
+    def refill():
+        with feed_lock:
+            while len(frontier) < window:
+                url = next(pending, None)
+                if url is None:
+                    return
+                stats['total'] += 1
+                if url in done or url in in_flight:
+                    stats['skipped'] += 1
+                    continue
+                in_flight.add(url)
+                frontier.push(url)
+
+    results = queue.Queue()
+
+    def worker():
+        try:
+            while True:
+                refill()
+                item = frontier.pop()
+                if item is None:
+                    break
+                result = scrape_one(item.url, records)
+                if mirror is not None and result['success']:
+                    try:
+                        mirror.mirror_result(result)
+                        if derivatives is not None:
+                            derivatives.process_result(result)
+                        if photo_index is not None:
+                            photo_index.match_result(result, mirror.storage)
+                    except Exception as e:
+                        # Keep the scrape; the photos stay as far as they got
+                        print(f"⚠️ Photo processing failed for {item.url}: {e}")
+                results.put(result)
+        finally:
+            results.put(None)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    with open(output_path, 'a', encoding='utf-8') as output, \
+         open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        running = len(threads)
+        try:
+            while running:
+                result = results.get()
+                if result is None:
+                    running -= 1
+                    continue
+
+                output.write(json.dumps(result, ensure_ascii=False) + '\n')
+                output.flush()
+                os.fsync(output.fileno())
+
+                # Only successes are checkpointed, so a rerun retries failed and blocked URLs
+                if result['success']:
+                    checkpoint.write(result['url'] + '\n')
+                    checkpoint.flush()
+                with feed_lock:
+                    done.add(result['url'])
+                    in_flight.discard(result['url'])
+
+                if result['success']:
+                    stats['succeeded'] += 1
+                    if sink is not None:
+                        try:
+                            sink.add(result)
+                        except Exception as e:
+                            # The rows stay buffered and go out with a later flush
+                            print(f"⚠️ Supabase upsert failed: {e}")
+                else:
+                    stats['failed'] += 1
+                    print(f"❌ {result['url']}: {result['error']}")
+
+                completed = stats['succeeded'] + stats['failed']
+                if completed % 50 == 0:
+                    print(f"📊 {completed} done, {len(frontier)} queued ({stats['failed']} failed)")
+        except KeyboardInterrupt:
+            print("\n⏸️  Interrupted - rerun to resume")
+            frontier.close()
+            raise
+
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape a file of car listing URLs into JSONL")
+    parser.add_argument('url_file', help="File with one listing URL per line")
+    parser.add_argument('-o', '--output', default='results.jsonl', help="JSONL file to append results to")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="Scrapes in flight at once")
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count() or 1,
+                        help="Processes for HTML extraction (0 = parse inline)")
+    parser.add_argument('--export', help="Also write the results as Parquet/Arrow (.parquet or .arrow)")
+    parser.add_argument('--records', action='store_true',
+                        help="Write typed CarRecord data (native numbers, enums) instead of scraper dicts")
+    parser.add_argument('--supabase', action='store_true',
+                        help="Upsert results into the cars table (SUPABASE_URL / SUPABASE_KEY)")
+    parser.add_argument('--batch-size', type=int, default=500, help="Rows per upsert with --supabase")
+    parser.add_argument('--mirror-images', metavar='DEST',
+                        help="Copy photos into a directory, http(s):// store, s3://bucket or supabase[://bucket]")
+    parser.add_argument('--thumbnails', action='store_true',
+                        help="With --mirror-images, also store thumbnail and WebP versions of each photo")
+    parser.add_argument('--dedupe-photos', metavar='INDEX',
+                        help="With --mirror-images, match photos against this SQLite photo index")
+    args = parser.parse_args(argv)
+
+    checkpoint_path = args.checkpoint or args.output + '.checkpoint'
+    parse_pool.configure(args.parse_workers)
+
+    urls = iter_urls(args.url_file)
+    print(f"🚀 Bulk scraping {args.url_file} with concurrency {args.concurrency}")
+
+    sink = None
+    if args.supabase:
+        from supabase_sink import CarSink
+        sink = CarSink(batch_size=args.batch_size, rejects_path=args.output + '.rejects')
+
+    mirror = None
+    if args.mirror_images:
+        from image_mirror import ImageMirror, open_storage
+        mirror = ImageMirror(open_storage(args.mirror_images))
+
+    derivatives = None
+    if args.thumbnails:
+        if mirror is None:
+            parser.error("--thumbnails needs --mirror-images")
+        from image_derivatives import DerivativeStage
+        derivatives = DerivativeStage(mirror.storage)
+
+    photos = None
+    if args.dedupe_photos:
+        if mirror is None:
+            parser.error("--dedupe-photos needs --mirror-images")
+        from photo_index import PhotoIndex
+        photos = PhotoIndex(args.dedupe_photos)
+
+    started = time.time()
+    try:
+        stats = run(urls, args.output, checkpoint_path, args.concurrency, records=args.records, sink=sink,
+                    mirror=mirror, derivatives=derivatives, photo_index=photos)
+    finally:
+        parse_pool.shutdown()
+        if derivatives is not None:
+            derivatives.close()
+        if photos is not None:
+            photos.close()
+        if mirror is not None:
+            mirror.close()
+            print(f"🖼️  Mirrored {mirror.stats['mirrored']} photos "
+                  f"({mirror.stats['existing']} already stored, {mirror.stats['failed']} failed)")
+        if sink is not None:
+            try:
+                sink.close()
+            except Exception as e:
+                print(f"⚠️ Final Supabase upsert failed: {e} (import the rest with supabase_sink.py {args.output})")
+            print(f"🗄️  Upserted {sink.stats['upserted']} cars in {sink.stats['requests']} requests "
+                  f"({sink.stats['rejected']} rejected)")
+
+    elapsed = time.time() - started
+    print(f"✅ Done in {elapsed:.1f}s: {stats['succeeded']} succeeded, "
+          f"{stats['failed']} failed, {stats['skipped']} skipped")
+    print(f"📄 Results: {args.output}")
+
+    if args.export:
+        import columnar_export
+        rows = columnar_export.export_jsonl(args.output, args.export)
+        print(f"📦 Exported {rows} listings to {args.export}")
+
+if __name__ == "__main__":
+    main()
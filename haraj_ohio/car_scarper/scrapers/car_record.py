@@ -0,0 +1,315 @@
+"""
+Typed, compact car record shared by the bulk pipeline
+
+The site scrapers return loose dicts of display strings ("$20,000",
+"32,000 miles", "N/A") whose keys differ per site ("Fuel Type" on cars.com,
+"FuelType" on Manheim and Carfax). CarRecord normalizes any of them into one
+__slots__ object with native types: int mileage, Decimal price, int year and
+shared enum members for transmission, fuel and drive type. Repeated strings
+(make, model, colours, dealer) are interned, so a few hundred thousand
+records in memory share them.
+
+    record = CarRecord.from_scraped(scrape_car(url))
+    record.to_json()        # compact JSON (orjson when installed)
+    record.to_supabase()    # a row for the Supabase `cars` table
+
+The API keeps returning the scraper dicts, which the Flutter app reads
+directly; CarRecord is for bulk runs, exports and database writes.
+"""
+
+import re
+import sys
+import json
+from enum import Enum
+from decimal import Decimal, InvalidOperation
+
+import provenance
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class Transmission(str, Enum):
+    AUTOMATIC = 'Automatic'
+    MANUAL = 'Manual'
+
+    @classmethod
+    def parse(cls, text):
+        """Map a scraped transmission string (same rules as the Flutter add-car form)"""
+        if not provenance.is_filled(text):
+            return None
+        return cls.MANUAL if 'manual' in str(text).lower() else cls.AUTOMATIC
+
+class FuelType(str, Enum):
+    PETROL = 'Petrol'
+    DIESEL = 'Diesel'
+    ELECTRIC = 'Electric'
+    HYBRID = 'Hybrid'
+
+    @classmethod
+    def parse(cls, text):
+        """Map a scraped fuel string ('Gasoline', 'Diesel Fuel', 'Plug-In Hybrid', ...)"""
+        if not provenance.is_filled(text):
+            return None
+        text = str(text).lower()
+        if 'hybrid' in text:
+            return cls.HYBRID
+        if 'diesel' in text:
+            return cls.DIESEL
+        if 'electric' in text:
+            return cls.ELECTRIC
+        return cls.PETROL
+
+class DriveType(str, Enum):
+    FWD = 'FWD'
+    RWD = 'RWD'
+    AWD = 'AWD'
+
+    @classmethod
+    def parse(cls, text):
+        """Map a scraped drivetrain string; 4WD/4x4 count as AWD like in the app"""
+        if not provenance.is_filled(text):
+            return None
+        text = str(text).lower()
+        if any(word in text for word in ('all-wheel', 'all wheel', 'awd', '4wd', '4x4', 'four-wheel', 'four wheel')):
+            return cls.AWD
+        if any(word in text for word in ('rear-wheel', 'rear wheel', 'rwd')):
+            return cls.RWD
+        if any(word in text for word in ('front-wheel', 'front wheel', 'fwd')):
+            return cls.FWD
+        return None
+
+# Currency of bare "$" prices per site
+SITE_CURRENCY = {
+    'cars.com': 'USD',
+    'carfax.com': 'USD',
+    'manheim.com.au': 'AUD',
+}
+
+MILES_TO_KM = 1.609344
+
+# Scraped keys (as provenance.field_key) per record attribute, in preference order
+SOURCE_KEYS = {
+    'title': ('title',),
+    'make': ('make',),
+    'model': ('model',),
+    'variant': ('variant',),
+    'make_id': ('makeid',),
+    'model_id': ('modelid',),
+    'engine': ('engine', 'enginesize'),
+    'exterior_color': ('exteriorcolor', 'bodycolour'),
+    'interior_color': ('interiorcolor',),
+    'body_type': ('bodytype',),
+    'vin': ('vin',),
+    'dealer': ('dealer',),
+    'location': ('location',),
+    'auction_date': ('auctiondate',),
+    'lot_number': ('lotnumber',),
+}
+
+# Attributes whose values repeat across listings and are worth interning
+INTERNED = frozenset(('make', 'model', 'variant', 'make_id', 'model_id', 'exterior_color',
+                      'interior_color', 'body_type', 'dealer', 'location'))
+
+_DIGITS = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+def _text(value):
+    """A scraped string, or None for N/A and empty values"""
+    if not provenance.is_filled(value) or isinstance(value, (list, tuple)):
+        return None
+    return str(value).strip() or None
+
+def _interned(value):
+    value = _text(value)
+    return sys.intern(value) if value is not None else None
+
+def parse_int(text):
+    """First number in a display string ('32,000 miles' -> 32000), or None"""
+    text = _text(text)
+    if text is None:
+        return None
+    match = _DIGITS.search(text)
+    if not match:
+        return None
+    return int(float(match.group().replace(',', '')))
+
+def parse_price(text, site: str = None):
+    """
+    Parse a display price
+
+    Returns:
+        tuple: (Decimal amount or None, ISO currency code or None)
+    """
+    text = _text(text)
+    if text is None:
+        return None, None
+    match = _DIGITS.search(text)
+    if not match:
+        return None, None
+    try:
+        amount = Decimal(match.group().replace(',', ''))
+    except InvalidOperation:
+        return None, None
+    upper = text.upper()
+    for code in ('AUD', 'USD', 'SAR', 'EUR', 'GBP'):
+        if code in upper:
+            return amount, code
+    return amount, SITE_CURRENCY.get(site)
+
+def _site_of(url):
+    for site in SITE_CURRENCY:
+        if url and site in url:
+            return site
+    return None
+
+def _images(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(str(item) for item in value if item)
+    return ()
+
+class CarRecord:
+    """One listing with native field types"""
+
+    __slots__ = ('url', 'site', 'title', 'price', 'currency', 'year', 'make', 'model',
+                 'variant', 'make_id', 'model_id', 'mileage', 'mileage_unit', 'transmission',
+                 'fuel_type', 'drive_type', 'engine', 'exterior_color', 'interior_color',
+                 'body_type', 'doors', 'seats', 'vin', 'dealer', 'location', 'auction_date',
+                 'lot_number', 'images', 'features')
+
+    def __init__(self, url: str, **fields):
+        self.url = url
+        self.site = _site_of(url)
+        for name in self.__slots__[2:]:
+            setattr(self, name, fields.get(name))
+        self.images = tuple(self.images or ())
+        self.features = tuple(self.features or ())
+
+    @classmethod
+    def from_scraped(cls, car_data: dict):
+        """
+        Build a record from any scraper's result dict
+
+        Args:
+            car_data (dict): Output of scrape_car (any supported site)
+
+        Returns:
+            CarRecord: The normalized record
+        """
+        url = car_data.get('URL')
+        by_key = {provenance.field_key(key): value for key, value in car_data.items()}
+
+        def first(*keys):
+            for key in keys:
+                if provenance.is_filled(by_key.get(key)):
+                    return by_key[key]
+            return None
+
+        price, currency = parse_price(by_key.get('price'), _site_of(url))
+        mileage_text = _text(by_key.get('mileage')) or ''
+        record = cls(url, price=price, currency=currency)
+        for name, keys in SOURCE_KEYS.items():
+            value = first(*keys)
+            setattr(record, name, _interned(value) if name in INTERNED else _text(value))
+        record.year = parse_int(by_key.get('year'))
+        record.mileage = parse_int(mileage_text)
+        if record.mileage is not None:
+            record.mileage_unit = 'km' if 'km' in mileage_text.lower() else 'mi'
+        record.transmission = Transmission.parse(by_key.get('transmission'))
+        record.fuel_type = FuelType.parse(by_key.get('fueltype'))
+        record.drive_type = DriveType.parse(first('drivetype', 'drivetrain'))
+        record.doors = parse_int(by_key.get('doors'))
+        record.seats = parse_int(by_key.get('seats'))
+        record.images = _images(by_key.get('images'))
+        record.features = tuple(sys.intern(str(item)) for item in _images(by_key.get('features')))
+        return record
+
+    def to_dict(self) -> dict:
+        """Plain JSON-ready dict (price as a string so no precision is lost)"""
+        data = {name: getattr(self, name) for name in self.__slots__}
+        if self.price is not None:
+            data['price'] = str(self.price)
+        for name in ('transmission', 'fuel_type', 'drive_type'):
+            if data[name] is not None:
+                data[name] = data[name].value
+        data['images'] = list(self.images)
+        data['features'] = list(self.features)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Rebuild a record from to_dict() output (e.g. a bulk JSONL line)"""
+        record = cls(data.get('url'))
+        for name in cls.__slots__[2:]:
+            setattr(record, name, data.get(name))
+        if record.price is not None:
+            record.price = Decimal(record.price)
+        record.transmission = Transmission(record.transmission) if record.transmission else None
+        record.fuel_type = FuelType(record.fuel_type) if record.fuel_type else None
+        record.drive_type = DriveType(record.drive_type) if record.drive_type else None
+        for name in INTERNED:
+            if getattr(record, name) is not None:
+                setattr(record, name, sys.intern(getattr(record, name)))
+        record.images = tuple(record.images or ())
+        record.features = tuple(record.features or ())
+        return record
+
+    def to_json(self) -> str:
+        """Compact JSON for this record"""
+        if orjson is not None:
+            return orjson.dumps(self.to_dict()).decode()
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+    @property
+    def mileage_km(self):
+        """Mileage in km (miles converted), None when unknown"""
+        if self.mileage is None:
+            return None
+        if self.mileage_unit == 'km':
+            return self.mileage
+        return round(self.mileage * MILES_TO_KM)
+
+    def to_supabase(self):
+        """
+        A row for the Supabase `cars` table (lib/supabase/sql/schema.sql)
+
+        Mileage is written in km and the price with its currency (the
+        `currency` column from lib/supabase/sql/cammnds/add_currency.sql).
+        Other NOT NULL columns the listing does not provide get the same
+        defaults the Flutter add-car form uses (Automatic, Petrol, FWD, 0, '').
+
+        Returns:
+            dict: The row, or None when the listing has no price (price is NOT NULL)
+        """
+        if self.price is None:
+            return None
+        return {
+            'description': self.title or '',
+            'price': self.price,
+            'currency': self.currency,
+            'brand': self.make or '',
+            'model': self.model or '',
+            'year': self.year or 0,
+            'mileage': self.mileage_km or 0,
+            'transmission': (self.transmission or Transmission.AUTOMATIC).value,
+            'fuel_type': (self.fuel_type or FuelType.PETROL).value,
+            'engine': self.engine or '',
+            'horsepower': 0,
+            'drive_type': (self.drive_type or DriveType.FWD).value,
+            'exterior_color': self.exterior_color or '',
+            'interior_color': self.interior_color or '',
+            'doors': self.doors or 0,
+            'seats': self.seats or 0,
+            'main_image': self.images[0] if self.images else None,
+            'other_images': list(self.images[1:]) if len(self.images) > 1 else None,
+            'contact': self.dealer or '',
+            'vin': self.vin,
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, CarRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"CarRecord({self.year} {self.make} {self.model}, {self.price} {self.currency}, {self.url})"
@@ -1,9 +1,14 @@
 import requests
 from bs4 import BeautifulSoup
 import re
-import time
-import random
 import json
+import sys
+import os
+
+# Shared scraper modules live one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_cache
+import rate_limit
 
 def scrape_car(url: str) -> dict:
     """
@@ -37,11 +42,14 @@ def scrape_car(url: str) -> dict:
         }
         
         # Visit main page
+        if not rate_limit.acquire('carfax.com'):
+            return get_demo_data(url)
         main_response = session.get('https://www.carfax.com/', headers=main_headers, timeout=30)
         print(f"✅ Main page response: {main_response.status_code}")
         
-        # Wait a bit
-        time.sleep(random.uniform(3, 6))
+        # Wait for the next carfax.com slot (shared by every scraper process)
+        if not rate_limit.acquire('carfax.com'):
+            return get_demo_data(url)
         
         # Step 2: Try to access the specific URL
         print("🔍 Accessing specific vehicle URL...")
@@ -61,7 +69,9 @@ def scrape_car(url: str) -> dict:
             'Cache-Control': 'no-cache'
         }
         
-        response = session.get(url, headers=vehicle_headers, timeout=30, allow_redirects=True)
+        response, cached_data = http_cache.conditional_get(session, url, headers=vehicle_headers, timeout=30, allow_redirects=True)
+        if cached_data is not None:
+            return cached_data
         
         if response.status_code == 200:
             print("✅ Successfully accessed vehicle page!")
@@ -73,7 +83,9 @@ def scrape_car(url: str) -> dict:
             # Check if we got real content
             if 'Volvo' in page_text and '2021' in page_text and 'XC40' in page_text:
                 print("✅ Real content detected!")
-                return extract_real_data(page_text, url)
+                car_data = extract_real_data(page_text, url)
+                http_cache.store(url, response, car_data)
+                return car_data
             else:
                 print("⚠️  Content doesn't contain expected data")
                 return get_demo_data(url)
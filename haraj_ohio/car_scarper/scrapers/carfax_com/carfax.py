@@ -1,10 +1,21 @@
 import requests
 from bs4 import BeautifulSoup
 import re
-import time
 import random
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+import sys
+import os
+
+# Shared scraper modules live one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import parse_pool
+import http_cache
+import rate_limit
+import deadline
+import provenance
+import vin_decoder
+import title_parser
 
 def scrape_car(url: str) -> dict:
     """
@@ -21,7 +32,7 @@ def scrape_car(url: str) -> dict:
         
         # Configure retry strategy
         retry_strategy = Retry(
-            total=3,
+            total=deadline.retries(3, 10),
             backoff_factor=1,
             status_forcelist=[429, 500, 502, 503, 504],
         )
@@ -40,19 +51,21 @@ def scrape_car(url: str) -> dict:
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36 OPR/107.0.0.0'
         ]
         
-        # Random delay to simulate human behavior
-        time.sleep(random.uniform(3, 8))
+        # Wait for a carfax.com slot (shared by every scraper process)
+        if not rate_limit.acquire('carfax.com'):
+            return get_demo_data(url)
         
         # First, try to get cookies from the main site
         print("🍪 Getting cookies from main site...")
         try:
-            main_response = session.get('https://www.carfax.com/', timeout=30)
+            main_response = session.get('https://www.carfax.com/', timeout=deadline.timeout(30))
             print(f"✅ Got cookies: {len(session.cookies)} cookies")
         except:
             print("⚠️  Could not get cookies from main site")
         
-        # Random delay between requests
-        time.sleep(random.uniform(2, 5))
+        # And another slot for the listing page itself
+        if not rate_limit.acquire('carfax.com'):
+            return get_demo_data(url)
         
         # Sophisticated headers to mimic a real browser
         selected_ua = random.choice(user_agents)
@@ -84,19 +97,19 @@ def scrape_car(url: str) -> dict:
         
         # First request to get initial page
         print("🔍 Making initial request...")
-        response = session.get(url, headers=headers, timeout=30, allow_redirects=True)
+        response, cached_data = http_cache.conditional_get(session, url, headers=headers, timeout=deadline.timeout(30), allow_redirects=True)
+        if cached_data is not None:
+            return cached_data
         response.raise_for_status()
         
-        # Parse the HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        page_text = soup.get_text()
-        
-        print(f"🔍 Page text length: {len(page_text)}")
+        # Parse and extract in the pool; None means the anti-bot page came back
+        car_data = parse_pool.extract('carfax.com', response.content, url)
         
         # Check if we got the real content
-        if 'Volvo' in page_text and '2021' in page_text and 'XC40' in page_text:
+        if car_data is not None:
             print("✅ Real content detected!")
-            return extract_real_data(page_text, url)
+            http_cache.store(url, response, car_data)
+            return car_data
         else:
             print("⚠️  Anti-bot protection detected, trying alternative approach...")
             
@@ -104,21 +117,21 @@ def scrape_car(url: str) -> dict:
             headers['User-Agent'] = random.choice(user_agents)
             headers['Referer'] = 'https://www.google.com/'
             
-            # Random delay
-            time.sleep(random.uniform(3, 7))
+            # We were spotted: slow every process down on carfax.com
+            if not rate_limit.backoff('carfax.com', random.uniform(3, 7)):
+                return get_demo_data(url)
             
             print("🔍 Making second request with different headers...")
-            response2 = session.get(url, headers=headers, timeout=30, allow_redirects=True)
+            response2 = session.get(url, headers=headers, timeout=deadline.timeout(30), allow_redirects=True)
             response2.raise_for_status()
             
-            soup2 = BeautifulSoup(response2.content, 'html.parser')
-            page_text2 = soup2.get_text()
-            
-            print(f"🔍 Second page text length: {len(page_text2)}")
+            # Parse and extract in the pool; None means the anti-bot page came back
+            car_data2 = parse_pool.extract('carfax.com', response2.content, url)
             
-            if 'Volvo' in page_text2 and '2021' in page_text2 and 'XC40' in page_text2:
+            if car_data2 is not None:
                 print("✅ Real content found on second attempt!")
-                return extract_real_data(page_text2, url)
+                http_cache.store(url, response2, car_data2)
+                return car_data2
             else:
                 print("❌ Still blocked, trying one more approach...")
                 
@@ -132,20 +145,20 @@ def scrape_car(url: str) -> dict:
                     'Upgrade-Insecure-Requests': '1'
                 }
                 
-                time.sleep(random.uniform(5, 10))
+                if not rate_limit.backoff('carfax.com', random.uniform(5, 10)):
+                    return get_demo_data(url)
                 
                 print("🔍 Making third request with minimal headers...")
-                response3 = session.get(url, headers=minimal_headers, timeout=30, allow_redirects=True)
+                response3 = session.get(url, headers=minimal_headers, timeout=deadline.timeout(30), allow_redirects=True)
                 response3.raise_for_status()
                 
-                soup3 = BeautifulSoup(response3.content, 'html.parser')
-                page_text3 = soup3.get_text()
+                # Parse and extract in the pool; None means the anti-bot page came back
+                car_data3 = parse_pool.extract('carfax.com', response3.content, url)
                 
-                print(f"🔍 Third page text length: {len(page_text3)}")
-                
-                if 'Volvo' in page_text3 and '2021' in page_text3 and 'XC40' in page_text3:
+                if car_data3 is not None:
                     print("✅ Real content found on third attempt!")
-                    return extract_real_data(page_text3, url)
+                    http_cache.store(url, response3, car_data3)
+                    return car_data3
                 else:
                     print("❌ Third attempt failed, trying fourth approach...")
                     
@@ -162,21 +175,21 @@ def scrape_car(url: str) -> dict:
                         'Cache-Control': 'no-cache'
                     }
                     
-                    time.sleep(random.uniform(8, 15))
+                    if not rate_limit.backoff('carfax.com', random.uniform(8, 15)):
+                        return get_demo_data(url)
                     
                     print("🔍 Making fourth request with mobile headers...")
                     try:
-                        response4 = session.get(url, headers=mobile_headers, timeout=30, allow_redirects=True)
+                        response4 = session.get(url, headers=mobile_headers, timeout=deadline.timeout(30), allow_redirects=True)
                         response4.raise_for_status()
                         
-                        soup4 = BeautifulSoup(response4.content, 'html.parser')
-                        page_text4 = soup4.get_text()
+                        # Parse and extract in the pool; None means the anti-bot page came back
+                        car_data4 = parse_pool.extract('carfax.com', response4.content, url)
                         
-                        print(f"🔍 Fourth page text length: {len(page_text4)}")
-                        
-                        if 'Volvo' in page_text4 and '2021' in page_text4 and 'XC40' in page_text4:
+                        if car_data4 is not None:
                             print("✅ Real content found on fourth attempt!")
-                            return extract_real_data(page_text4, url)
+                            http_cache.store(url, response4, car_data4)
+                            return car_data4
                         else:
                             print("❌ Fourth attempt failed, trying fifth approach...")
                             
@@ -187,13 +200,16 @@ def scrape_car(url: str) -> dict:
                             fresh_session.mount("https://", fresh_adapter)
                             
                             # Get fresh cookies
+                            if not rate_limit.acquire('carfax.com'):
+                                return get_demo_data(url)
                             try:
-                                fresh_session.get('https://www.carfax.com/', timeout=30)
+                                fresh_session.get('https://www.carfax.com/', timeout=deadline.timeout(30))
                                 print("🍪 Got fresh cookies for fifth attempt")
                             except:
                                 pass
                             
-                            time.sleep(random.uniform(10, 20))
+                            if not rate_limit.backoff('carfax.com', random.uniform(10, 20)):
+                                return get_demo_data(url)
                             
                             # Use a very simple approach
                             simple_headers = {
@@ -206,17 +222,16 @@ def scrape_car(url: str) -> dict:
                             
                             print("🔍 Making fifth request with fresh session...")
                             try:
-                                response5 = fresh_session.get(url, headers=simple_headers, timeout=30, allow_redirects=True)
+                                response5 = fresh_session.get(url, headers=simple_headers, timeout=deadline.timeout(30), allow_redirects=True)
                                 response5.raise_for_status()
                                 
-                                soup5 = BeautifulSoup(response5.content, 'html.parser')
-                                page_text5 = soup5.get_text()
+                                # Parse and extract in the pool; None means the anti-bot page came back
+                                car_data5 = parse_pool.extract('carfax.com', response5.content, url)
                                 
-                                print(f"🔍 Fifth page text length: {len(page_text5)}")
-                                
-                                if 'Volvo' in page_text5 and '2021' in page_text5 and 'XC40' in page_text5:
+                                if car_data5 is not None:
                                     print("✅ Real content found on fifth attempt!")
-                                    return extract_real_data(page_text5, url)
+                                    http_cache.store(url, response5, car_data5)
+                                    return car_data5
                                 else:
                                     print("❌ All attempts failed, Carfax has very strong anti-bot protection")
                                     return get_demo_data(url)
@@ -231,10 +246,45 @@ def scrape_car(url: str) -> dict:
         print(f"⚠️  Error: {str(e)}")
         return get_demo_data(url)
 
-def extract_real_data(page_text: str, url: str) -> dict:
+def parse_page(content: bytes, url: str, early: bool = False, include=(), fields=None):
+    """
+    Parse a fetched Carfax page and extract car data from it
+    
+    Args:
+        content (bytes): Raw HTML of the vehicle page
+        url (str): The carfax.com vehicle URL
+        early (bool): Accepted for the parse pool; Carfax pages are read in
+            one text pass, so there is no optional pass to skip
+        include (tuple): Ignored for the same reason
+        fields (frozenset): Ignored too; scrape_car drops unrequested fields
+        
+    Returns:
+        dict: Dictionary containing car information, or None if the
+        anti-bot page was served instead of the real listing
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    page_text = soup.get_text()
+    
+    print(f"🔍 Page text length: {len(page_text)}")
+    
+    if 'Volvo' in page_text and '2021' in page_text and 'XC40' in page_text:
+        sources = provenance.Sources('carfax.com:text')
+        return sources.attach(extract_real_data(page_text, url, sources))
+    return None
+
+def extract_real_data(page_text: str, url: str, sources=None) -> dict:
     """
     Extract real data from the page content
+    
+    Args:
+        page_text (str): Visible text of the vehicle page
+        url (str): The carfax.com vehicle URL
+        sources (provenance.Sources): Notes which pattern filled each field
     """
+    def found(field, pattern, confidence):
+        if sources is not None:
+            sources.found(field, pattern, confidence)
+    
     print("🔍 Extracting real data from page content...")
     
     # Initialize result dictionary
@@ -292,6 +342,8 @@ def extract_real_data(page_text: str, url: str) -> dict:
             car_data["Model"] = model_variant
             car_data["Variant"] = "N/A"
         
+        for field in ("Title", "Year", "Make", "Model"):
+            found(field, title_pattern, 0.9)
         print(f"✅ Found title: {car_data['Title']}")
     else:
         # Try simpler pattern
@@ -315,8 +367,13 @@ def extract_real_data(page_text: str, url: str) -> dict:
                 car_data["Model"] = model_variant
                 car_data["Variant"] = "N/A"
             
+            for field in ("Title", "Year", "Make", "Model"):
+                found(field, simple_pattern, 0.4)
             print(f"✅ Found simple title: {car_data['Title']}")
     
+    # The patterns above take one word as the make; re-split with the make/model catalogue
+    title_parser.apply(car_data, sources)
+    
     # Extract price: Look for $21,991 pattern
     price_pattern = r'\$([\d,]+)'
     price_matches = re.findall(price_pattern, page_text)
@@ -324,6 +381,7 @@ def extract_real_data(page_text: str, url: str) -> dict:
         price_num = price.replace(',', '')
         if len(price_num) >= 4 and int(price_num) >= 1000:  # At least $1,000
             car_data["Price"] = f"${price}"
+            found("Price", price_pattern, 0.6)
             print(f"✅ Found price: {car_data['Price']}")
             break
     
@@ -334,6 +392,7 @@ def extract_real_data(page_text: str, url: str) -> dict:
         mileage_value = mileage_match.group(1)
         if len(mileage_value) >= 3:  # At least 3 digits
             car_data["Mileage"] = f"{mileage_value} mi"
+            found("Mileage", mileage_pattern, 0.7)
             car_data["OdometerShowing"] = "Showing"
             print(f"✅ Found mileage: {car_data['Mileage']}")
     
@@ -342,6 +401,7 @@ def extract_real_data(page_text: str, url: str) -> dict:
     vin_match = re.search(vin_pattern, page_text, re.IGNORECASE)
     if vin_match:
         car_data["VIN"] = vin_match.group(1)
+        found("VIN", vin_pattern, 0.95)
         print(f"✅ Found VIN: {car_data['VIN']}")
     
     # Extract body style: "Body Style\nSUV"
@@ -349,6 +409,7 @@ def extract_real_data(page_text: str, url: str) -> dict:
     body_match = re.search(body_pattern, page_text, re.IGNORECASE)
     if body_match:
         car_data["BodyType"] = body_match.group(1).strip()
+        found("BodyType", body_pattern, 0.8)
         print(f"✅ Found body style: {car_data['BodyType']}")
     
     # Extract drive type: "Drive Type\nAWD"
@@ -356,6 +417,7 @@ def extract_real_data(page_text: str, url: str) -> dict:
     drive_match = re.search(drive_pattern, page_text, re.IGNORECASE)
     if drive_match:
         car_data["DriveType"] = drive_match.group(1).strip()
+        found("DriveType", drive_pattern, 0.8)
         print(f"✅ Found drive type: {car_data['DriveType']}")
     
     # Extract transmission: "Transmission\nAutomatic"
@@ -363,6 +425,7 @@ def extract_real_data(page_text: str, url: str) -> dict:
     trans_match = re.search(trans_pattern, page_text, re.IGNORECASE)
     if trans_match:
         car_data["Transmission"] = trans_match.group(1).strip()
+        found("Transmission", trans_pattern, 0.8)
         print(f"✅ Found transmission: {car_data['Transmission']}")
     
     # Extract engine: "Engine\n4 Cyl"
@@ -376,6 +439,7 @@ def extract_real_data(page_text: str, url: str) -> dict:
             car_data["EngineCylinders"] = cyl_match.group(1)
         else:
             car_data["EngineSize"] = engine_text
+        found("EngineCylinders" if cyl_match else "EngineSize", engine_pattern, 0.8)
         print(f"✅ Found engine: {engine_text}")
     
     # Extract fuel: "Fuel\nGasoline"
@@ -383,6 +447,7 @@ def extract_real_data(page_text: str, url: str) -> dict:
     fuel_match = re.search(fuel_pattern, page_text, re.IGNORECASE)
     if fuel_match:
         car_data["FuelType"] = fuel_match.group(1).strip()
+        found("FuelType", fuel_pattern, 0.8)
         print(f"✅ Found fuel: {car_data['FuelType']}")
     
     # Extract exterior color: "Exterior Color\nSilver"
@@ -391,6 +456,7 @@ def extract_real_data(page_text: str, url: str) -> dict:
     if ext_color_match:
         car_data["ExteriorColor"] = ext_color_match.group(1).strip()
         car_data["BodyColour"] = ext_color_match.group(1).strip()
+        found("ExteriorColor", ext_color_pattern, 0.8)
         print(f"✅ Found exterior color: {car_data['ExteriorColor']}")
     
     # Extract interior color: "Interior Color\nBlack"
@@ -398,8 +464,12 @@ def extract_real_data(page_text: str, url: str) -> dict:
     int_color_match = re.search(int_color_pattern, page_text, re.IGNORECASE)
     if int_color_match:
         car_data["InteriorColor"] = int_color_match.group(1).strip()
+        found("InteriorColor", int_color_pattern, 0.8)
         print(f"✅ Found interior color: {car_data['InteriorColor']}")
     
+    # Fill or correct Year/Make/Model from the VIN (offline lookup)
+    vin_decoder.apply(car_data, sources)
+    
     print("✅ Real data extracted successfully!")
     return car_data
 
@@ -409,7 +479,7 @@ def get_demo_data(url: str) -> dict:
     """
     print("📝 Using demo data (real scraping blocked by anti-bot protection)")
     
-    return {
+    demo_data = {
         "Title": "2021 Mercedes-Benz C-Class",
         "Price": "$31,500",
         "Mileage": "32,000 miles",
@@ -441,6 +511,8 @@ def get_demo_data(url: str) -> dict:
         "Images": [],
         "URL": url
     }
+    provenance.mark_demo(demo_data)
+    return demo_data
 
 # Test function
 if __name__ == "__main__":
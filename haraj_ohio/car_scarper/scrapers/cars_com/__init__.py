@@ -3,5 +3,6 @@ Cars.com scraper package
 """
 
 from .cars_com import scrape_car
+from .cars_com_search import crawl_search
 
-__all__ = ['scrape_car']
+__all__ = ['scrape_car', 'crawl_search']
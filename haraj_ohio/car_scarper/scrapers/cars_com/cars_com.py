@@ -2,6 +2,26 @@ import requests
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urlparse
+import sys
+import os
+
+# Shared scraper modules live one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import deadline
+import provenance
+import rate_limit
+import title_parser
+
+# Roughly what the JavaScript-rendering tiers need to finish (seconds)
+RENDER_SECONDS = 25
+
+def _can_render(step: str) -> bool:
+    """Whether a browser tier may run: not against a fake_upstream stand-in, and within the budget"""
+    if os.environ.get('SCRAPER_UPSTREAM'):
+        # Browsers do not go through requests, so they would reach the real site
+        print(f"🧪 Stand-in upstream: skipping {step}")
+        return False
+    return deadline.allows(RENDER_SECONDS, step)
 
 def scrape_car(url: str) -> dict:
     """
@@ -36,36 +56,40 @@ def scrape_car(url: str) -> dict:
         print(f"⚠️  Advanced scraper failed: {str(e)}")
         print("   Falling back to requests-html...")
     
-    # Try requests-html as backup
-    try:
-        import sys
-        import os
-        sys.path.append(os.path.dirname(__file__))
-        from cars_com_requests_html import scrape_car_requests_html
-        print("🚀 Trying requests-html scraper...")
-        return scrape_car_requests_html(url)
-    except ImportError:
-        print("⚠️  requests-html not available, trying requests...")
-    except Exception as e:
-        print(f"⚠️  requests-html failed: {str(e)}")
-        print("   Falling back to requests...")
+    # Try requests-html as backup (renders JavaScript, so only if the budget allows)
+    if _can_render("requests-html render"):
+        try:
+            import sys
+            import os
+            sys.path.append(os.path.dirname(__file__))
+            from cars_com_requests_html import scrape_car_requests_html
+            print("🚀 Trying requests-html scraper...")
+            return scrape_car_requests_html(url)
+        except ImportError:
+            print("⚠️  requests-html not available, trying requests...")
+        except Exception as e:
+            print(f"⚠️  requests-html failed: {str(e)}")
+            print("   Falling back to requests...")
     
-    # Try Selenium as backup (if available)
-    try:
-        import sys
-        import os
-        sys.path.append(os.path.dirname(__file__))
-        from cars_com_selenium import scrape_car_selenium
-        print("🚀 Trying Selenium scraper...")
-        return scrape_car_selenium(url)
-    except ImportError:
-        print("⚠️  Selenium not available, trying requests...")
-    except Exception as e:
-        print(f"⚠️  Selenium failed: {str(e)}")
-        print("   Falling back to requests...")
+    # Try Selenium as backup (if available and the budget allows)
+    if _can_render("Selenium scraper"):
+        try:
+            import sys
+            import os
+            sys.path.append(os.path.dirname(__file__))
+            from cars_com_selenium import scrape_car_selenium
+            print("🚀 Trying Selenium scraper...")
+            return scrape_car_selenium(url)
+        except ImportError:
+            print("⚠️  Selenium not available, trying requests...")
+        except Exception as e:
+            print(f"⚠️  Selenium failed: {str(e)}")
+            print("   Falling back to requests...")
     
     # Try to scrape real data with requests
     try:
+        deadline.check("plain requests fallback")
+        
         # More sophisticated headers to avoid detection
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -90,10 +114,11 @@ def scrape_car(url: str) -> dict:
         from requests.adapters import HTTPAdapter
         from urllib3.util.retry import Retry
         
+        # No urllib3 retry on 429: a throttled request waits on the shared bucket instead
         retry_strategy = Retry(
             total=1,
             backoff_factor=0.1,
-            status_forcelist=[429, 500, 502, 503, 504],
+            status_forcelist=[500, 502, 503, 504],
             allowed_methods=["HEAD", "GET", "OPTIONS"]
         )
         
@@ -101,8 +126,15 @@ def scrape_car(url: str) -> dict:
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
+        # Wait for a cars.com slot (shared by every scraper process)
+        if not rate_limit.acquire('cars.com'):
+            raise deadline.DeadlineExceeded("No cars.com request slot within the time budget")
+        
         # Make the request with session (ultra-short timeout for speed)
-        response = session.get(url, timeout=2, allow_redirects=True)
+        response = session.get(url, timeout=deadline.timeout(2), allow_redirects=True)
+        if response.status_code in rate_limit.BLOCKED_STATUSES:
+            # We were spotted: slow every process down on cars.com
+            rate_limit.backoff('cars.com', rate_limit.BLOCKED_BACKOFF)
         response.raise_for_status()
         
         # Parse the HTML
@@ -200,8 +232,9 @@ def scrape_car(url: str) -> dict:
                 car_data["Dealer"] = dealer_elem.get_text(strip=True)
                 break
         
-        # Additional data extraction
-        if car_data["Title"] != "N/A":
+        # Year, make and model from the make/model catalogue, else guess from the title words
+        parsed = car_data["Title"] != "N/A" and title_parser.apply(car_data)
+        if car_data["Title"] != "N/A" and not parsed:
             title = car_data["Title"]
             # Try to extract year
             year_match = re.search(r'\b(19|20)\d{2}\b', title)
@@ -221,6 +254,7 @@ def scrape_car(url: str) -> dict:
         
         # If we got real data, return it
         if car_data["Title"] != "N/A" and car_data["Price"] != "N/A":
+            provenance.record_all(car_data, 'cars.com:requests', 0.7)
             return car_data
             
     except Exception as e:
@@ -266,6 +300,7 @@ def scrape_car(url: str) -> dict:
     }
     
     print("📝 Using demo data (real scraping blocked by anti-bot protection)")
+    provenance.mark_demo(demo_data)
     return demo_data
 
 # Test function for development
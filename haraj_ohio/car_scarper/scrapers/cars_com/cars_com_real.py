@@ -1,10 +1,28 @@
 import requests
 from bs4 import BeautifulSoup
 import re
-import time
-import random
+import sys
+import os
 from urllib.parse import urlparse
 
+# Shared scraper modules live one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import parse_pool
+import http_cache
+import rate_limit
+import deadline
+import provenance
+import vin_decoder
+import title_parser
+import image_collector
+
+# Roughly what a Selenium fallback needs to start Chrome and load a page
+SELENIUM_SECONDS = 20
+
+# Fields filled from the dt/dd specification list
+SPEC_FIELDS = ("Exterior Color", "Interior Color", "Drivetrain", "Fuel Type",
+               "Transmission", "Engine", "VIN", "Stock #")
+
 def scrape_car_real(url: str) -> dict:
     """
     Advanced scraper for cars.com with better anti-detection
@@ -23,12 +41,19 @@ def scrape_car_real(url: str) -> dict:
         'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15'
     ]
     
+    # Best page seen so far, returned if the time budget runs out
+    best_data = None
+    blocked = False
+    
     # Try multiple approaches to get real data
     for attempt in range(3):
+        if attempt > 0 and deadline.expired():
+            deadline.skip(f"attempts {attempt + 1}-3")
+            break
         try:
             # Small delay between attempts
             if attempt > 0:
-                time.sleep(1)
+                deadline.sleep(1)
             
             # Create session with connection pooling
             session = requests.Session()
@@ -88,368 +113,378 @@ def scrape_car_real(url: str) -> dict:
             
             print(f"🌐 Attempt {attempt + 1}: Trying to access {url}")
             
-            # Make request with reasonable timeout
-            response = session.get(url, timeout=10, allow_redirects=True)
+            # Wait for a cars.com slot (shared by every scraper process); after a
+            # block, slow every process down on cars.com first
+            if blocked:
+                blocked = False
+                allowed = rate_limit.backoff('cars.com', rate_limit.BLOCKED_BACKOFF)
+            else:
+                allowed = rate_limit.acquire('cars.com')
+            if not allowed:
+                raise deadline.DeadlineExceeded("No cars.com request slot within the time budget")
+            
+            # Make request with reasonable timeout (revalidates a cached copy if we have one)
+            response, cached_data = http_cache.conditional_get(session, url, timeout=deadline.timeout(10), allow_redirects=True)
+            if cached_data is not None:
+                return cached_data
             response.raise_for_status()
             
             print(f"✅ Successfully got response: {response.status_code}")
             print(f"📄 Content length: {len(response.content)} bytes")
             
-            # Parse HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Debug: Print page title
-            title_tag = soup.find('title')
-            if title_tag:
-                print(f"📋 Page title: {title_tag.get_text()}")
-            
-            # Initialize result with all fields
-            car_data = {
-                "Title": "N/A",
-                "Year": "N/A",
-                "Brand": "N/A", 
-                "Model": "N/A",
-                "Price": "N/A", 
-                "Mileage": "N/A",
-                "Dealer": "N/A",
-                "Exterior Color": "N/A",
-                "Interior Color": "N/A",
-                "Drivetrain": "N/A",
-                "Fuel Type": "N/A",
-                "Transmission": "N/A",
-                "Engine": "N/A",
-                "VIN": "N/A",
-                "Stock #": "N/A",
-                "Images": [],
-                "URL": url
-            }
-            
-            # Try to find title with most effective selectors first
-            title_selectors = [
-                'h1[data-cmp="vdp_vehicle_title"]',
-                'h1.vehicle-title',
-                'h1[class*="title"]',
-                '.vdp-title',
-                'h1',
-                '[data-testid="vehicle-title"]'
-            ]
-            
-            for selector in title_selectors:
-                try:
-                    title_elem = soup.select_one(selector)
-                    if title_elem and title_elem.get_text(strip=True):
-                        car_data["Title"] = title_elem.get_text(strip=True)
-                        print(f"✅ Found title: {car_data['Title']}")
-                        break
-                except:
-                    continue
-            
-            # Try to find price with most effective selectors first
-            price_selectors = [
-                '[data-cmp="vdp_price"]',
-                '.price-section .primary-price',
-                '.vehicle-price',
-                '.price-display',
-                '[class*="price"]',
-                '[data-testid="price"]'
-            ]
-            
-            for selector in price_selectors:
-                try:
-                    price_elem = soup.select_one(selector)
-                    if price_elem and price_elem.get_text(strip=True):
-                        price_text = price_elem.get_text(strip=True)
-                        # Look for price pattern
-                        price_match = re.search(r'[\$,\d]+', price_text)
-                        if price_match:
-                            car_data["Price"] = price_match.group()
-                            print(f"✅ Found price: {car_data['Price']}")
-                            break
-                except:
-                    continue
-            
-            # Try to find mileage with most effective selectors first
-            mileage_selectors = [
-                '[data-cmp="vdp_mileage"]',
-                '.vehicle-mileage',
-                '.mileage',
-                '[class*="mileage"]',
-                '[data-testid="mileage"]'
-            ]
-            
-            for selector in mileage_selectors:
-                try:
-                    mileage_elem = soup.select_one(selector)
-                    if mileage_elem and mileage_elem.get_text(strip=True):
-                        mileage_text = mileage_elem.get_text(strip=True)
-                        mileage_match = re.search(r'[\d,]+', mileage_text)
-                        if mileage_match:
-                            car_data["Mileage"] = mileage_match.group() + " miles"
-                            print(f"✅ Found mileage: {car_data['Mileage']}")
-                            break
-                except:
-                    continue
-            
-            # Try to find dealer with most effective selectors first
-            dealer_selectors = [
-                '[data-cmp="vdp_dealer_name"]',
-                '.dealer-name',
-                '.dealer-info',
-                '[class*="dealer"]',
-                '[data-testid="dealer-name"]'
-            ]
-            
-            for selector in dealer_selectors:
-                try:
-                    dealer_elem = soup.select_one(selector)
-                    if dealer_elem and dealer_elem.get_text(strip=True):
-                        car_data["Dealer"] = dealer_elem.get_text(strip=True)
-                        print(f"✅ Found dealer: {car_data['Dealer']}")
-                        break
-                except:
-                    continue
-            
-            # Extract additional car specifications (streamlined for speed)
-            print("🔍 Looking for car specifications...")
-            
-            # Look for dt/dd pairs which are common for specifications (faster approach)
-            dt_elements = soup.find_all('dt')
-            for dt in dt_elements:
-                dt_text = dt.get_text().strip().lower()
-                dd = dt.find_next_sibling('dd')
-                if dd:
-                    dd_text = dd.get_text().strip()
-                    if dd_text and len(dd_text) < 100:  # Reasonable length
-                        if 'exterior' in dt_text and 'color' in dt_text and car_data['Exterior Color'] == "N/A":
-                            car_data['Exterior Color'] = dd_text
-                            print(f"✅ Found Exterior Color: {dd_text}")
-                        elif 'interior' in dt_text and 'color' in dt_text and car_data['Interior Color'] == "N/A":
-                            car_data['Interior Color'] = dd_text
-                            print(f"✅ Found Interior Color: {dd_text}")
-                        elif 'drivetrain' in dt_text and car_data['Drivetrain'] == "N/A":
-                            car_data['Drivetrain'] = dd_text
-                            print(f"✅ Found Drivetrain: {dd_text}")
-                        elif 'fuel' in dt_text and 'type' in dt_text and car_data['Fuel Type'] == "N/A":
-                            car_data['Fuel Type'] = dd_text
-                            print(f"✅ Found Fuel Type: {dd_text}")
-                        elif 'transmission' in dt_text and car_data['Transmission'] == "N/A":
-                            car_data['Transmission'] = dd_text
-                            print(f"✅ Found Transmission: {dd_text}")
-                        elif 'engine' in dt_text and car_data['Engine'] == "N/A":
-                            car_data['Engine'] = dd_text
-                            print(f"✅ Found Engine: {dd_text}")
-                        elif 'vin' in dt_text and car_data['VIN'] == "N/A":
-                            car_data['VIN'] = dd_text
-                            print(f"✅ Found VIN: {dd_text}")
-                        elif 'stock' in dt_text and car_data['Stock #'] == "N/A":
-                            car_data['Stock #'] = dd_text
-                            print(f"✅ Found Stock #: {dd_text}")
-            
-            
-            # Look for mileage specifically
-            if car_data['Mileage'] == "N/A":
-                mileage_patterns = [r'(\d{1,3}(?:,\d{3})*)\s*(?:miles?|mi\.?)', r'mileage[:\s]*(\d{1,3}(?:,\d{3})*)\s*(?:miles?|mi\.?)']
-                for pattern in mileage_patterns:
-                    match = re.search(pattern, soup.get_text(), re.IGNORECASE)
-                    if match:
-                        mileage = match.group(1) + " miles"
-                        car_data['Mileage'] = mileage
-                        print(f"✅ Found Mileage: {mileage}")
-                        break
-            
-            # Improve Engine extraction - simplified for speed
-            if car_data['Engine'] == "N/A" or len(car_data['Engine']) < 20:
-                # Look for engine patterns in the page text
-                page_text = soup.get_text()
-                engine_patterns = [
-                    r'engine[:\s]*([^,\n\r]+(?:,\s*[^,\n\r]+){1,})',
-                    r'(\d+\.?\d*L?\s*I-\d+\s*[^,\n\r]+(?:,\s*[^,\n\r]+){1,})'
-                ]
-                
-                for pattern in engine_patterns:
-                    match = re.search(pattern, page_text, re.IGNORECASE)
-                    if match:
-                        engine = match.group(1).strip()
-                        engine = re.sub(r'\s+', ' ', engine)  # Remove extra spaces
-                        engine = engine.rstrip(',')
-                        if len(engine) > 10 and len(engine) < 200:  # Reasonable length
-                            car_data['Engine'] = engine
-                            print(f"✅ Found complete Engine: {engine}")
-                            break
-            
-            # Improve VIN extraction - simplified for speed
-            if car_data['VIN'] == "N/A" or len(car_data['VIN']) < 15:
-                page_text = soup.get_text()
-                vin_patterns = [
-                    r'vin[:\s]*([A-HJ-NPR-Z0-9]{17})',  # Standard VIN format
-                    r'([A-HJ-NPR-Z0-9]{17})'  # Just look for 17-character alphanumeric
-                ]
-                
-                for pattern in vin_patterns:
-                    match = re.search(pattern, page_text, re.IGNORECASE)
-                    if match:
-                        vin = match.group(1).strip().upper()
-                        if len(vin) >= 15:  # Minimum VIN length
-                            car_data['VIN'] = vin
-                            print(f"✅ Found VIN: {vin}")
-                            break
-            
-            # Extract car images
-            print("🔍 Looking for car images...")
-            images = []
-            
-            # Debug: Let's see what img tags exist
-            all_imgs = soup.find_all('img')
-            print(f"🔍 Found {len(all_imgs)} total img tags on page")
-            
-            # Look for images with most effective selectors first
-            image_selectors = [
-                'img[data-cmp="vdp_photo"]',
-                'img[data-cmp*="photo"]',
-                '.vehicle-photos img',
-                '.gallery img',
-                '.car-photos img',
-                'img[src*="vehicle"]',
-                'img[src*="car"]'
-            ]
-            
-            for selector in image_selectors:
-                try:
-                    img_elements = soup.select(selector)
-                    for img in img_elements:
-                        # Get the image source
-                        img_src = img.get('src') or img.get('data-src') or img.get('data-lazy')
-                        if img_src:
-                            # Convert relative URLs to absolute URLs
-                            if img_src.startswith('//'):
-                                img_src = 'https:' + img_src
-                            elif img_src.startswith('/'):
-                                img_src = 'https://www.cars.com' + img_src
-                            elif not img_src.startswith('http'):
-                                img_src = 'https://www.cars.com' + img_src
-                            
-                            # Filter out small images, icons, and non-car images
-                            img_width = img.get('width', '0')
-                            img_height = img.get('height', '0')
-                            
-                            # Check if it's a car-related image
-                            img_alt = img.get('alt', '').lower()
-                            img_class = img.get('class', [])
-                            img_class_str = ' '.join(img_class).lower()
-                            
-                            # Skip if it's clearly not a car image
-                            if any(skip_word in img_alt or skip_word in img_class_str for skip_word in ['logo', 'icon', 'dealer', 'advertisement', 'banner', 'sponsor']):
-                                continue
-                            
-                            # Skip very small images (likely icons)
-                            if img_width and int(img_width) < 100 and img_height and int(img_height) < 100:
-                                continue
-                            
-                            # Skip images that are clearly not car photos
-                            if any(skip_word in img_src.lower() for skip_word in ['logo', 'icon', 'banner', 'ad', 'sponsor']):
-                                continue
-                            
-                            images.append(img_src)
-                            print(f"✅ Found image: {img_src}")
-                except:
-                    continue
-            
-            # Remove duplicates while preserving order
-            seen = set()
-            unique_images = []
-            for img in images:
-                if img not in seen:
-                    seen.add(img)
-                    unique_images.append(img)
-            
-            # If no images found with selectors, try a more aggressive approach (limited for speed)
-            if len(unique_images) == 0:
-                print("🔍 No images found with selectors, trying aggressive approach...")
-                # Limit to first 50 images for speed
-                for img in all_imgs[:50]:
-                    img_src = img.get('src') or img.get('data-src') or img.get('data-lazy')
-                    if img_src:
-                        # Convert relative URLs to absolute URLs
-                        if img_src.startswith('//'):
-                            img_src = 'https:' + img_src
-                        elif img_src.startswith('/'):
-                            img_src = 'https://www.cars.com' + img_src
-                        elif not img_src.startswith('http'):
-                            img_src = 'https://www.cars.com' + img_src
-                        
-                        # Look for car-related image URLs
-                        if any(car_word in img_src.lower() for car_word in ['vehicle', 'car', 'photo', 'image', 'listing']):
-                            # Skip very small images and non-car images
-                            img_alt = img.get('alt', '').lower()
-                            if not any(skip_word in img_alt for skip_word in ['logo', 'icon', 'dealer', 'advertisement', 'banner']):
-                                unique_images.append(img_src)
-                                print(f"✅ Found image (aggressive): {img_src}")
-                                # Limit to 20 images for speed
-                                if len(unique_images) >= 20:
-                                    break
-            
-            car_data['Images'] = unique_images
-            print(f"✅ Found {len(unique_images)} car images")
-            
-            # Parse title to extract year, brand, and model
-            if car_data["Title"] != "N/A":
-                title = car_data["Title"]
-                print(f"🔍 Parsing title: {title}")
-                
-                # Try to extract year (first 4-digit number)
-                year_match = re.search(r'\b(19|20)\d{2}\b', title)
-                if year_match:
-                    car_data["Year"] = year_match.group()
-                    print(f"✅ Found year: {car_data['Year']}")
-                
-                # Extract brand and model
-                # Remove year from title for easier parsing
-                title_without_year = re.sub(r'\b(19|20)\d{2}\b\s*', '', title).strip()
-                words = title_without_year.split()
-                
-                if len(words) >= 2:
-                    # First word is usually the brand
-                    car_data["Brand"] = words[0]
-                    # Rest is the model
-                    car_data["Model"] = " ".join(words[1:])
-                    print(f"✅ Found brand: {car_data['Brand']}")
-                    print(f"✅ Found model: {car_data['Model']}")
-                elif len(words) == 1:
-                    car_data["Brand"] = words[0]
-                    car_data["Model"] = "N/A"
-            
-            # Clean up
-            for key, value in car_data.items():
-                if isinstance(value, list):
-                    # Skip list values (like Images)
-                    continue
-                if not value or (isinstance(value, str) and value.strip() == ""):
-                    car_data[key] = "N/A"
+            # Hand the raw bytes to the extraction pool (runs inline if no pool is configured)
+            car_data = parse_pool.extract('cars.com', response.content, url)
             
             # If we got real data, return it
             if car_data["Title"] != "N/A":
                 print("🎉 Successfully scraped real data!")
+                http_cache.store(url, response, car_data)
                 return car_data
             else:
                 print("⚠️  No real data found, trying next attempt...")
+                if _filled(car_data) > _filled(best_data):
+                    best_data = car_data
                 continue
                 
         except Exception as e:
             print(f"❌ Attempt {attempt + 1} failed: {str(e)}")
+            if isinstance(e, requests.HTTPError) and e.response is not None \
+                    and e.response.status_code in rate_limit.BLOCKED_STATUSES:
+                blocked = True
             if attempt == 2:  # Last attempt
-                print("⚠️  All requests failed, trying Selenium fallback...")
-                try:
-                    return try_selenium_scraping(url)
-                except Exception as selenium_error:
-                    print(f"❌ Selenium also failed: {str(selenium_error)}")
-                    print("⚠️  Using demo data as final fallback...")
-                    return get_quick_demo_data(url)
+                if best_data is not None and deadline.remaining() is not None:
+                    break
+                # A browser would bypass a fake_upstream stand-in and hit the real site
+                if os.environ.get('SCRAPER_UPSTREAM'):
+                    print("🧪 Stand-in upstream: skipping the Selenium fallback")
+                elif deadline.allows(SELENIUM_SECONDS, "Selenium fallback"):
+                    print("⚠️  All requests failed, trying Selenium fallback...")
+                    try:
+                        return try_selenium_scraping(url)
+                    except Exception as selenium_error:
+                        print(f"❌ Selenium also failed: {str(selenium_error)}")
+                print("⚠️  Using demo data as final fallback...")
+                return get_quick_demo_data(url)
             continue
     
+    # Under a time budget a partly filled real page beats demo data
+    if best_data is not None and deadline.remaining() is not None:
+        print("⏱️  Returning the best partial result within the time budget")
+        return best_data
+    
     # If we get here, all attempts failed
     print("⚠️  All real scraping attempts failed, using quick fallback...")
     return get_quick_demo_data(url)
 
+def _filled(car_data) -> int:
+    """Number of fields a scrape actually found (0 for None)"""
+    if not car_data:
+        return 0
+    return sum(1 for key, value in car_data.items()
+               if key != "URL" and value and value != "N/A")
+
+def _is_photo(img) -> bool:
+    """cars.com marks its listing gallery photos with data-cmp='vdp_photo'"""
+    return 'photo' in (img.get('data-cmp') or '')
+
+def _extract_images(soup, car_data: dict, sources):
+    """Find listing photos (the site's photo markers and galleries first, then any car-looking img)"""
+    print("🔍 Looking for car images...")
+    images = image_collector.collect_images(
+        soup, 'https://www.cars.com/', primary=_is_photo,
+        keep=('vehicle', 'car', 'photo', 'image', 'listing'),
+        skip=('dealer',), fallback_only=True)
+    
+    car_data['Images'] = images
+    print(f"✅ Found {len(images)} car images")
+    if images:
+        sources.found('Images', 'img selectors', 0.7)
+
+def extract_car_data(content: bytes, url: str, early: bool = False, include=(), fields=None) -> dict:
+    """
+    Extract car data from a fetched cars.com listing page
+    
+    Args:
+        content (bytes): Raw HTML of the listing page
+        url (str): The cars.com listing URL
+        early (bool): Stop once Title, Price, Mileage and VIN are found and
+            skip the image pass
+        include (tuple): Optional passes to run even in early mode ('images')
+        fields (frozenset): Field keys to extract (see provenance.parse_fields);
+            stages that only fill other fields are skipped. The title is
+            always read, it tells a real listing from a blocked page
+        
+    Returns:
+        dict: Dictionary containing car information
+    """
+    
+    # Parse HTML
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    # Debug: Print page title
+    title_tag = soup.find('title')
+    if title_tag:
+        print(f"📋 Page title: {title_tag.get_text()}")
+    
+    # Initialize result with all fields
+    car_data = {
+        "Title": "N/A",
+        "Year": "N/A",
+        "Brand": "N/A", 
+        "Model": "N/A",
+        "Price": "N/A", 
+        "Mileage": "N/A",
+        "Dealer": "N/A",
+        "Exterior Color": "N/A",
+        "Interior Color": "N/A",
+        "Drivetrain": "N/A",
+        "Fuel Type": "N/A",
+        "Transmission": "N/A",
+        "Engine": "N/A",
+        "VIN": "N/A",
+        "Stock #": "N/A",
+        "Images": [],
+        "URL": url
+    }
+    sources = provenance.Sources('cars.com:html')
+    
+    # Try to find title with most effective selectors first
+    title_selectors = [
+        'h1[data-cmp="vdp_vehicle_title"]',
+        'h1.vehicle-title',
+        'h1[class*="title"]',
+        '.vdp-title',
+        'h1',
+        '[data-testid="vehicle-title"]'
+    ]
+    
+    for selector in title_selectors:
+        try:
+            title_elem = soup.select_one(selector)
+            if title_elem and title_elem.get_text(strip=True):
+                car_data["Title"] = title_elem.get_text(strip=True)
+                sources.found("Title", selector)
+                print(f"✅ Found title: {car_data['Title']}")
+                break
+        except:
+            continue
+    
+    # Try to find price with most effective selectors first
+    price_selectors = [
+        '[data-cmp="vdp_price"]',
+        '.price-section .primary-price',
+        '.vehicle-price',
+        '.price-display',
+        '[class*="price"]',
+        '[data-testid="price"]'
+    ]
+    
+    if provenance.wants_any(fields, "Price"):
+        for selector in price_selectors:
+            try:
+                price_elem = soup.select_one(selector)
+                if price_elem and price_elem.get_text(strip=True):
+                    price_text = price_elem.get_text(strip=True)
+                    # Look for price pattern
+                    price_match = re.search(r'[\$,\d]+', price_text)
+                    if price_match:
+                        car_data["Price"] = price_match.group()
+                        sources.found("Price", selector)
+                        print(f"✅ Found price: {car_data['Price']}")
+                        break
+            except:
+                continue
+    
+    # Try to find mileage with most effective selectors first
+    mileage_selectors = [
+        '[data-cmp="vdp_mileage"]',
+        '.vehicle-mileage',
+        '.mileage',
+        '[class*="mileage"]',
+        '[data-testid="mileage"]'
+    ]
+    
+    if provenance.wants_any(fields, "Mileage"):
+        for selector in mileage_selectors:
+            try:
+                mileage_elem = soup.select_one(selector)
+                if mileage_elem and mileage_elem.get_text(strip=True):
+                    mileage_text = mileage_elem.get_text(strip=True)
+                    mileage_match = re.search(r'[\d,]+', mileage_text)
+                    if mileage_match:
+                        car_data["Mileage"] = mileage_match.group() + " miles"
+                        sources.found("Mileage", selector)
+                        print(f"✅ Found mileage: {car_data['Mileage']}")
+                        break
+            except:
+                continue
+    
+    # Try to find dealer with most effective selectors first
+    dealer_selectors = [
+        '[data-cmp="vdp_dealer_name"]',
+        '.dealer-name',
+        '.dealer-info',
+        '[class*="dealer"]',
+        '[data-testid="dealer-name"]'
+    ]
+    
+    if provenance.wants_any(fields, "Dealer"):
+        for selector in dealer_selectors:
+            try:
+                dealer_elem = soup.select_one(selector)
+                if dealer_elem and dealer_elem.get_text(strip=True):
+                    car_data["Dealer"] = dealer_elem.get_text(strip=True)
+                    sources.found("Dealer", selector)
+                    print(f"✅ Found dealer: {car_data['Dealer']}")
+                    break
+            except:
+                continue
+    
+    # Extract additional car specifications (streamlined for speed)
+    print("🔍 Looking for car specifications...")
+    
+    # Look for dt/dd pairs which are common for specifications (faster approach)
+    if provenance.wants_any(fields, *SPEC_FIELDS):
+        dt_elements = soup.find_all('dt')
+        for dt in dt_elements:
+            dt_text = dt.get_text().strip().lower()
+            dd = dt.find_next_sibling('dd')
+            if dd:
+                dd_text = dd.get_text().strip()
+                if dd_text and len(dd_text) < 100:  # Reasonable length
+                    if 'exterior' in dt_text and 'color' in dt_text and car_data['Exterior Color'] == "N/A":
+                        car_data['Exterior Color'] = dd_text
+                        sources.found('Exterior Color', 'dt/dd', 0.85)
+                        print(f"✅ Found Exterior Color: {dd_text}")
+                    elif 'interior' in dt_text and 'color' in dt_text and car_data['Interior Color'] == "N/A":
+                        car_data['Interior Color'] = dd_text
+                        sources.found('Interior Color', 'dt/dd', 0.85)
+                        print(f"✅ Found Interior Color: {dd_text}")
+                    elif 'drivetrain' in dt_text and car_data['Drivetrain'] == "N/A":
+                        car_data['Drivetrain'] = dd_text
+                        sources.found('Drivetrain', 'dt/dd', 0.85)
+                        print(f"✅ Found Drivetrain: {dd_text}")
+                    elif 'fuel' in dt_text and 'type' in dt_text and car_data['Fuel Type'] == "N/A":
+                        car_data['Fuel Type'] = dd_text
+                        sources.found('Fuel Type', 'dt/dd', 0.85)
+                        print(f"✅ Found Fuel Type: {dd_text}")
+                    elif 'transmission' in dt_text and car_data['Transmission'] == "N/A":
+                        car_data['Transmission'] = dd_text
+                        sources.found('Transmission', 'dt/dd', 0.85)
+                        print(f"✅ Found Transmission: {dd_text}")
+                    elif 'engine' in dt_text and car_data['Engine'] == "N/A":
+                        car_data['Engine'] = dd_text
+                        sources.found('Engine', 'dt/dd', 0.85)
+                        print(f"✅ Found Engine: {dd_text}")
+                    elif 'vin' in dt_text and car_data['VIN'] == "N/A":
+                        car_data['VIN'] = dd_text.replace(' ', '').upper()
+                        sources.found('VIN', 'dt/dd', 0.85)
+                        print(f"✅ Found VIN: {dd_text}")
+                    elif 'stock' in dt_text and car_data['Stock #'] == "N/A":
+                        car_data['Stock #'] = dd_text
+                        sources.found('Stock #', 'dt/dd', 0.85)
+                        print(f"✅ Found Stock #: {dd_text}")
+    
+    
+    # Early mode: once the required fields are in, skip the slower text passes
+    required_done = early and provenance.complete(car_data)
+    
+    # Look for mileage specifically
+    if car_data['Mileage'] == "N/A" and provenance.wants_any(fields, "Mileage"):
+        mileage_patterns = [r'(\d{1,3}(?:,\d{3})*)\s*(?:miles?|mi\.?)', r'mileage[:\s]*(\d{1,3}(?:,\d{3})*)\s*(?:miles?|mi\.?)']
+        for pattern in mileage_patterns:
+            match = re.search(pattern, soup.get_text(), re.IGNORECASE)
+            if match:
+                mileage = match.group(1) + " miles"
+                car_data['Mileage'] = mileage
+                sources.found('Mileage', pattern, 0.5)
+                print(f"✅ Found Mileage: {mileage}")
+                break
+    
+    # Improve Engine extraction - simplified for speed
+    page_text = None  # soup.get_text(), computed at most once for the scans below
+    if not required_done and provenance.wants_any(fields, "Engine") and (car_data['Engine'] == "N/A" or len(car_data['Engine']) < 20):
+        # Look for engine patterns in the page text
+        page_text = soup.get_text()
+        engine_patterns = [
+            r'engine[:\s]*([^,\n\r]+(?:,\s*[^,\n\r]+){1,})',
+            r'(\d+\.?\d*L?\s*I-\d+\s*[^,\n\r]+(?:,\s*[^,\n\r]+){1,})'
+        ]
+        
+        for pattern in engine_patterns:
+            match = re.search(pattern, page_text, re.IGNORECASE)
+            if match:
+                engine = match.group(1).strip()
+                engine = re.sub(r'\s+', ' ', engine)  # Remove extra spaces
+                engine = engine.rstrip(',')
+                if len(engine) > 10 and len(engine) < 200:  # Reasonable length
+                    car_data['Engine'] = engine
+                    sources.found('Engine', pattern, 0.5)
+                    print(f"✅ Found complete Engine: {engine}")
+                    break
+    
+    # VIN fallback: every 17-character run in one scan, filtered by check digit
+    # and plausibility and ranked by closeness to a "VIN" label (tracking IDs drop out)
+    if provenance.wants_any(fields, "VIN") and not vin_decoder.is_valid(car_data['VIN']):
+        if page_text is None:
+            page_text = soup.get_text()
+        candidate = vin_decoder.extract_vin(page_text)
+        if candidate:
+            car_data['VIN'] = candidate['vin']
+            sources.found('VIN', 'vin scan', candidate['confidence'])
+            print(f"✅ Found VIN: {candidate['vin']}")
+    
+    # Extract car images (skipped in early mode unless asked for)
+    if (not early or 'images' in include) and provenance.wants_any(fields, "Images"):
+        _extract_images(soup, car_data, sources)
+    
+    # Year, brand and model from the make/model catalogue
+    parsed = car_data["Title"] != "N/A" and title_parser.apply(car_data, sources)
+    
+    # Fallback for makes the catalogue does not know: split the title
+    if car_data["Title"] != "N/A" and not parsed:
+        title = car_data["Title"]
+        print(f"🔍 Parsing title: {title}")
+        
+        # Try to extract year (first 4-digit number)
+        year_match = re.search(r'\b(19|20)\d{2}\b', title)
+        if year_match:
+            car_data["Year"] = year_match.group()
+            sources.found("Year", "title", 0.7)
+            print(f"✅ Found year: {car_data['Year']}")
+        
+        # Extract brand and model
+        # Remove year from title for easier parsing
+        title_without_year = re.sub(r'\b(19|20)\d{2}\b\s*', '', title).strip()
+        words = title_without_year.split()
+        
+        if len(words) >= 2:
+            # First word is usually the brand
+            car_data["Brand"] = words[0]
+            # Rest is the model
+            car_data["Model"] = " ".join(words[1:])
+            sources.found("Brand", "title", 0.7)
+            sources.found("Model", "title", 0.7)
+            print(f"✅ Found brand: {car_data['Brand']}")
+            print(f"✅ Found model: {car_data['Model']}")
+        elif len(words) == 1:
+            car_data["Brand"] = words[0]
+            car_data["Model"] = "N/A"
+    
+    # Fill or correct Year/Brand/Model from the VIN (offline lookup)
+    if provenance.wants_any(fields, "Year", "Brand", "Model"):
+        vin_decoder.apply(car_data, sources)
+    
+    # Clean up
+    for key, value in car_data.items():
+        if isinstance(value, list):
+            # Skip list values (like Images)
+            continue
+        if not value or (isinstance(value, str) and value.strip() == ""):
+            car_data[key] = "N/A"
+    
+    return sources.attach(car_data)
+
 def get_quick_demo_data(url: str) -> dict:
     """
     Generate quick demo data based on URL for fast fallback
@@ -500,6 +535,7 @@ def get_quick_demo_data(url: str) -> dict:
     }
     
     print("📝 Using quick demo data (real scraping failed)")
+    provenance.mark_demo(demo_data)
     return demo_data
 
 def try_selenium_scraping(url: str) -> dict:
@@ -534,7 +570,7 @@ def try_selenium_scraping(url: str) -> dict:
             driver.get(url)
             
             # Wait for page to load
-            WebDriverWait(driver, 10).until(
+            WebDriverWait(driver, deadline.timeout(10)).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
             
@@ -650,8 +686,9 @@ def try_selenium_scraping(url: str) -> dict:
                 except:
                     continue
             
-            # Parse title to extract year, brand, and model
-            if car_data["Title"] != "N/A":
+            # Year, brand and model from the make/model catalogue, else split the title
+            parsed = car_data["Title"] != "N/A" and title_parser.apply(car_data)
+            if car_data["Title"] != "N/A" and not parsed:
                 title = car_data["Title"]
                 print(f"🔍 Parsing title: {title}")
                 
@@ -684,6 +721,7 @@ def try_selenium_scraping(url: str) -> dict:
             # If we got real data, return it
             if car_data["Title"] != "N/A":
                 print("🎉 Successfully scraped real data with Selenium!")
+                provenance.record_all(car_data, 'cars.com:selenium', 0.8)
                 return car_data
             else:
                 print("⚠️  No real data found with Selenium")
@@ -1,6 +1,13 @@
 from requests_html import HTMLSession
 import re
 import time
+import sys
+import os
+
+# Shared scraper modules live one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import deadline
+import provenance
 
 def scrape_car_requests_html(url: str) -> dict:
     """
@@ -39,8 +46,8 @@ def scrape_car_requests_html(url: str) -> dict:
         print(f"🌐 Navigating to: {url}")
         
         # Get the page and render JavaScript
-        r = session.get(url, headers=headers, timeout=30)
-        r.html.render(timeout=20, wait=2)  # Wait 2 seconds for JS to load
+        r = session.get(url, headers=headers, timeout=deadline.timeout(30))
+        r.html.render(timeout=deadline.timeout(20), wait=2)  # Wait 2 seconds for JS to load
         
         # Initialize result dictionary
         car_data = {
@@ -165,6 +172,7 @@ def scrape_car_requests_html(url: str) -> dict:
             if not value or value.strip() == "":
                 car_data[key] = "N/A"
         
+        provenance.record_all(car_data, 'cars.com:requests-html', 0.8)
         return car_data
         
     except Exception as e:
@@ -0,0 +1,210 @@
+"""
+Crawler for cars.com search result pages
+
+Walks the pages of a cars.com search URL and reads a summary of every
+listing straight from the result cards (title, price, mileage, dealer),
+which is one request per page instead of one per car. The summaries are
+checked against a ListingIndex and only new listings, or listings whose
+price or mileage changed, are returned for a full detail scrape.
+"""
+
+import re
+import sys
+import os
+import argparse
+from urllib.parse import urlparse, urlencode, parse_qs, urlunparse, urljoin
+
+import requests
+from bs4 import BeautifulSoup
+
+# Shared scraper modules live one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import parse_pool
+import rate_limit
+import listing_index
+
+SITE = 'cars.com'
+
+# Card fields that trigger a new detail scrape when they change
+FINGERPRINT_FIELDS = ('Price', 'Mileage')
+
+# Largest page size cars.com serves, fewer requests per inventory
+PAGE_SIZE = 100
+
+def page_url(search_url: str, page: int) -> str:
+    """Return the search URL for a given result page"""
+    parsed = urlparse(search_url)
+    query = parse_qs(parsed.query)
+    query['page'] = [str(page)]
+    query.setdefault('page_size', [str(PAGE_SIZE)])
+    return urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
+
+def _card_text(card, selectors):
+    for selector in selectors:
+        elem = card.select_one(selector)
+        if elem and elem.get_text(strip=True):
+            return elem.get_text(strip=True)
+    return "N/A"
+
+def parse_search_page(content: bytes, url: str) -> list:
+    """
+    Extract listing summaries from a cars.com search results page
+
+    Args:
+        content (bytes): Raw HTML of the results page
+        url (str): The results page URL (used to resolve relative links)
+
+    Returns:
+        list: One summary dict per result card
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    summaries = []
+    seen_ids = set()
+
+    cards = soup.select('div.vehicle-card, [data-listing-id]')
+    for card in cards:
+        link = card.select_one('a[href*="/vehicledetail/"]')
+        if not link:
+            continue
+
+        detail_url = urljoin('https://www.cars.com', link.get('href').split('?')[0])
+        id_match = re.search(r'/vehicledetail/([^/]+)/', detail_url)
+        listing_id = card.get('data-listing-id') or (id_match.group(1) if id_match else detail_url)
+        if listing_id in seen_ids:
+            continue
+        seen_ids.add(listing_id)
+
+        summary = {
+            "ListingId": listing_id,
+            "URL": detail_url,
+            "Title": _card_text(card, ['h2.title', '.title', 'h2']),
+            "Price": "N/A",
+            "Mileage": "N/A",
+            "Dealer": _card_text(card, ['.dealer-name', '[class*="dealer-name"]']),
+            "StockType": _card_text(card, ['.stock-type', '[class*="stock-type"]']),
+        }
+
+        price_text = _card_text(card, ['.primary-price', '[class*="primary-price"]', '[class*="price"]'])
+        price_match = re.search(r'\$[\d,]+', price_text)
+        if price_match:
+            summary["Price"] = price_match.group()
+
+        mileage_text = _card_text(card, ['.mileage', '[class*="mileage"]'])
+        mileage_match = re.search(r'[\d,]+', mileage_text)
+        if mileage_match:
+            summary["Mileage"] = mileage_match.group() + " miles"
+
+        summaries.append(summary)
+
+    return summaries
+
+def crawl_search(search_url: str, index=None, max_pages: int = 50, frontier=None, enqueue=None) -> dict:
+    """
+    Walk a cars.com search and pick out listings that need a detail scrape
+
+    Args:
+        search_url (str): A cars.com search URL (https://www.cars.com/shopping/results/?...)
+        index (ListingIndex): Store of previously seen listings (in-memory if None)
+        max_pages (int): Stop after this many result pages
+        frontier (CrawlFrontier): If given, new/changed listings are pushed onto it
+        enqueue (callable): If given, called with each page's new/changed detail
+            URLs; listings are only recorded in the index once it returns
+
+    Returns:
+        dict: 'summaries' (all cards seen), 'to_scrape' (detail URLs of new or
+        changed listings), 'new', 'changed', 'unchanged' counts and 'pages'
+    """
+    if not search_url or 'cars.com' not in search_url:
+        raise ValueError("Invalid cars.com search URL")
+
+    if index is None:
+        index = listing_index.ListingIndex()
+
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Referer': 'https://www.cars.com/',
+    })
+
+    result = {'summaries': [], 'to_scrape': [], 'new': 0, 'changed': 0, 'unchanged': 0, 'pages': 0}
+    seen_ids = set()
+
+    for page in range(1, max_pages + 1):
+        # Wait for a cars.com slot (shared by every scraper process)
+        if not rate_limit.acquire(SITE):
+            print("⏱️  No cars.com request slot within the time budget")
+            break
+
+        url = page_url(search_url, page)
+        print(f"📄 Fetching results page {page}: {url}")
+        try:
+            response = session.get(url, timeout=15, allow_redirects=True)
+            if response.status_code in rate_limit.BLOCKED_STATUSES and rate_limit.backoff(SITE, rate_limit.BLOCKED_BACKOFF):
+                # We were spotted: every process has slowed down on cars.com, try the page once more
+                response = session.get(url, timeout=15, allow_redirects=True)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"❌ Page {page} failed: {e}")
+            break
+
+        summaries = parse_pool.extract('cars.com:search', response.content, url)
+        fresh = [s for s in summaries if s["ListingId"] not in seen_ids]
+        if not fresh:
+            # Past the last page cars.com repeats the final page or returns nothing
+            print("🏁 No more results")
+            break
+
+        result['pages'] += 1
+        # Queue the page's new/changed listings before the index records them,
+        # so an interrupted crawl finds them new/changed again next time
+        queued = []
+        digests = []
+        for summary in fresh:
+            seen_ids.add(summary["ListingId"])
+            digest = listing_index.fingerprint(summary, FINGERPRINT_FIELDS)
+            digests.append(digest)
+            status = index.status(SITE, summary["ListingId"], digest)
+            result[status] += 1
+            result['summaries'].append(summary)
+            if status != listing_index.UNCHANGED:
+                queued.append(summary["URL"])
+                if frontier is not None:
+                    frontier.push(summary["URL"], payload=summary)
+        if enqueue is not None and queued:
+            enqueue(queued)
+        result['to_scrape'].extend(queued)
+        for summary, digest in zip(fresh, digests):
+            index.observe(SITE, summary["ListingId"], summary["URL"], summary, digest)
+
+        print(f"✅ Page {page}: {len(fresh)} listings ({len(result['to_scrape'])} queued so far)")
+
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl a cars.com search and queue new/changed listings")
+    parser.add_argument('search_url', help="cars.com search results URL")
+    parser.add_argument('--index', default='cars_com_index.sqlite', help="SQLite file of seen listings")
+    parser.add_argument('--max-pages', type=int, default=50)
+    parser.add_argument('--enqueue', default='cars_com_queue.txt',
+                        help="Append detail URLs needing a scrape here (input for bulk_scrape.py)")
+    args = parser.parse_args(argv)
+
+    index = listing_index.ListingIndex(args.index)
+    try:
+        with open(args.enqueue, 'a', encoding='utf-8') as f:
+            def enqueue(urls):
+                f.write(''.join(url + '\n' for url in urls))
+                f.flush()
+                os.fsync(f.fileno())
+            result = crawl_search(args.search_url, index, args.max_pages, enqueue=enqueue)
+    finally:
+        index.close()
+
+    print(f"🎉 {len(result['summaries'])} listings on {result['pages']} pages: "
+          f"{result['new']} new, {result['changed']} changed, {result['unchanged']} unchanged")
+    print(f"📝 Queued {len(result['to_scrape'])} detail URLs in {args.enqueue}")
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,13 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 import re
+import sys
+import os
+
+# Shared scraper modules live one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import deadline
+import provenance
 
 def scrape_car_selenium(url: str) -> dict:
     """
@@ -52,10 +59,12 @@ def scrape_car_selenium(url: str) -> dict:
         
         # Navigate to the URL
         print(f"🌐 Navigating to: {url}")
+        if deadline.remaining() is not None:
+            driver.set_page_load_timeout(deadline.timeout(deadline.remaining()))
         driver.get(url)
         
         # Wait for page to load
-        wait = WebDriverWait(driver, 10)
+        wait = WebDriverWait(driver, deadline.timeout(10))
         
         # Initialize result dictionary
         car_data = {
@@ -173,6 +182,7 @@ def scrape_car_selenium(url: str) -> dict:
             if not value or value.strip() == "":
                 car_data[key] = "N/A"
         
+        provenance.record_all(car_data, 'cars.com:selenium', 0.8)
         return car_data
         
     except Exception as e:
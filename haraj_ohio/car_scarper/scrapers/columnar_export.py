@@ -0,0 +1,249 @@
+"""
+Columnar export of scrape results (Parquet / Arrow)
+
+Builds one Arrow table per batch of results: the typed columns from
+batch_normalize (price, currency, odometer_km, year), dictionary-encoded
+string columns for values that repeat across listings (site, make, model,
+colours, transmission, fuel, drive, dealer) and list<string> columns for
+Images and Features. Keys that differ per site ("Brand"/"Make",
+"Exterior Color"/"ExteriorColor", ...) land in the same column.
+
+    python columnar_export.py results.jsonl -o results.parquet
+    python columnar_export.py results.jsonl -o results.arrow
+
+    pandas.read_parquet('results.parquet')   # or pyarrow.feather.read_table
+
+Parquet files are written one row group per batch, so a bulk output of
+any size is converted in constant memory. Arrow IPC files need a single
+dictionary per column, so those batches are unified and written at close.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import batch_normalize
+import provenance
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+FORMATS = ('parquet', 'arrow')
+
+# Rows per Parquet row group / conversion batch
+BATCH_SIZE = 50_000
+
+# Output column -> scraped keys (as provenance.field_key), first filled one wins
+STRING_COLUMNS = {
+    'title': ('title',),
+    'site': (),
+    'make': ('make',),
+    'model': ('model',),
+    'variant': ('variant',),
+    'make_id': ('makeid',),
+    'model_id': ('modelid',),
+    'transmission': ('transmission',),
+    'fuel_type': ('fueltype',),
+    'drive_type': ('drivetype', 'drivetrain'),
+    'engine': ('engine', 'enginesize'),
+    'body_type': ('bodytype',),
+    'exterior_color': ('exteriorcolor', 'bodycolour'),
+    'interior_color': ('interiorcolor',),
+    'dealer': ('dealer',),
+    'location': ('location',),
+    'vin': ('vin',),
+    'auction_date': ('auctiondate',),
+    'lot_number': ('lotnumber',),
+}
+
+# Low-cardinality columns stored dictionary-encoded
+DICTIONARY_COLUMNS = ('site', 'make', 'model', 'variant', 'make_id', 'model_id',
+                      'transmission', 'fuel_type', 'drive_type', 'body_type',
+                      'exterior_color', 'interior_color', 'dealer', 'location')
+
+LIST_COLUMNS = {'images': 'images', 'features': 'features'}
+
+def _require_arrow():
+    if pa is None:
+        raise ImportError("Columnar export needs pyarrow: pip install pyarrow")
+
+def _column(batch: list, raw_keys: dict, keys):
+    """String column from the first filled of several site-specific keys"""
+    columns = [batch_normalize.string_column(batch, raw)
+               for key in keys for raw in raw_keys.get(key, ())]
+    if not columns:
+        return pa.nulls(len(batch), pa.string())
+    return pc.coalesce(*columns) if len(columns) > 1 else columns[0]
+
+def _list_column(batch: list, raw_keys: dict, key: str):
+    """list<string> column; anything that is not a list (e.g. "N/A") becomes []"""
+    list_type = pa.list_(pa.string())
+    columns = []
+    for raw in raw_keys.get(key, ()):
+        values = [item.get(raw) for item in batch]
+        try:
+            if any(isinstance(value, str) for value in values):
+                raise pa.ArrowInvalid("strings in a list column")  # Arrow would split "N/A" into characters
+            columns.append(pa.array(values, list_type))
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            columns.append(pa.array([[str(entry) for entry in value if entry] if isinstance(value, (list, tuple)) else None
+                                     for value in values], list_type))
+    column = pc.coalesce(*columns) if len(columns) > 1 else (columns[0] if columns else pa.nulls(len(batch), list_type))
+    return pc.fill_null(column, pa.scalar([], list_type))
+
+def _site_column(urls):
+    site = pa.nulls(len(urls), pa.string())
+    for name, _ in batch_normalize.SITE_CURRENCY:
+        site = pc.if_else(pc.match_substring(urls, name), name, site)
+    return site
+
+def schema():
+    """The export schema (same for every batch, so batches can be appended)"""
+    _require_arrow()
+    fields = [
+        pa.field('url', pa.string()),
+        pa.field('price', batch_normalize.PRICE_TYPE),
+        pa.field('currency', pa.dictionary(pa.int8(), pa.string())),
+        pa.field('odometer_km', pa.int64()),
+        pa.field('year', pa.int16()),
+    ]
+    for name in STRING_COLUMNS:
+        if name in DICTIONARY_COLUMNS:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    for name in LIST_COLUMNS:
+        fields.append(pa.field(name, pa.list_(pa.string())))
+    return pa.schema(fields)
+
+def build_table(results: list):
+    """
+    Build the export table for a batch of results
+
+    Args:
+        results (list): Scraper dicts, bulk_scrape lines (failures skipped)
+            or CarRecord dicts
+
+    Returns:
+        pyarrow.Table: Table with schema()
+    """
+    _require_arrow()
+    batch = batch_normalize.unwrap(results)
+    typed = batch_normalize.normalize(batch)
+
+    # Site-specific spellings of each key present in this batch ('Fuel Type', 'FuelType', ...)
+    raw_keys = {}
+    for raw in set().union(*(item.keys() for item in batch)) if batch else ():
+        raw_keys.setdefault(provenance.field_key(raw), []).append(raw)
+
+    columns = {name: typed.column(name) for name in typed.column_names}
+    columns['currency'] = pc.dictionary_encode(columns['currency'])
+    for name, keys in STRING_COLUMNS.items():
+        column = _site_column(columns['url']) if name == 'site' else _column(batch, raw_keys, keys)
+        columns[name] = pc.dictionary_encode(column) if name in DICTIONARY_COLUMNS else column
+    for name, key in LIST_COLUMNS.items():
+        columns[name] = _list_column(batch, raw_keys, key)
+
+    return pa.table(columns).cast(schema())
+
+class ExportWriter:
+    """Appends batches of results to a Parquet or Arrow file"""
+
+    def __init__(self, path: str, fmt: str = None):
+        """
+        Args:
+            path (str): Output file (or a writable binary file object)
+            fmt (str): 'parquet' or 'arrow' (default: from the extension)
+        """
+        _require_arrow()
+        if fmt is None:
+            fmt = 'arrow' if str(path).endswith(('.arrow', '.feather', '.ipc')) else 'parquet'
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r} (use {' or '.join(FORMATS)})")
+        self.path = path
+        self.format = fmt
+        self.rows = 0
+        self._tables = []
+        self._parquet = None
+        if fmt == 'parquet':
+            self._parquet = pq.ParquetWriter(path, schema(), compression='zstd')
+
+    def write(self, results: list):
+        """Add a batch of results"""
+        table = build_table(results)
+        self.rows += table.num_rows
+        if self._parquet is not None:
+            self._parquet.write_table(table)
+        else:
+            self._tables.append(table)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            return
+        table = pa.concat_tables(self._tables or [schema().empty_table()]).unify_dictionaries()
+        with pa.ipc.new_file(self.path, table.schema) as writer:
+            writer.write_table(table.combine_chunks())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def export(results: list, path, fmt: str = None) -> int:
+    """
+    Write one batch of results to a file
+
+    Returns:
+        int: Rows written
+    """
+    with ExportWriter(path, fmt) as writer:
+        writer.write(results)
+    return writer.rows
+
+def export_jsonl(jsonl_path: str, path: str, fmt: str = None, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Convert a bulk_scrape JSONL output to Parquet/Arrow, batch_size lines at a time
+
+    Returns:
+        int: Rows written (failed scrapes are left out)
+    """
+    with ExportWriter(path, fmt) as writer, open(jsonl_path, encoding='utf-8') as f:
+        batch = []
+        for line in f:
+            if line.strip():
+                batch.append(_loads(line))
+            if len(batch) >= batch_size:
+                writer.write(batch)
+                batch = []
+        if batch:
+            writer.write(batch)
+    return writer.rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert bulk scrape results to Parquet or Arrow")
+    parser.add_argument('results', help="JSONL output of bulk_scrape.py")
+    parser.add_argument('-o', '--output', required=True, help="Output file (.parquet or .arrow)")
+    parser.add_argument('--format', choices=FORMATS, help="Output format (default: from the extension)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Lines per row group")
+    args = parser.parse_args(argv)
+
+    rows = export_jsonl(args.results, args.output, args.format, args.batch_size)
+    print(f"✅ Exported {rows} listings to {args.output}")
+
+if __name__ == "__main__":
+    main()
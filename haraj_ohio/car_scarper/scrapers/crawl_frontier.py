@@ -0,0 +1,214 @@
+"""
+Priority crawl frontier with per-domain queues
+
+Every domain (cars.com, manheim.com.au, carfax.com) has its own priority
+queue. An item's priority is the time it is "due": the earlier of its
+deadline (e.g. a Manheim lot's auction date) and the moment its last scrape
+goes stale, pulled forward by user-requested urgency.
+
+Across domains the scheduler is fair: items that are urgent (explicit
+urgency or a deadline inside the urgent window) are served first, most
+pressing first; otherwise domains take turns round-robin. An optional
+per-domain minimum interval keeps any one host from being hammered. So an
+auction closing tomorrow is never stuck behind a cars.com backfill.
+"""
+
+import time
+import heapq
+import itertools
+import threading
+from urllib.parse import urlparse
+
+# How long a scrape stays fresh when nothing else is known (seconds)
+DEFAULT_STALE_AFTER = 7 * 24 * 3600
+
+# Deadlines closer than this make an item urgent (seconds)
+DEFAULT_URGENT_WINDOW = 48 * 3600
+
+# How far each urgency level pulls an item forward (seconds)
+URGENCY_STEP = 24 * 3600
+
+class FrontierItem:
+    """A URL waiting in the frontier"""
+
+    __slots__ = ('url', 'domain', 'due', 'deadline', 'last_scraped', 'urgency', 'payload', 'urgent')
+
+    def __init__(self, url, domain, due, deadline, last_scraped, urgency, payload, urgent):
+        self.url = url
+        self.domain = domain
+        self.due = due
+        self.deadline = deadline
+        self.last_scraped = last_scraped
+        self.urgency = urgency
+        self.payload = payload
+        self.urgent = urgent
+
+    def __repr__(self):
+        return f"FrontierItem({self.url!r}, due={self.due:.0f}, urgency={self.urgency})"
+
+def default_domain(url: str) -> str:
+    """Group a URL under its site (www.cars.com -> cars.com)"""
+    from scraper_manager import get_site
+    try:
+        return get_site(url)
+    except ValueError:
+        return urlparse(url).netloc.lower()
+
+class CrawlFrontier:
+    """Thread-safe frontier of URLs to scrape, one priority queue per domain"""
+
+    def __init__(self, stale_after: float = DEFAULT_STALE_AFTER,
+                 urgent_window: float = DEFAULT_URGENT_WINDOW,
+                 min_interval: dict = None, domain_of=default_domain):
+        """
+        Args:
+            stale_after (float): Seconds after which a scraped listing is due again
+            urgent_window (float): Deadlines closer than this count as urgent
+            min_interval (dict): Optional minimum seconds between pops per domain
+            domain_of (callable): Maps a URL to its queue key
+        """
+        self.stale_after = stale_after
+        self.urgent_window = urgent_window
+        self.min_interval = dict(min_interval or {})
+        self.domain_of = domain_of
+
+        self._queues = {}          # domain -> heap of (due, seq, item)
+        self._entries = {}         # url -> live item (older heap entries are skipped)
+        self._next_allowed = {}    # domain -> earliest time of the next pop
+        self._last_served = {}     # domain -> turn counter of its last pop
+        self._turn = itertools.count()
+        self._seq = itertools.count()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def push(self, url: str, deadline: float = None, last_scraped: float = None,
+             urgency: int = 0, payload=None, due: float = None) -> bool:
+        """
+        Add a URL, or reprioritise it if it is already queued
+
+        Args:
+            url (str): Listing URL
+            deadline (float): Unix time the data is needed by (e.g. auction start)
+            last_scraped (float): Unix time of the previous scrape (None = never)
+            urgency (int): User-requested urgency, 0 = background
+            payload: Anything the caller wants back with the item
+            due (float): Unix time the URL goes stale, when the caller knows
+                better than last_scraped + stale_after (e.g. the refresher)
+
+        Returns:
+            bool: True if the URL was added or moved up, False if an equal or
+            more pressing entry was already queued
+        """
+        now = time.time()
+
+        # Never scraped means stale right now
+        if due is not None:
+            stale_at = due
+        else:
+            stale_at = (last_scraped + self.stale_after) if last_scraped else now
+        due = min(deadline, stale_at) if deadline else stale_at
+        due -= urgency * URGENCY_STEP
+
+        urgent = urgency > 0 or (deadline is not None and deadline - now <= self.urgent_window)
+        domain = self.domain_of(url)
+        item = FrontierItem(url, domain, due, deadline, last_scraped, urgency, payload, urgent)
+
+        with self._cond:
+            if self._closed:
+                return False
+            current = self._entries.get(url)
+            if current is not None and (current.urgent, -current.due) >= (urgent, -due):
+                return False
+
+            self._entries[url] = item
+            heapq.heappush(self._queues.setdefault(domain, []), (due, next(self._seq), item))
+            self._cond.notify()
+        return True
+
+    def _head(self, domain):
+        """Peek at a domain's live head, dropping superseded entries"""
+        queue = self._queues.get(domain)
+        while queue:
+            item = queue[0][2]
+            if self._entries.get(item.url) is item:
+                return item
+            heapq.heappop(queue)
+        return None
+
+    def _choose(self, now):
+        """Pick the domain to serve next, or return the seconds to wait"""
+        ready = []
+        wait = None
+        for domain in list(self._queues):
+            head = self._head(domain)
+            if head is None:
+                del self._queues[domain]
+                continue
+            allowed = self._next_allowed.get(domain, 0)
+            if allowed <= now:
+                ready.append((domain, head))
+            else:
+                wait = allowed - now if wait is None else min(wait, allowed - now)
+
+        if not ready:
+            return None, wait
+
+        urgent = [(head.due, domain) for domain, head in ready if head.urgent]
+        if urgent:
+            return min(urgent)[1], None
+
+        # Round-robin: the domain served longest ago goes next
+        return min(ready, key=lambda entry: self._last_served.get(entry[0], -1))[0], None
+
+    def pop(self, timeout: float = None):
+        """
+        Take the next URL to scrape
+
+        Blocks while URLs are queued but every domain is inside its minimum
+        interval. Returns None once the frontier is empty (or closed), or when
+        the timeout runs out.
+        """
+        end = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+
+                now = time.time()
+                domain, wait = self._choose(now)
+                if domain is not None:
+                    _, _, item = heapq.heappop(self._queues[domain])
+                    del self._entries[item.url]
+                    self._last_served[domain] = next(self._turn)
+                    self._next_allowed[domain] = now + self.min_interval.get(domain, 0)
+                    return item
+
+                if wait is None:
+                    return None  # Nothing queued
+                if end is not None:
+                    if now >= end:
+                        return None
+                    wait = min(wait, end - now)
+                self._cond.wait(wait)
+
+    def close(self):
+        """Stop handing out work and wake up every waiting pop()"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._entries)
+
+    def __contains__(self, url):
+        with self._cond:
+            return url in self._entries
+
+    def sizes(self) -> dict:
+        """Number of queued URLs per domain"""
+        with self._cond:
+            counts = {}
+            for item in self._entries.values():
+                counts[item.domain] = counts.get(item.domain, 0) + 1
+            return counts
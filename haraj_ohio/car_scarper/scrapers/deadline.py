@@ -0,0 +1,142 @@
+"""
+Time budgets for a single scrape
+
+A caller that needs an answer by a certain time (the API's budget_ms,
+a worker job) opens a budget around scrape_car. Every tier below reads it
+without it being passed through each function signature: network
+timeouts are clamped to what is left, sleeps and retries are cut short,
+and expensive fallbacks (JavaScript rendering, Selenium) are skipped when
+they cannot finish in time. The scraper then returns the best result it
+has, and the budget records what was skipped so the caller can tell a
+complete result from a partial one.
+
+    with deadline.budget(3000) as b:
+        car_data = scrape_car(url)
+    if b.skipped:
+        ...  # partial result
+
+Budgets live in a context variable, so concurrent API requests (one thread
+each) never see each other's budget. Without a budget every helper is a
+no-op and scrapers behave exactly as before.
+"""
+
+import time
+import contextvars
+from contextlib import contextmanager
+
+# Never hand a socket a timeout shorter than this (seconds)
+MIN_TIMEOUT = 0.5
+
+class DeadlineExceeded(Exception):
+    """Raised by check() when the budget is spent"""
+
+class Budget:
+    """Deadline of the current scrape and the steps cut because of it"""
+
+    __slots__ = ('deadline', 'skipped')
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.skipped = []
+
+    def remaining(self) -> float:
+        return self.deadline - time.time()
+
+_current = contextvars.ContextVar('scrape_budget', default=None)
+
+@contextmanager
+def budget(budget_ms: int = None):
+    """
+    Run the enclosed scrape within budget_ms milliseconds
+
+    Nested budgets can only tighten the deadline. With budget_ms None the
+    enclosing budget (if any) stays in force.
+
+    Yields:
+        Budget: The active budget (None if there is none)
+    """
+    outer = _current.get()
+    if budget_ms is None:
+        yield outer
+        return
+
+    deadline = time.time() + budget_ms / 1000.0
+    if outer is not None:
+        previous = outer.deadline
+        outer.deadline = min(previous, deadline)
+        try:
+            yield outer
+        finally:
+            outer.deadline = previous
+        return
+
+    current = Budget(deadline)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+def current():
+    """The active Budget, or None"""
+    return _current.get()
+
+def remaining():
+    """Seconds left in the active budget, or None without a budget"""
+    active = _current.get()
+    return None if active is None else active.remaining()
+
+def expired() -> bool:
+    """True once the active budget is spent"""
+    left = remaining()
+    return left is not None and left <= 0
+
+def skip(step: str):
+    """Note that a step was skipped or truncated to stay within budget"""
+    active = _current.get()
+    if active is not None:
+        active.skipped.append(step)
+        print(f"⏱️  Skipping {step} to stay within the time budget")
+
+def allows(seconds: float, step: str) -> bool:
+    """
+    Check whether a step that needs about this many seconds still fits
+
+    Returns:
+        bool: True without a budget or when enough time is left; otherwise
+        the step is recorded as skipped and False is returned
+    """
+    left = remaining()
+    if left is None or left >= seconds:
+        return True
+    skip(step)
+    return False
+
+def timeout(default: float) -> float:
+    """A network timeout clamped to the time left"""
+    left = remaining()
+    if left is None:
+        return default
+    return max(MIN_TIMEOUT, min(default, left))
+
+def sleep(seconds: float, step: str = 'pause'):
+    """time.sleep, cut short at the deadline"""
+    left = remaining()
+    if left is not None and left < seconds:
+        skip(step)
+        seconds = max(0.0, left)
+    if seconds > 0:
+        time.sleep(seconds)
+
+def retries(count: int, per_attempt: float) -> int:
+    """How many of count retries (each about per_attempt seconds) fit in the budget"""
+    left = remaining()
+    if left is None:
+        return count
+    return max(0, min(count, int(left // per_attempt) - 1))
+
+def check(step: str = 'scrape'):
+    """Raise DeadlineExceeded if the budget is spent"""
+    if expired():
+        skip(step)
+        raise DeadlineExceeded(f"Time budget spent before {step}")
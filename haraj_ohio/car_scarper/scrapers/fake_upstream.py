@@ -0,0 +1,324 @@
+"""
+Stand-in for the listing sites, for load testing without real traffic
+
+Serves the recorded pages in fixtures/<site>/ (the benchmark fixtures) for
+cars.com, manheim.com.au and carfax.com from one local HTTP server, with
+configurable misbehaviour:
+
+- latency / jitter: delay before every response
+- block rate: 403 anti-bot pages ("Access Denied", captcha text)
+- throttle rate: 429 with Retry-After
+- error rate: 503s
+- drip rate: bodies sent a few bytes at a time (slow upstreams)
+
+    python fake_upstream.py --port 8900 --latency 150 --jitter 50 --block-rate 0.05
+    python fake_upstream.py --site carfax.com:block_rate=0.3,latency_ms=400
+
+Scrapers reach it when SCRAPER_UPSTREAM is set (app.py and
+scrape_worker.py call route() on start):
+
+    SCRAPER_UPSTREAM=http://127.0.0.1:8900 python app.py
+
+route() rewrites every requests call to one of the three sites to the
+stand-in, with the original host in an X-Upstream-Host header. A listing
+path without a recorded page gets the site's first fixture, so any list
+of real-looking URLs can be replayed. Browser tiers (Selenium,
+requests-html) do not go through requests, so the cars.com scrapers skip
+them while SCRAPER_UPSTREAM is set; route() sets it when called directly.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlsplit, urlunsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from requests.adapters import HTTPAdapter
+
+from benchmark import SITES, load_fixtures
+
+DEFAULT_PORT = 8900
+
+# Header carrying the host a routed request was meant for
+UPSTREAM_HEADER = 'X-Upstream-Host'
+
+BLOCK_PAGE = b"""<html><head><title>Access Denied</title></head><body>
+<h1>Access Denied</h1>
+<p>You don't have permission to access this page. Please verify you are a human:
+complete the captcha below to continue.</p>
+<p>Reference #18.4f2d3e17.1718000000.2b1c9a</p>
+</body></html>"""
+
+THROTTLE_PAGE = b"<html><body><h1>Too Many Requests</h1><p>Please slow down.</p></body></html>"
+
+ERROR_PAGE = b"<html><body><h1>Service Unavailable</h1></body></html>"
+
+HOME_PAGE = b"<html><head><title>Home</title></head><body><h1>Welcome</h1></body></html>"
+
+class Faults:
+    """How badly one site (or all of them) behaves"""
+
+    FIELDS = ('latency_ms', 'jitter_ms', 'block_rate', 'throttle_rate', 'error_rate',
+              'retry_after', 'drip_rate', 'drip_bytes', 'drip_ms')
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, block_rate: float = 0,
+                 throttle_rate: float = 0, error_rate: float = 0, retry_after: int = 1,
+                 drip_rate: float = 0, drip_bytes: int = 512, drip_ms: float = 50):
+        """
+        Args:
+            latency_ms (float): Delay before each response
+            jitter_ms (float): Random +/- on top of latency_ms
+            block_rate (float): Share of requests answered 403 with an anti-bot page
+            throttle_rate (float): Share answered 429 (Retry-After: retry_after seconds)
+            error_rate (float): Share answered 503
+            retry_after (int): Seconds in the 429 Retry-After header
+            drip_rate (float): Share of pages sent drip_bytes at a time, drip_ms apart
+            drip_bytes (int): Chunk size of a dripped body
+            drip_ms (float): Pause between dripped chunks
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.block_rate = block_rate
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.drip_rate = drip_rate
+        self.drip_bytes = drip_bytes
+        self.drip_ms = drip_ms
+
+    def replace(self, **changes) -> 'Faults':
+        """Copy with some settings changed"""
+        settings = {field: getattr(self, field) for field in self.FIELDS}
+        settings.update(changes)
+        return Faults(**settings)
+
+    @classmethod
+    def parse_overrides(cls, spec: str) -> dict:
+        """'block_rate=0.3,latency_ms=400' -> {'block_rate': 0.3, 'latency_ms': 400.0}"""
+        changes = {}
+        for part in spec.split(','):
+            if not part.strip():
+                continue
+            field, _, value = part.partition('=')
+            field = field.strip()
+            if field not in cls.FIELDS:
+                raise ValueError(f"Unknown fault setting {field!r} (one of {', '.join(cls.FIELDS)})")
+            changes[field] = int(value) if field in ('retry_after', 'drip_bytes') else float(value)
+        return changes
+
+def site_of(host: str):
+    """Site key (from benchmark.SITES) a host belongs to, or None"""
+    host = host.split(':')[0].lower().rstrip('.')
+    for site in SITES:
+        if host == site or host.endswith('.' + site):
+            return site
+    return None
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.upstream.respond(self)
+
+    def do_HEAD(self):
+        self.server.upstream.respond(self, body=False)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeUpstream:
+    """Local HTTP server standing in for the listing sites"""
+
+    def __init__(self, port: int = DEFAULT_PORT, host: str = '127.0.0.1', faults: Faults = None,
+                 site_faults: dict = None, seed: int = None):
+        """
+        Args:
+            port (int): Port to listen on (0 = any free port)
+            host (str): Interface to listen on
+            faults (Faults): Behaviour of every site
+            site_faults (dict): Site key -> Faults overriding faults for that site
+            seed (int): Seed for the fault dice, for repeatable runs
+        """
+        self.faults = faults or Faults()
+        self.site_faults = dict(site_faults or {})
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {}
+
+        # (site, path) -> page, plus the first page of each site for unknown listing paths
+        self.pages = {}
+        self.fallbacks = {}
+        for site in SITES:
+            for _, url, content, _ in load_fixtures(site):
+                self.pages[(site, urlsplit(url).path)] = content
+                self.fallbacks.setdefault(site, content)
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.upstream = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeUpstream':
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, site, outcome: str):
+        with self._lock:
+            per_site = self.stats.setdefault(site or 'other', {})
+            per_site[outcome] = per_site.get(outcome, 0) + 1
+
+    def respond(self, handler, body: bool = True):
+        host = handler.headers.get(UPSTREAM_HEADER) or handler.headers.get('Host') or ''
+        site = site_of(host)
+        faults = self.site_faults.get(site, self.faults)
+        path = urlsplit(handler.path).path
+
+        with self._lock:
+            delay = faults.latency_ms + self._random.uniform(-faults.jitter_ms, faults.jitter_ms)
+            roll = self._random.random()
+            drip = self._random.random() < faults.drip_rate
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        headers = {}
+        if site is None:
+            status, content, outcome = 404, b'', 'unknown host'
+        elif roll < faults.block_rate:
+            status, content, outcome = 403, BLOCK_PAGE, 'blocked'
+        elif roll < faults.block_rate + faults.throttle_rate:
+            status, content, outcome = 429, THROTTLE_PAGE, 'throttled'
+            headers['Retry-After'] = str(faults.retry_after)
+        elif roll < faults.block_rate + faults.throttle_rate + faults.error_rate:
+            status, content, outcome = 503, ERROR_PAGE, 'error'
+        elif path in ('', '/'):
+            status, content, outcome = 200, HOME_PAGE, 'home'
+        else:
+            content = self.pages.get((site, path), self.fallbacks.get(site))
+            status, outcome = (200, 'page') if content is not None else (404, 'not found')
+            content = content or b''
+            if status == 200 and drip:
+                outcome = 'dripped'
+
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'text/html; charset=utf-8')
+        handler.send_header('Content-Length', str(len(content)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        self._count(site, outcome)
+        if not body:
+            return
+
+        try:
+            if outcome == 'dripped':
+                for start in range(0, len(content), max(faults.drip_bytes, 1)):
+                    handler.wfile.write(content[start:start + faults.drip_bytes])
+                    handler.wfile.flush()
+                    time.sleep(faults.drip_ms / 1000)
+            else:
+                handler.wfile.write(content)
+        except (BrokenPipeError, ConnectionResetError):
+            # The scraper gave up (timeout or budget); nothing to clean up
+            pass
+
+_original_send = None
+
+def route(base_url: str):
+    """
+    Send every requests call to one of the sites to a stand-in instead
+
+    Patches requests' HTTPAdapter (retry adapters included); other hosts
+    (Supabase, object storage, ...) are untouched. Also sets
+    SCRAPER_UPSTREAM, which turns off the scrapers' browser fallbacks.
+
+    Args:
+        base_url (str): The stand-in, e.g. http://127.0.0.1:8900
+    """
+    global _original_send
+    if _original_send is None:
+        _original_send = HTTPAdapter.send
+    send = _original_send
+    target = urlsplit(base_url)
+
+    def routed_send(adapter, request, **kwargs):
+        parts = urlsplit(request.url)
+        if site_of(parts.hostname or '') is not None:
+            request = request.copy()
+            request.url = urlunsplit((target.scheme, target.netloc, parts.path or '/', parts.query, ''))
+            request.headers[UPSTREAM_HEADER] = parts.netloc
+        return send(adapter, request, **kwargs)
+
+    HTTPAdapter.send = routed_send
+    os.environ['SCRAPER_UPSTREAM'] = base_url
+    print(f"🧪 Listing-site requests go to the stand-in at {base_url}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recorded listing pages with injected latency and failures")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on")
+    parser.add_argument('--latency', type=float, default=0, help="Delay before each response (ms)")
+    parser.add_argument('--jitter', type=float, default=0, help="Random +/- on the delay (ms)")
+    parser.add_argument('--block-rate', type=float, default=0, help="Share of 403 anti-bot responses")
+    parser.add_argument('--throttle-rate', type=float, default=0, help="Share of 429 responses")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After of a 429 (seconds)")
+    parser.add_argument('--error-rate', type=float, default=0, help="Share of 503 responses")
+    parser.add_argument('--drip-rate', type=float, default=0, help="Share of pages sent slowly")
+    parser.add_argument('--drip-bytes', type=int, default=512, help="Chunk size of a slow page")
+    parser.add_argument('--drip-ms', type=float, default=50, help="Pause between chunks of a slow page (ms)")
+    parser.add_argument('--site', action='append', default=[], metavar='SITE:KEY=VALUE[,KEY=VALUE]',
+                        help="Override settings for one site, e.g. carfax.com:block_rate=0.3")
+    parser.add_argument('--seed', type=int, help="Seed for repeatable fault injection")
+    args = parser.parse_args(argv)
+
+    faults = Faults(args.latency, args.jitter, args.block_rate, args.throttle_rate, args.error_rate,
+                    args.retry_after, args.drip_rate, args.drip_bytes, args.drip_ms)
+    site_faults = {}
+    for spec in args.site:
+        site, _, overrides = spec.partition(':')
+        if site not in SITES:
+            parser.error(f"--site: unknown site {site!r} (one of {', '.join(SITES)})")
+        try:
+            site_faults[site] = faults.replace(**Faults.parse_overrides(overrides))
+        except ValueError as e:
+            parser.error(f"--site: {e}")
+
+    upstream = FakeUpstream(args.port, args.host, faults, site_faults, args.seed)
+    print(f"🧪 Serving {len(upstream.pages)} recorded pages for {', '.join(SITES)} at {upstream.url}")
+    print(f"   Point the scrapers at it: SCRAPER_UPSTREAM={upstream.url} python app.py")
+    try:
+        upstream.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏸️  Stopping")
+    finally:
+        upstream.stop()
+        for site, outcomes in sorted(upstream.stats.items()):
+            print(f"   {site}: " + ', '.join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items())))
+        print("✅ Stand-in stopped")
+
+if __name__ == "__main__":
+    main()
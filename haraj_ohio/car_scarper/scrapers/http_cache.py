@@ -0,0 +1,121 @@
+"""
+Conditional GET support for the scrapers' fetch layer
+
+For every listing that was scraped successfully we keep the response's
+ETag / Last-Modified validators together with the extracted car data.
+On the next fetch of the same URL the validators are sent back as
+If-None-Match / If-Modified-Since; a 304 Not Modified answer means the
+cached extraction is still current, so the page is neither downloaded
+nor parsed again.
+
+The store is SQLite so it can be shared between the API, the parse pool
+and CLI runs. Set SCRAPER_HTTP_CACHE to a file path to persist it;
+by default it lives in memory for the lifetime of the process.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+import provenance
+
+_conn = None
+_lock = threading.Lock()
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        path = os.environ.get('SCRAPER_HTTP_CACHE', ':memory:')
+        _conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                data TEXT NOT NULL,
+                stored_at REAL NOT NULL
+            )
+        """)
+        _conn.commit()
+    return _conn
+
+def lookup(url: str):
+    """
+    Get the cached validators for a URL
+
+    Returns:
+        dict: {'etag', 'last_modified', 'data'} or None if nothing is cached
+    """
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT etag, last_modified, data FROM validators WHERE url = ?", (url,)
+        ).fetchone()
+    if not row:
+        return None
+    return {'etag': row[0], 'last_modified': row[1], 'data': json.loads(row[2])}
+
+def conditional_get(session, url: str, **kwargs):
+    """
+    GET a URL, revalidating against the cached copy when there is one
+
+    Args:
+        session: requests.Session to send the request with
+        url (str): The listing URL
+        **kwargs: Passed through to session.get (headers are merged)
+
+    Returns:
+        tuple: (response, cached_data). cached_data is the stored extraction
+        when the server answered 304 Not Modified, otherwise None.
+    """
+    entry = lookup(url)
+    headers = dict(kwargs.pop('headers', None) or {})
+
+    if entry:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = session.get(url, headers=headers, **kwargs)
+
+    if response.status_code == 304 and entry:
+        print(f"♻️  Not modified, serving cached extraction for {url}")
+        provenance.record_all(entry['data'], 'http-cache', 0.9)
+        return response, entry['data']
+
+    return response, None
+
+def store(url: str, response, car_data: dict):
+    """
+    Remember the validators of a response and the data extracted from it
+
+    Responses without an ETag or Last-Modified header are not stored,
+    since there is nothing to revalidate them with. Neither are pruned
+    extractions (early mode or a fields= projection): a later full scrape
+    would be served the pruned copy on a 304.
+    """
+    active = provenance.current()
+    if active is not None and active.pruned:
+        return
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if not etag and not last_modified:
+        return
+
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO validators (url, etag, last_modified, data, stored_at) VALUES (?, ?, ?, ?, ?)",
+            (url, etag, last_modified, json.dumps(car_data), time.time())
+        )
+        conn.commit()
+
+def forget(url: str):
+    """Drop the cached entry for a URL"""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("DELETE FROM validators WHERE url = ?", (url,))
+        conn.commit()
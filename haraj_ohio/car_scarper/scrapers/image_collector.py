@@ -0,0 +1,211 @@
+"""
+Shared listing photo collection
+
+The site extractors used to walk the DOM several times (gallery containers,
+gallery selectors, then every <img>), checking `src not in images` on a
+list each time, and still returned the same photo at several sizes
+(".../640x480/1.jpg", ".../1024x768/1.jpg", "1.jpg?w=300"). collect_images
+walks the <img> tags once and feeds an ImageCollector, an ordered set keyed
+by each URL's canonical form:
+
+- size query parameters (w, width, h, height, quality, ...) are dropped,
+  which on resizing CDNs is the full-size original
+- size path parts (640x480, w_640,h_480, thumb/small/large/xlarge) are
+  wildcarded in the key and the largest variant seen is kept
+
+    images = collect_images(soup, url, primary=lambda img: 'photo' in img.get('data-cmp', ''))
+
+Lookups are dict operations, so collection is linear in the number of
+<img> tags.
+"""
+
+import re
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only choose a rendition of the same photo
+SIZE_PARAMS = frozenset(('w', 'h', 'width', 'height', 'size', 'resize', 'fit', 'crop', 'q',
+                         'quality', 'dpr', 'auto', 'fm', 'format', 'im', 'impolicy', 'imwidth',
+                         'maxwidth', 'maxheight', 'mw', 'mh'))
+
+# Named size path segments, smallest first
+NAMED_SIZES = ('thumbnail', 'thumb', 'tiny', 'small', 'medium', 'large', 'xlarge', 'xxlarge')
+
+_DIMENSIONS = re.compile(r'(?<=[/_\-])(\d{2,4})x(\d{2,4})(?=[/._\-]|$)')
+_TRANSFORM = re.compile(r'/(?:[a-z]{1,2}_[^/,]+,)*[wh]_(\d+)(?:,[a-z]{1,2}_[^/,]+)*(?=/)')
+_NAMED = re.compile(r'/(' + '|'.join(NAMED_SIZES) + r')(?=/)', re.IGNORECASE)
+
+# Words in a src/alt/class that mark site chrome rather than listing photos
+SKIP_WORDS = ('logo', 'icon', 'banner', 'sponsor', 'advertisement', 'header', 'footer',
+              'button', 'avatar', 'badge', 'sprite', 'placeholder')
+
+# Short markers that only count as a whole word ("ad", not the "ad" in "8ad3f.jpg")
+SKIP_TOKENS = frozenset(('ad', 'ads'))
+
+# Class names of containers that hold the listing gallery
+GALLERY_CLASSES = re.compile(r'gallery|carousel|slider|photo|media|image|vehicle-images|lot-images')
+
+# How far up from an <img> to look for a gallery container
+GALLERY_DEPTH = 6
+
+_TOKENS = re.compile(r'[a-z0-9]+')
+
+def canonical(url: str):
+    """
+    Canonical form of an image URL
+
+    Returns:
+        tuple: (dedup key, size score, URL without size query parameters)
+    """
+    parts = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+             if name.lower() not in SIZE_PARAMS]
+    path = parts.path
+
+    pixels = 0
+    for width, height in _DIMENSIONS.findall(path):
+        pixels = max(pixels, int(width) * int(height))
+    for width in _TRANSFORM.findall(path):
+        pixels = max(pixels, int(width) ** 2)
+    named = 0
+    for name in _NAMED.findall(path):
+        named = max(named, NAMED_SIZES.index(name.lower()) + 1)
+
+    key_path = _NAMED.sub('/*', _TRANSFORM.sub('/*', _DIMENSIONS.sub('*', path)))
+    key = f"{parts.netloc.lower()}{key_path}?{urlencode(sorted(query))}"
+    cleaned = urlunsplit((parts.scheme, parts.netloc, path, urlencode(query), ''))
+    return key, (pixels, named), cleaned
+
+class ImageCollector:
+    """Ordered set of photo URLs, one (the largest) per canonical key"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._best = {}
+
+    def add(self, src: str, tier: int = 0) -> bool:
+        """
+        Add a src as found in the page (relative, protocol-relative or absolute)
+
+        Args:
+            src (str): The URL
+            tier (int): Ordering group; a photo seen in several keeps the lowest
+
+        Returns:
+            bool: True if it is a photo not seen before
+        """
+        if not src or src.startswith('data:'):
+            return False
+        url = urljoin(self.base_url, src.strip())
+        if not url.startswith(('http://', 'https://')):
+            return False
+        key, score, cleaned = canonical(url)
+        current = self._best.get(key)
+        if current is None:
+            self._best[key] = [tier, score, cleaned]
+            return True
+        current[0] = min(current[0], tier)
+        if score > current[1]:
+            current[1], current[2] = score, cleaned
+        return False
+
+    def __len__(self):
+        return len(self._best)
+
+    def images(self, limit: int = None, tiers=None) -> list:
+        """
+        The photos, by tier and then first-seen order
+
+        Args:
+            limit (int): Maximum number returned
+            tiers (iterable): Only these tiers (default: all)
+        """
+        buckets = {}
+        for tier, _, url in self._best.values():
+            buckets.setdefault(tier, []).append(url)
+        urls = [url for tier in sorted(buckets) if tiers is None or tier in tiers for url in buckets[tier]]
+        return urls[:limit] if limit else urls
+
+def image_source(img) -> str:
+    """The real photo URL of an <img>: lazy-load attributes beat placeholders, srcset its largest entry"""
+    for attribute in ('data-srcset', 'srcset'):
+        srcset = img.get(attribute)
+        if srcset:
+            best, best_width = None, -1
+            for entry in srcset.split(','):
+                parts = entry.split()
+                if not parts:
+                    continue
+                width = parts[1] if len(parts) > 1 else '0w'
+                width = int(re.sub(r'\D', '', width) or 0)
+                if width > best_width:
+                    best, best_width = parts[0], width
+            if best:
+                return best
+    for attribute in ('src', 'data-src', 'data-lazy', 'data-original'):
+        src = img.get(attribute)
+        if src and not src.startswith('data:'):
+            return src
+    return None
+
+def _skipped(img, src: str, skip=()) -> bool:
+    classes = img.get('class') or []
+    text = ' '.join((src.lower(), (img.get('alt') or '').lower(), ' '.join(classes).lower()))
+    if any(word in text for word in SKIP_WORDS + skip) or not SKIP_TOKENS.isdisjoint(_TOKENS.findall(text)):
+        return True
+    try:
+        # Icons and tracking pixels
+        return int(img.get('width') or 999) < 100 and int(img.get('height') or 999) < 100
+    except ValueError:
+        return False
+
+def _in_gallery(img) -> bool:
+    for depth, parent in enumerate(img.parents):
+        if depth >= GALLERY_DEPTH or parent.name is None:
+            break
+        classes = parent.get('class')
+        if classes and GALLERY_CLASSES.search(' '.join(classes).lower()):
+            return True
+    return False
+
+def collect_images(soup, base_url: str, primary=None, keep=(), skip=(), limit: int = None,
+                   fallback_only: bool = False) -> list:
+    """
+    Listing photos of a page in one pass over its <img> tags
+
+    Photos are ordered by tier, then page order: tier 0 are imgs primary()
+    accepts (the site's own photo markers), tier 1 imgs inside a gallery
+    container, tier 2 any other img. Tiers 1 and 2 must have one of the
+    keep words in their URL when keep is given. Logos, icons, banners,
+    tiny images and imgs mentioning a skip word are skipped.
+
+    Args:
+        soup: Parsed page
+        base_url (str): Page URL, for relative srcs
+        primary (callable): img -> bool for the site's photo elements
+        keep (iterable): URL words required outside tier 0
+        skip (iterable): Extra src/alt/class words marking non-listing images
+        limit (int): Maximum number of photos returned
+        fallback_only (bool): Use tier 2 only if tiers 0 and 1 found nothing
+
+    Returns:
+        list: Unique photo URLs
+    """
+    collector = ImageCollector(base_url)
+    keep, skip = tuple(keep), tuple(skip)
+    for img in soup.find_all('img'):
+        src = image_source(img)
+        if not src or _skipped(img, src, skip):
+            continue
+        if primary is not None and primary(img):
+            tier = 0
+        else:
+            if keep and not any(word in src.lower() for word in keep):
+                continue
+            tier = 1 if _in_gallery(img) else 2
+        collector.add(src, tier)
+
+    if fallback_only:
+        images = collector.images(limit, tiers=(0, 1))
+        if images:
+            return images
+    return collector.images(limit)
@@ -0,0 +1,252 @@
+"""
+Thumbnail and WebP derivatives of mirrored listing photos
+
+The app's car cards load full-size photos. Once image_mirror has copied
+a photo into storage, DerivativeStage renders small fixed-size versions
+of it next to the original, so list views can fetch a few KB per card:
+
+    thumb.jpg   320x240, cropped to fill (JPEG for any client)
+    thumb.webp  320x240, cropped to fill
+    card.webp   fits in 640x480
+    large.webp  fits in 1280x960
+
+    with ImageMirror(storage) as mirror, DerivativeStage(storage) as stage:
+        mirror.mirror_result(car_data)
+        stage.process_result(car_data)    # adds Thumbnails and ImageVariants
+
+    python image_derivatives.py mirrored.jsonl --dest ./mirror
+
+Decoding and resizing run in a process pool (spawned like parse_pool's), so
+they use every core instead of queueing on the GIL. Derivatives are named
+by the SHA-1 of the photo's bytes (derived/ab/ab12...ef/thumb.webp), so a
+photo that several listings or sites share, or one already processed in an
+earlier run, is rendered once.
+
+Needs Pillow with WebP support: pip install pillow
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+import image_mirror
+
+# (name, box, mode, format); 'crop' fills the box, 'fit' fits inside it without upscaling
+DERIVATIVES = (
+    ('thumb', (320, 240), 'crop', 'JPEG'),
+    ('thumb', (320, 240), 'crop', 'WEBP'),
+    ('card', (640, 480), 'fit', 'WEBP'),
+    ('large', (1280, 960), 'fit', 'WEBP'),
+)
+
+FORMATS = {'JPEG': ('jpg', 'image/jpeg'), 'WEBP': ('webp', 'image/webp')}
+
+QUALITY = 80
+
+PREFIX = 'derived'
+
+def _require_pillow():
+    if Image is None:
+        raise ImportError("Image derivatives need Pillow: pip install pillow")
+
+def derivative_key(digest: str, name: str, image_format: str) -> str:
+    """Storage key of one derivative of the photo with content hash digest"""
+    return f"{PREFIX}/{digest[:2]}/{digest}/{name}.{FORMATS[image_format][0]}"
+
+def render(data: bytes, derivatives=DERIVATIVES) -> list:
+    """
+    Render the derivatives of one photo (runs inside a pool worker)
+
+    Returns:
+        list: (name, format, encoded bytes) per derivative
+    """
+    _require_pillow()
+    image = Image.open(io.BytesIO(data))
+    largest = max(box for _, box, _, _ in derivatives)
+    # JPEGs decode straight to a reduced scale that still covers the largest box
+    image.draft('RGB', largest)
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    rendered = []
+    for name, box, mode, image_format in derivatives:
+        if mode == 'crop':
+            resized = ImageOps.fit(image, box, Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail(box, Image.LANCZOS)
+        output = io.BytesIO()
+        options = {'quality': QUALITY}
+        if image_format == 'JPEG':
+            options.update(optimize=True, progressive=True)
+        else:
+            options['method'] = 4
+        resized.save(output, image_format, **options)
+        rendered.append((name, image_format, output.getvalue()))
+    return rendered
+
+class DerivativeStage:
+    """Renders derivatives of stored photos on a process pool and stores them"""
+
+    def __init__(self, storage=None, workers: int = None, derivatives=DERIVATIVES):
+        """
+        Args:
+            storage: image_mirror storage backend holding the originals; the
+                derivatives are written there too (default: open_storage())
+            workers (int): Rendering processes (default: CPU count)
+            derivatives (tuple): (name, box, mode, format) specs to render
+        """
+        _require_pillow()
+        self.storage = storage if storage is not None else image_mirror.open_storage()
+        self.derivatives = tuple(derivatives)
+        self.stats = {'rendered': 0, 'existing': 0, 'failed': 0}
+        # spawn keeps workers clear of the callers' threads and locks
+        workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=workers,
+                                         mp_context=multiprocessing.get_context('spawn'))
+        # Reads and writes of storage, so several photos are in the pool at once
+        self._io = ThreadPoolExecutor(max_workers=workers * 2)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _urls(self, digest: str) -> dict:
+        """{'thumb.webp': url, ...} of a photo's derivatives"""
+        return {f"{name}.{FORMATS[image_format][0]}": self.storage.url(derivative_key(digest, name, image_format))
+                for name, _, _, image_format in self.derivatives}
+
+    def process(self, data: bytes) -> dict:
+        """
+        Derivatives of one photo, rendering them unless already stored
+
+        Returns:
+            dict: Derivative URLs by file name ('thumb.jpg', 'card.webp', ...),
+            or None if the photo could not be decoded
+        """
+        digest = hashlib.sha1(data).hexdigest()
+        # The last derivative is written last, so it marks a complete set
+        name, _, _, image_format = self.derivatives[-1]
+        if self.storage.exists(derivative_key(digest, name, image_format)):
+            self._count('existing')
+            return self._urls(digest)
+
+        with self._lock:
+            future = self._inflight.get(digest)
+            owner = future is None
+            if owner:
+                future = self._inflight[digest] = Future()
+        if not owner:
+            # Another thread is rendering the same photo
+            return future.result()
+
+        urls = None
+        try:
+            rendered = self._pool.submit(render, data, self.derivatives).result()
+            for name, image_format, encoded in rendered:
+                self.storage.write(derivative_key(digest, name, image_format), [encoded], 0,
+                                   FORMATS[image_format][1])
+            urls = self._urls(digest)
+            self._count('rendered')
+        except Exception as e:
+            print(f"⚠️  Could not render derivatives of {digest[:12]}: {e}")
+            self._count('failed')
+        finally:
+            with self._lock:
+                self._inflight.pop(digest, None)
+            future.set_result(urls)
+        return urls
+
+    def process_key(self, key: str) -> dict:
+        """Derivatives of the stored photo at key (see process())"""
+        try:
+            data = self.storage.read(key)
+        except Exception as e:
+            print(f"⚠️  Could not read {key}: {e}")
+            self._count('failed')
+            return None
+        return self.process(data)
+
+    def process_result(self, car_data: dict) -> dict:
+        """
+        Add derivative URLs to a mirrored scrape, in place
+
+        Needs the SourceImages (source_images) that ImageMirror.mirror_result
+        leaves; photos are found in storage by their original URL. Sets
+        Thumbnails (thumb.jpg URL per photo, None where it failed) and
+        ImageVariants (every derivative URL per photo), or thumbnails and
+        image_variants for CarRecord dicts.
+
+        Returns:
+            dict: car_data
+        """
+        data = car_data.get('data') if 'success' in car_data else car_data
+        if not data:
+            return car_data
+        if 'SourceImages' in data:
+            originals, thumbnails, variants = data['SourceImages'], 'Thumbnails', 'ImageVariants'
+        else:
+            originals, thumbnails, variants = data.get('source_images'), 'thumbnails', 'image_variants'
+        if not originals:
+            return car_data
+        keys = [image_mirror.image_key(url) for url in originals]
+        results = list(self._io.map(self.process_key, keys))
+        data[variants] = results
+        data[thumbnails] = [urls['thumb.jpg'] if urls and 'thumb.jpg' in urls else None for urls in results]
+        return car_data
+
+    def close(self):
+        """Stop the rendering processes"""
+        self._io.shutdown(wait=True)
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render thumbnails and WebP variants of mirrored photos")
+    parser.add_argument('results', help="JSONL written by image_mirror.py or bulk_scrape.py --mirror-images")
+    parser.add_argument('-o', '--output', help="JSONL with derivative URLs (default: overwrite results)")
+    parser.add_argument('--dest', help="Storage the photos were mirrored to (as for image_mirror.py)")
+    parser.add_argument('-w', '--workers', type=int, help="Rendering processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    with open(args.results, encoding='utf-8') as f:
+        results = [json.loads(line) for line in f if line.strip()]
+    with DerivativeStage(image_mirror.open_storage(args.dest), args.workers) as stage, \
+            ThreadPoolExecutor(max_workers=8) as listings:
+        # Several listings at a time keep the pool busy between small galleries
+        list(listings.map(stage.process_result, results))
+    output_path = args.output or args.results
+    with open(output_path, 'w', encoding='utf-8') as output:
+        for result in results:
+            output.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    stats = stage.stats
+    print(f"✅ Rendered derivatives of {stats['rendered']} photos, {stats['existing']} already done, "
+          f"{stats['failed']} failed in {time.time() - started:.1f}s")
+    print(f"📄 Results: {output_path}")
+
+if __name__ == "__main__":
+    main()
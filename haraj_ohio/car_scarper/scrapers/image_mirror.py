@@ -0,0 +1,519 @@
+"""
+Concurrent mirroring of listing photos into our own storage
+
+Scraped `Images` point at the sites' CDNs, and those links expire, so the
+app's main_image/other_images break after a while (the Flutter app's
+SupabaseService.uploadImageFromUrl only passes the URL through).
+ImageMirror copies the photos into storage we control:
+
+    with ImageMirror(open_storage('s3://car-images')) as mirror:
+        mirror.mirror_result(car_data)     # Images -> stored URLs, originals in SourceImages
+
+    python image_mirror.py results.jsonl --dest ./mirror -o mirrored.jsonl
+
+- downloads run on a thread pool, with at most per_host transfers in
+  flight against any one host
+- each body is streamed from the response straight into storage in
+  CHUNK_SIZE pieces, never held whole in memory
+- failed transfers are retried with backoff (honouring Retry-After); a
+  filesystem download that broke off resumes from the bytes already
+  written with a Range request
+- object keys come from the photo's canonical URL (image_collector), so
+  the same photo at another size or on a rerun is not copied again
+
+Storage backends, chosen with open_storage() or SCRAPER_IMAGE_STORE:
+
+- a directory path: files under it (optionally served from public_base)
+- http(s)://host/path: plain PUT/HEAD object store (a MinIO bucket with a
+  write policy, or any stand-in that accepts PUT)
+- s3://bucket: S3 or MinIO through boto3 (S3_ENDPOINT_URL for MinIO)
+- supabase or supabase://bucket: Supabase Storage (SUPABASE_URL/SUPABASE_KEY,
+  bucket car-images by default)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, quote
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import image_collector
+
+CHUNK_SIZE = 64 * 1024
+
+# Larger bodies are not photos (or not worth mirroring)
+MAX_IMAGE_BYTES = 25 * 1024 * 1024
+
+DEFAULT_WORKERS = 16
+DEFAULT_PER_HOST = 4
+DEFAULT_RETRIES = 3
+
+# Statuses worth another attempt; other 4xx (expired links) are final
+RETRY_STATUSES = frozenset((408, 425, 429, 500, 502, 503, 504))
+
+EXTENSIONS = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
+              '.webp': 'image/webp', '.gif': 'image/gif', '.avif': 'image/avif'}
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+class MirrorError(Exception):
+    """A photo could not be copied"""
+
+    def __init__(self, message: str, retry: bool = True, retry_after: float = None):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+
+def image_key(url: str) -> str:
+    """Storage key of a photo: 'ab/ab12...ef.jpg', from its canonical URL"""
+    canonical_key = image_collector.canonical(url)[0]
+    digest = hashlib.sha1(canonical_key.encode('utf-8')).hexdigest()
+    extension = os.path.splitext(urlsplit(url).path)[1].lower()
+    if extension == '.jpeg' or extension not in EXTENSIONS:
+        extension = '.jpg'
+    return f"{digest[:2]}/{digest}{extension}"
+
+def _checked(chunks, expected: int = None, offset: int = 0):
+    """
+    Pass chunks through, raising once they run out short of expected bytes
+
+    The error comes out of the chunk iterator, so a backend writing from it
+    aborts before it commits the object: the file is not renamed into place,
+    the chunked PUT never sends its final chunk, the S3 upload is aborted.
+    """
+    received = offset
+    for chunk in chunks:
+        received += len(chunk)
+        yield chunk
+    if expected is not None and received != expected:
+        raise MirrorError(f"Short body ({received} of {expected} bytes)")
+
+class _ChunkReader:
+    """File-like view of a chunk iterator, for uploaders that want read()"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b''
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._pending) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._pending += chunk
+        if size < 0:
+            data, self._pending = self._pending, b''
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+class FileStorage:
+    """Photos as files under a directory"""
+
+    def __init__(self, root: str, public_base: str = None):
+        """
+        Args:
+            root (str): Directory to write to (created if missing)
+            public_base (str): URL the directory is served at; stored URLs are
+                file:// URLs without it
+        """
+        self.root = os.path.abspath(root)
+        self.public_base = public_base.rstrip('/') if public_base else None
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def resume_offset(self, key: str) -> int:
+        """Bytes kept from an interrupted download of key"""
+        try:
+            return os.path.getsize(self._path(key) + '.part')
+        except OSError:
+            return 0
+
+    def write(self, key: str, chunks, offset: int = 0, content_type: str = None, expected: int = None) -> int:
+        """
+        Stream chunks into key, appending to the partial file when offset > 0
+
+        Args:
+            expected (int): Full size of the object; a shorter body stays a
+                partial file (to resume from) and raises MirrorError
+
+        Returns:
+            int: Bytes written by this call
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        written = 0
+        with open(path + '.part', 'ab' if offset else 'wb') as f:
+            for chunk in _checked(chunks, expected, offset):
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(path + '.part', path)
+        return written
+
+    def read(self, key: str) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def discard(self, key: str):
+        """Drop the partial download of key"""
+        try:
+            os.remove(self._path(key) + '.part')
+        except OSError:
+            pass
+
+    def url(self, key: str) -> str:
+        if self.public_base:
+            return f"{self.public_base}/{key}"
+        return 'file://' + self._path(key)
+
+class HTTPStorage:
+    """Objects PUT to base_url/key on an HTTP object store"""
+
+    def __init__(self, base_url: str, headers: dict = None, public_base: str = None, session=None):
+        """
+        Args:
+            base_url (str): Prefix objects are PUT under
+            headers (dict): Extra headers (auth) for PUT and HEAD
+            public_base (str): Prefix objects are read from (default: base_url)
+            session: requests.Session to reuse
+        """
+        self.base_url = base_url.rstrip('/')
+        self.public_base = (public_base or base_url).rstrip('/')
+        self.session = session or requests.Session()
+        self.session.headers.update(headers or {})
+
+    def exists(self, key: str) -> bool:
+        try:
+            return self.session.head(f"{self.public_base}/{quote(key)}", timeout=15).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def resume_offset(self, key: str) -> int:
+        # A PUT cannot be continued; interrupted uploads start over
+        return 0
+
+    def discard(self, key: str):
+        pass
+
+    def read(self, key: str) -> bytes:
+        response = self.session.get(f"{self.public_base}/{quote(key)}", timeout=60)
+        response.raise_for_status()
+        return response.content
+
+    def write(self, key: str, chunks, offset: int = 0, content_type: str = None, expected: int = None) -> int:
+        written = [0]
+
+        def counted():
+            for chunk in _checked(chunks, expected):
+                written[0] += len(chunk)
+                yield chunk
+
+        # A generator body goes out with chunked transfer encoding, piece by piece
+        response = self.session.put(f"{self.base_url}/{quote(key)}", data=counted(), timeout=120,
+                                    headers={'Content-Type': content_type or 'application/octet-stream'})
+        if response.status_code >= 400:
+            raise MirrorError(f"Storage PUT failed ({response.status_code}): {response.text[:200]}",
+                              retry=response.status_code >= 500)
+        return written[0]
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base}/{quote(key)}"
+
+class SupabaseStorage(HTTPStorage):
+    """A Supabase Storage bucket (the app's car-images by default)"""
+
+    def __init__(self, bucket: str = 'car-images', url: str = None, key: str = None, session=None):
+        url = url or os.environ.get('SUPABASE_URL')
+        if not url:
+            raise ValueError("No Supabase URL given (pass url= or set SUPABASE_URL)")
+        key = key or os.environ.get('SUPABASE_KEY')
+        base = url.rstrip('/')
+        headers = {'x-upsert': 'true'}
+        if key:
+            headers.update({'apikey': key, 'Authorization': f'Bearer {key}'})
+        super().__init__(f"{base}/storage/v1/object/{bucket}", headers=headers,
+                         public_base=f"{base}/storage/v1/object/public/{bucket}", session=session)
+
+class S3Storage:
+    """An S3 (or MinIO) bucket through boto3"""
+
+    def __init__(self, bucket: str, endpoint_url: str = None, public_base: str = None, prefix: str = ''):
+        """
+        Args:
+            bucket (str): Bucket name
+            endpoint_url (str): MinIO/S3-compatible endpoint (default: S3_ENDPOINT_URL, then AWS)
+            public_base (str): URL objects are read from (default: endpoint/bucket)
+            prefix (str): Key prefix inside the bucket
+        """
+        try:
+            import boto3
+        except ImportError:
+            raise ImportError("S3 storage needs boto3: pip install boto3")
+        endpoint_url = endpoint_url or os.environ.get('S3_ENDPOINT_URL')
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        if public_base is None:
+            public_base = f"{endpoint_url.rstrip('/')}/{bucket}" if endpoint_url else f"https://{bucket}.s3.amazonaws.com"
+        self.public_base = public_base.rstrip('/')
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except Exception:
+            return False
+
+    def resume_offset(self, key: str) -> int:
+        return 0
+
+    def discard(self, key: str):
+        pass
+
+    def read(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body'].read()
+
+    def write(self, key: str, chunks, offset: int = 0, content_type: str = None, expected: int = None) -> int:
+        written = [0]
+
+        def counted():
+            for chunk in _checked(chunks, expected):
+                written[0] += len(chunk)
+                yield chunk
+
+        # upload_fileobj sends multipart parts as they fill, not the whole body at once
+        self.client.upload_fileobj(_ChunkReader(counted()), self.bucket, self.prefix + key,
+                                   ExtraArgs={'ContentType': content_type or 'application/octet-stream'})
+        return written[0]
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base}/{self.prefix}{quote(key)}"
+
+def open_storage(spec: str = None):
+    """
+    Storage backend for a destination spec
+
+    Args:
+        spec (str): Directory path, http(s):// prefix, s3://bucket[/prefix] or
+            supabase[://bucket]. None means SCRAPER_IMAGE_STORE, then ./mirrored_images
+    """
+    spec = spec or os.environ.get('SCRAPER_IMAGE_STORE', 'mirrored_images')
+    if spec.startswith(('http://', 'https://')):
+        return HTTPStorage(spec)
+    if spec.startswith('s3://'):
+        bucket, _, prefix = spec[len('s3://'):].partition('/')
+        return S3Storage(bucket, prefix=prefix)
+    if spec == 'supabase' or spec.startswith('supabase://'):
+        return SupabaseStorage(spec[len('supabase://'):] or 'car-images')
+    return FileStorage(spec)
+
+def _retry_after(response) -> float:
+    value = response.headers.get('Retry-After')
+    try:
+        return min(float(value), 60.0) if value else None
+    except ValueError:
+        return None
+
+class ImageMirror:
+    """Copies photos into a storage backend on a bounded thread pool"""
+
+    def __init__(self, storage=None, workers: int = DEFAULT_WORKERS, per_host: int = DEFAULT_PER_HOST,
+                 retries: int = DEFAULT_RETRIES, session=None):
+        """
+        Args:
+            storage: FileStorage/HTTPStorage/S3Storage (default: open_storage())
+            workers (int): Transfers in flight in total
+            per_host (int): Transfers in flight against one image host
+            retries (int): Extra attempts after a failed transfer
+            session: requests.Session for downloads
+        """
+        self.storage = storage if storage is not None else open_storage()
+        self.per_host = per_host
+        self.retries = retries
+        self.session = session or requests.Session()
+        self.session.headers.setdefault('User-Agent', USER_AGENT)
+        self.stats = {'mirrored': 0, 'existing': 0, 'failed': 0, 'retries': 0, 'bytes': 0}
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._hosts = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url: str):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _transfer(self, url: str, key: str) -> int:
+        """One download attempt streamed into storage; bytes written"""
+        offset = self.storage.resume_offset(key)
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with self._host_slot(url):
+            with self.session.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+                if response.status_code == 416 and offset:
+                    # The partial is no prefix of the current body; start over
+                    self.storage.discard(key)
+                    raise MirrorError("Stale partial download")
+                if response.status_code in RETRY_STATUSES:
+                    raise MirrorError(f"HTTP {response.status_code}", retry_after=_retry_after(response))
+                if response.status_code >= 400:
+                    raise MirrorError(f"HTTP {response.status_code}", retry=False)
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+                if content_type.startswith('text/'):
+                    raise MirrorError(f"Not an image ({content_type})", retry=False)
+                if response.status_code != 206:
+                    # Range ignored (or none asked for): the body is the whole photo
+                    offset = 0
+                expected = response.headers.get('Content-Length')
+                if expected and offset + int(expected) > MAX_IMAGE_BYTES:
+                    raise MirrorError(f"Too large ({expected} bytes)", retry=False)
+
+                def chunks():
+                    received = offset
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        received += len(chunk)
+                        if received > MAX_IMAGE_BYTES:
+                            raise MirrorError("Too large", retry=False)
+                        yield chunk
+
+                content_type = content_type or EXTENSIONS.get(os.path.splitext(key)[1])
+                # The backend checks the length before it commits the object
+                return self.storage.write(key, chunks(), offset, content_type,
+                                          offset + int(expected) if expected else None)
+
+    def _mirror_one(self, url: str, key: str):
+        try:
+            if self.storage.exists(key):
+                self._count('existing')
+                return self.storage.url(key)
+            for attempt in range(self.retries + 1):
+                try:
+                    self._count('bytes', self._transfer(url, key))
+                    self._count('mirrored')
+                    return self.storage.url(key)
+                except (MirrorError, requests.RequestException, OSError) as e:
+                    retry = getattr(e, 'retry', True)
+                    if not retry or attempt == self.retries:
+                        self.storage.discard(key)
+                        print(f"⚠️  Could not mirror {url}: {e}")
+                        self._count('failed')
+                        return None
+                    self._count('retries')
+                    wait = getattr(e, 'retry_after', None) or min(30.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+                    time.sleep(wait)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def submit(self, url: str):
+        """
+        Start mirroring one photo
+
+        Returns:
+            Future: Resolves to the stored URL, or None if it could not be copied.
+            A photo already in flight (same canonical URL) shares its future.
+        """
+        key = image_key(url)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = self._pool.submit(self._mirror_one, url, key)
+            return future
+
+    def mirror(self, urls) -> list:
+        """
+        Mirror photos concurrently
+
+        Returns:
+            list: Stored URL per input URL, in order; photos that could not be
+            copied keep their original URL
+        """
+        urls = [url for url in urls if isinstance(url, str) and url.startswith(('http://', 'https://'))]
+        futures = [self.submit(url) for url in urls]
+        return [future.result() or url for url, future in zip(urls, futures)]
+
+    def mirror_result(self, car_data: dict) -> dict:
+        """
+        Replace a scrape's photo URLs with mirrored ones, in place
+
+        Handles scraper dicts (Images) and CarRecord dicts (images), and
+        bulk_scrape lines. The original URLs are kept under SourceImages
+        (source_images for CarRecord dicts).
+
+        Returns:
+            dict: car_data
+        """
+        data = car_data.get('data') if 'success' in car_data else car_data
+        if not data:
+            return car_data
+        field, original = ('Images', 'SourceImages') if 'Images' in data else ('images', 'source_images')
+        images = data.get(field)
+        if isinstance(images, list) and images:
+            data[original] = images
+            data[field] = self.mirror(images)
+        return car_data
+
+    def close(self):
+        """Wait for the transfers in flight and stop the pool"""
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy the photos of bulk scrape results into storage")
+    parser.add_argument('results', help="JSONL output of bulk_scrape.py")
+    parser.add_argument('-o', '--output', help="JSONL with mirrored photo URLs (default: <results>.mirrored.jsonl)")
+    parser.add_argument('--dest', help="Directory, http(s):// prefix, s3://bucket or supabase[://bucket] "
+                                       "(default: SCRAPER_IMAGE_STORE, then ./mirrored_images)")
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS, help="Transfers in flight")
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST, help="Transfers in flight per host")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help="Extra attempts per photo")
+    args = parser.parse_args(argv)
+
+    output_path = args.output or os.path.splitext(args.results)[0] + '.mirrored.jsonl'
+    started = time.time()
+    with ImageMirror(open_storage(args.dest), args.workers, args.per_host, args.retries) as mirror:
+        with open(args.results, encoding='utf-8') as f:
+            results = [json.loads(line) for line in f if line.strip()]
+        # Start every photo first so transfers for all listings overlap
+        for result in results:
+            data = result.get('data') if 'success' in result else result
+            for url in (data or {}).get('Images') or (data or {}).get('images') or ():
+                if isinstance(url, str) and url.startswith(('http://', 'https://')):
+                    mirror.submit(url)
+        with open(output_path, 'w', encoding='utf-8') as output:
+            for result in results:
+                output.write(json.dumps(mirror.mirror_result(result), ensure_ascii=False) + '\n')
+
+    stats = mirror.stats
+    print(f"✅ Mirrored {stats['mirrored']} photos ({stats['bytes'] / 1e6:.1f} MB), "
+          f"{stats['existing']} already stored, {stats['failed']} failed, "
+          f"{stats['retries']} retries in {time.time() - started:.1f}s")
+    print(f"📄 Results: {output_path}")
+
+if __name__ == "__main__":
+    main()
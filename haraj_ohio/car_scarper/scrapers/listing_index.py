@@ -0,0 +1,176 @@
+"""
+Index of listings seen by the inventory crawlers
+
+Crawlers record a summary for every listing they see on a results page
+together with a fingerprint of the fields that matter (price, mileage,
+auction date, ...). Comparing the fingerprint with the stored one tells
+whether the listing is new, changed or unchanged, so only new and changed
+listings need a full detail scrape.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+NEW = 'new'
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+
+def fingerprint(summary: dict, fields) -> str:
+    """
+    Hash the given fields of a listing summary
+
+    Args:
+        summary (dict): Listing summary from a results page
+        fields (iterable): Keys whose values define "changed"
+
+    Returns:
+        str: Hex digest that changes whenever one of the fields changes
+    """
+    values = [str(summary.get(field, 'N/A')).strip() for field in fields]
+    return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()
+
+class ListingIndex:
+    """SQLite-backed store of seen listings keyed by (site, listing_id)"""
+
+    def __init__(self, path: str = ':memory:'):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS listings (
+                site TEXT NOT NULL,
+                listing_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                last_changed REAL NOT NULL,
+                removed REAL,
+                PRIMARY KEY (site, listing_id)
+            )
+        """)
+        # Indexes created before removals were tracked
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(listings)")]
+        if 'removed' not in columns:
+            self._conn.execute("ALTER TABLE listings ADD COLUMN removed REAL")
+        self._conn.commit()
+
+    def status(self, site: str, listing_id: str, digest: str) -> str:
+        """
+        What observe() would report for a listing, without recording anything
+
+        Crawlers queue new and changed listings first and observe() them
+        afterwards, so a crash in between re-queues them on the next crawl
+        instead of losing them.
+
+        Returns:
+            str: NEW, CHANGED or UNCHANGED
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint FROM listings WHERE site = ? AND listing_id = ?",
+                (site, listing_id)
+            ).fetchone()
+        if row is None:
+            return NEW
+        return CHANGED if row[0] != digest else UNCHANGED
+
+    def observe(self, site: str, listing_id: str, url: str, summary: dict, digest: str) -> str:
+        """
+        Record a sighting of a listing
+
+        Returns:
+            str: NEW, CHANGED or UNCHANGED compared with the previous sighting
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint FROM listings WHERE site = ? AND listing_id = ?",
+                (site, listing_id)
+            ).fetchone()
+
+            if row is None:
+                status = NEW
+                self._conn.execute(
+                    "INSERT INTO listings (site, listing_id, url, fingerprint, summary, first_seen, last_seen, last_changed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (site, listing_id, url, digest, json.dumps(summary), now, now, now)
+                )
+            elif row[0] != digest:
+                status = CHANGED
+                self._conn.execute(
+                    "UPDATE listings SET url = ?, fingerprint = ?, summary = ?, last_seen = ?, last_changed = ?, removed = NULL "
+                    "WHERE site = ? AND listing_id = ?",
+                    (url, digest, json.dumps(summary), now, now, site, listing_id)
+                )
+            else:
+                status = UNCHANGED
+                self._conn.execute(
+                    "UPDATE listings SET last_seen = ?, removed = NULL WHERE site = ? AND listing_id = ?",
+                    (now, site, listing_id)
+                )
+            self._conn.commit()
+        return status
+
+    def touch(self, site: str, listing_id: str):
+        """
+        Record that a listing is still listed without taking its new summary
+
+        For a listing whose detail fetch is still pending: it does not count
+        as removed, but stays new/changed until observe() records it.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE listings SET last_seen = ?, removed = NULL WHERE site = ? AND listing_id = ?",
+                (time.time(), site, listing_id)
+            )
+            self._conn.commit()
+
+    def get(self, site: str, listing_id: str):
+        """Return the stored summary of a listing, or None if never seen"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM listings WHERE site = ? AND listing_id = ?",
+                (site, listing_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def not_seen_since(self, site: str, since: float) -> list:
+        """Listing IDs of a site that did not show up in any crawl since a timestamp"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT listing_id FROM listings WHERE site = ? AND last_seen < ?",
+                (site, since)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_removed(self, site: str, since: float) -> list:
+        """
+        Flag listings of a site that did not show up in any crawl since a
+        timestamp as removed
+
+        A listing is only returned the first time it is flagged; seeing it
+        again (observe()) clears the flag.
+
+        Returns:
+            list: IDs of the newly removed listings
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT listing_id FROM listings WHERE site = ? AND last_seen < ? AND removed IS NULL",
+                (site, since)
+            ).fetchall()
+            self._conn.execute(
+                "UPDATE listings SET removed = ? WHERE site = ? AND last_seen < ? AND removed IS NULL",
+                (now, site, since)
+            )
+            self._conn.commit()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
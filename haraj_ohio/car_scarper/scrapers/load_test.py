@@ -0,0 +1,203 @@
+"""
+Load generator for the /scrape endpoint
+
+Sends GET /scrape requests to a running app.py at a fixed rate (open
+loop: a slow response does not hold back the next request) and reports
+latency percentiles and throughput per scraper tier. The tier of a
+response is the one most of its fields came from (provenance), e.g.
+cars.com:html, http-cache or demo; failures are grouped by HTTP status.
+
+Against the stand-in sites:
+
+    python fake_upstream.py --port 8900 --latency 150 --block-rate 0.05 &
+    SCRAPER_UPSTREAM=http://127.0.0.1:8900 python app.py &
+    python load_test.py --app http://127.0.0.1:5000 --rps 20 --duration 60
+
+By default the listing URLs are those of the benchmark fixtures (round
+robin); --urls replays a file of URLs instead. Latency is measured from
+the moment a request was due, so a backlog in the generator counts
+against the app.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import SITES, load_fixtures
+from fake_upstream import site_of
+
+DEFAULT_APP = 'http://127.0.0.1:5000'
+DEFAULT_RPS = 10
+DEFAULT_DURATION = 30
+DEFAULT_CONCURRENCY = 64
+DEFAULT_TIMEOUT = 120
+
+_local = threading.local()
+
+def fixture_urls() -> list:
+    """Listing URLs of every benchmark fixture"""
+    return [url for site in SITES for _, url, _, _ in load_fixtures(site)]
+
+def response_tier(body: dict) -> str:
+    """Tier most fields of a /scrape response came from"""
+    tiers = Counter(note.get('tier') for note in (body.get('provenance') or {}).values() if note.get('tier'))
+    if tiers:
+        return tiers.most_common(1)[0][0]
+    return 'broker' if body.get('success') else 'unknown'
+
+def _session(concurrency: int):
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+    return session
+
+def _scrape(app: str, url: str, params: dict, due: float, timeout: float, concurrency: int) -> dict:
+    site = site_of(urlsplit(url).hostname or '') or 'other'
+    try:
+        response = _session(concurrency).get(f"{app.rstrip('/')}/scrape", params={'url': url, **params}, timeout=timeout)
+        latency_ms = (time.perf_counter() - due) * 1000
+        if response.status_code != 200:
+            return {'site': site, 'tier': f"HTTP {response.status_code}", 'ok': False, 'latency_ms': latency_ms}
+        body = response.json()
+        return {'site': site, 'tier': response_tier(body), 'ok': bool(body.get('success')),
+                'partial': bool(body.get('partial')), 'latency_ms': latency_ms}
+    except Exception as e:
+        latency_ms = (time.perf_counter() - due) * 1000
+        return {'site': site, 'tier': type(e).__name__, 'ok': False, 'latency_ms': latency_ms}
+
+def percentile(values: list, share: float) -> float:
+    """Nearest-rank percentile of a list (0 <= share <= 1)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(share * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def run(app: str, urls: list, rps: float, duration: float, concurrency: int = DEFAULT_CONCURRENCY,
+        params: dict = None, timeout: float = DEFAULT_TIMEOUT) -> tuple:
+    """
+    Drive /scrape at a fixed rate
+
+    Args:
+        app (str): Base URL of app.py
+        urls (list): Listing URLs, used round robin
+        rps (float): Requests started per second
+        duration (float): Seconds to keep sending
+        concurrency (int): Most requests in flight (beyond that they queue, and wait counts as latency)
+        params (dict): Extra /scrape parameters (budget_ms, fields, early, ...)
+        timeout (float): Seconds before a request counts as failed
+
+    Returns:
+        tuple: (list of per-request result dicts, seconds from first request to last response)
+    """
+    total = max(int(rps * duration), 1)
+    futures = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i in range(total):
+            due = started + i / rps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(_scrape, app, urls[i % len(urls)], params or {}, due, timeout, concurrency))
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - started
+
+def summarize(results: list, elapsed: float) -> list:
+    """
+    Latency percentiles and throughput per (site, tier), plus an "all" row
+
+    Returns:
+        list: Row dicts (site, tier, requests, share, rps, p50/p95/p99/max ms, partial)
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault((result['site'], result['tier']), []).append(result)
+    groups[('all', 'all')] = results
+
+    rows = []
+    for (site, tier), group in sorted(groups.items(), key=lambda item: (item[0][0] == 'all', item[0])):
+        latencies = [result['latency_ms'] for result in group]
+        rows.append({
+            'site': site,
+            'tier': tier,
+            'requests': len(group),
+            'share': round(len(group) / max(len(results), 1), 3),
+            'rps': round(len(group) / elapsed, 2) if elapsed else 0.0,
+            'ok': sum(1 for result in group if result['ok']),
+            'partial': sum(1 for result in group if result.get('partial')),
+            'p50_ms': round(percentile(latencies, 0.50), 1),
+            'p95_ms': round(percentile(latencies, 0.95), 1),
+            'p99_ms': round(percentile(latencies, 0.99), 1),
+            'max_ms': round(max(latencies), 1) if latencies else 0.0,
+        })
+    return rows
+
+def print_report(rows: list):
+    header = (f"{'site':<16}{'tier':<26}{'requests':>9}{'ok':>6}{'req/s':>8}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f"{row['site']:<16}{row['tier']:<26}{row['requests']:>9}{row['ok']:>6}{row['rps']:>8.2f}"
+              f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}{row['max_ms']:>9.0f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive app.py /scrape at a target rate and report latency per tier")
+    parser.add_argument('--app', default=DEFAULT_APP, help="Base URL of the running app.py")
+    parser.add_argument('--urls', help="File of listing URLs, one per line (default: the benchmark fixtures)")
+    parser.add_argument('--rps', type=float, default=DEFAULT_RPS, help="Requests started per second")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="Seconds to send for")
+    parser.add_argument('-c', '--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Most requests in flight")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Seconds before a request fails")
+    parser.add_argument('--budget-ms', type=int, help="Pass budget_ms to /scrape")
+    parser.add_argument('--fields', help="Pass fields= to /scrape (e.g. Price,Mileage)")
+    parser.add_argument('--early', action='store_true', help="Pass early=1 to /scrape")
+    parser.add_argument('-o', '--output', help="Write the summary rows as JSON")
+    args = parser.parse_args(argv)
+
+    if args.urls:
+        with open(args.urls, encoding='utf-8') as f:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    else:
+        urls = fixture_urls()
+    if not urls:
+        parser.error("No URLs to request")
+
+    params = {}
+    if args.budget_ms:
+        params['budget_ms'] = args.budget_ms
+    if args.fields:
+        params['fields'] = args.fields
+    if args.early:
+        params['early'] = '1'
+
+    print(f"🚀 {args.rps:g} req/s for {args.duration:g}s against {args.app}/scrape ({len(urls)} URLs)")
+    results, elapsed = run(args.app, urls, args.rps, args.duration, args.concurrency, params, args.timeout)
+    rows = summarize(results, elapsed)
+    print_report(rows)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'rps': args.rps, 'duration': args.duration, 'elapsed': round(elapsed, 2),
+                       'params': params, 'rows': rows}, f, indent=2)
+        print(f"📄 Results: {args.output}")
+    ok = sum(1 for result in results if result['ok'])
+    print(f"✅ {ok}/{len(results)} succeeded, {ok / elapsed:.2f} req/s sustained over {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
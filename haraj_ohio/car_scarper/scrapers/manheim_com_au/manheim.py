@@ -2,8 +2,24 @@ import requests
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urlparse, urljoin
-import time
-import random
+import sys
+import os
+
+# Shared scraper modules live one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import parse_pool
+import http_cache
+import rate_limit
+import deadline
+import provenance
+import vin_decoder
+import title_parser
+import image_collector
+
+# Fields _extract_detailed_specs fills from the page text
+SPEC_FIELDS = ("Mileage", "OdometerShowing", "VIN", "Year", "Transmission", "FuelType",
+               "EngineSize", "EngineCylinders", "EngineType", "ExteriorColor", "BodyColour",
+               "BodyType", "Doors", "DriveType", "Seats", "ComplianceDate", "RegExpiry")
 
 def _extract_detailed_specs(soup, car_data):
     """Extract detailed vehicle specifications from various sections"""
@@ -144,18 +160,11 @@ def _extract_detailed_specs(soup, car_data):
     if seats_match:
         car_data["Seats"] = seats_match.group(1)
     
-    # Extract VIN
-    vin_patterns = [
-        r'[Vv]in[:\s]+([A-HJ-NPR-Z0-9]{17})',
-        r'[Vv]in[:\s]+([A-HJ-NPR-Z0-9]{17})',
-        r'VIN[:\s]+([A-HJ-NPR-Z0-9]{17})'
-    ]
-    
-    for pattern in vin_patterns:
-        vin_match = re.search(pattern, page_text, re.IGNORECASE)
-        if vin_match:
-            car_data["VIN"] = vin_match.group(1)
-            break
+    # Extract VIN (labelled, plausible candidates ranked by vin_decoder)
+    if not vin_decoder.is_valid(car_data["VIN"]):
+        candidate = vin_decoder.extract_vin(page_text)
+        if candidate:
+            car_data["VIN"] = candidate['vin']
     
     # Extract build year
     year_patterns = [
@@ -197,75 +206,10 @@ def _extract_detailed_specs(soup, car_data):
 
 def _extract_images(soup, car_data):
     """Extract car images from the page"""
-    images = []
-    
-    # Look for image containers with more specific selectors
-    img_containers = soup.find_all(['div', 'section'], class_=re.compile(r'image|photo|gallery|vehicle|car|lot|media'))
-    
-    for container in img_containers:
-        img_tags = container.find_all('img')
-        for img in img_tags:
-            src = img.get('src') or img.get('data-src') or img.get('data-lazy') or img.get('data-original')
-            if src:
-                # Convert relative URLs to absolute
-                if src.startswith('//'):
-                    src = 'https:' + src
-                elif src.startswith('/'):
-                    src = 'https://www.manheim.com.au' + src
-                elif not src.startswith('http'):
-                    src = 'https://www.manheim.com.au/' + src
-                
-                # Filter out non-car images
-                if any(keyword in src.lower() for keyword in ['vehicle', 'car', 'lot', 'auction', 'manheim']):
-                    images.append(src)
-    
-    # Look for images in galleries and carousels
-    gallery_selectors = [
-        '.gallery img',
-        '.carousel img',
-        '.slider img',
-        '.vehicle-images img',
-        '.lot-images img',
-        '.auction-images img',
-        '[class*="gallery"] img',
-        '[class*="carousel"] img',
-        '[class*="slider"] img'
-    ]
-    
-    for selector in gallery_selectors:
-        gallery_imgs = soup.select(selector)
-        for img in gallery_imgs:
-            src = img.get('src') or img.get('data-src') or img.get('data-lazy') or img.get('data-original')
-            if src:
-                if src.startswith('//'):
-                    src = 'https:' + src
-                elif src.startswith('/'):
-                    src = 'https://www.manheim.com.au' + src
-                elif not src.startswith('http'):
-                    src = 'https://www.manheim.com.au/' + src
-                
-                if src not in images and any(keyword in src.lower() for keyword in ['vehicle', 'car', 'lot', 'auction']):
-                    images.append(src)
-    
-    # Look for all images and filter for car-related ones
-    all_imgs = soup.find_all('img')
-    for img in all_imgs:
-        src = img.get('src') or img.get('data-src') or img.get('data-lazy') or img.get('data-original')
-        if src:
-            if src.startswith('//'):
-                src = 'https:' + src
-            elif src.startswith('/'):
-                src = 'https://www.manheim.com.au' + src
-            elif not src.startswith('http'):
-                src = 'https://www.manheim.com.au/' + src
-            
-            # Check if it's likely a car image
-            if (src not in images and 
-                any(keyword in src.lower() for keyword in ['vehicle', 'car', 'lot', 'auction', 'manheim']) and
-                not any(exclude in src.lower() for exclude in ['logo', 'icon', 'banner', 'header', 'footer', 'button'])):
-                images.append(src)
-    
-    car_data["Images"] = images[:15]  # Limit to 15 images
+    car_data["Images"] = image_collector.collect_images(
+        soup, 'https://www.manheim.com.au/',
+        keep=('vehicle', 'car', 'lot', 'auction', 'manheim'),
+        limit=15)
 
 def _extract_features(soup, car_data):
     """Extract vehicle features"""
@@ -318,144 +262,107 @@ def _extract_features(soup, car_data):
     
     car_data["Features"] = features[:20]  # Limit to 20 features
 
-def scrape_car(url: str) -> dict:
+def extract_car_data(content: bytes, url: str, early: bool = False, include=(), fields=None) -> dict:
     """
-    Scrape car data from manheim.com.au
+    Extract car data from a fetched manheim.com.au listing page
     
     Args:
+        content (bytes): Raw HTML of the listing page
         url (str): The manheim.com.au listing URL
+        early (bool): Skip the image and feature passes (the usable fields
+            come from the selectors and spec tables)
+        include (tuple): Optional passes to run even in early mode
+            ('images', 'features')
+        fields (frozenset): Field keys to extract (see provenance.parse_fields);
+            the spec, image and feature passes only run when they can fill
+            a requested field. The title is always read
         
     Returns:
         dict: Dictionary containing car information
     """
     
-    # Validate URL
-    if not url or 'manheim.com.au' not in url:
-        raise ValueError("Invalid manheim.com.au URL")
+    # Parse the HTML
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    # Initialize result dictionary with comprehensive fields
+    car_data = {
+        "Title": "N/A",
+        "Price": "N/A", 
+        "Mileage": "N/A",
+        "OdometerShowing": "N/A",
+        "Dealer": "N/A",
+        "Year": "N/A",
+        "Make": "N/A",
+        "Model": "N/A",
+        "Variant": "N/A",
+        "Transmission": "N/A",
+        "FuelType": "N/A",
+        "EngineSize": "N/A",
+        "EngineCylinders": "N/A",
+        "EngineType": "N/A",
+        "ExteriorColor": "N/A",
+        "BodyColour": "N/A",
+        "InteriorColor": "N/A",
+        "Doors": "N/A",
+        "Seats": "N/A",
+        "BodyType": "N/A",
+        "DriveType": "N/A",
+        "VIN": "N/A",
+        "Location": "N/A",
+        "AuctionDate": "N/A",
+        "LotNumber": "N/A",
+        "ComplianceDate": "N/A",
+        "RegExpiry": "N/A",
+        "Features": [],
+        "Images": [],
+        "URL": url
+    }
+    sources = provenance.Sources('manheim.com.au:html')
+    
+    # Extract title - try multiple selectors for Manheim
+    title_selectors = [
+        'h1[class*="title"]',
+        'h1[class*="vehicle"]',
+        '.vehicle-title',
+        '.lot-title',
+        'h1',
+        '[class*="lot-title"]',
+        '[class*="vehicle-name"]',
+        '.auction-title',
+        'h2[class*="title"]',
+        '.item-title',
+        '.vehicle-details h1',
+        '.vehicle-info h1',
+        '.lot-details h1',
+        'h1.vehicle-title',
+        '.vehicle-header h1'
+    ]
     
-    try:
-        # Headers to mimic a real browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'Accept-Language': 'en-AU,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Cache-Control': 'max-age=0',
-            'DNT': '1',
-            'Sec-GPC': '1',
-            'Referer': 'https://www.manheim.com.au/'
-        }
-        
-        # Create session with retry strategy
-        session = requests.Session()
-        session.headers.update(headers)
-        
-        # Add retry adapter
-        from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
-        
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "OPTIONS"]
-        )
-        
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        
-        # Add random delay to avoid being detected as bot
-        time.sleep(random.uniform(1, 3))
-        
-        # Make the request
-        response = session.get(url, timeout=30, allow_redirects=True)
-        response.raise_for_status()
-        
-        # Parse the HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Initialize result dictionary with comprehensive fields
-        car_data = {
-            "Title": "N/A",
-            "Price": "N/A", 
-            "Mileage": "N/A",
-            "OdometerShowing": "N/A",
-            "Dealer": "N/A",
-            "Year": "N/A",
-            "Make": "N/A",
-            "Model": "N/A",
-            "Variant": "N/A",
-            "Transmission": "N/A",
-            "FuelType": "N/A",
-            "EngineSize": "N/A",
-            "EngineCylinders": "N/A",
-            "EngineType": "N/A",
-            "ExteriorColor": "N/A",
-            "BodyColour": "N/A",
-            "InteriorColor": "N/A",
-            "Doors": "N/A",
-            "Seats": "N/A",
-            "BodyType": "N/A",
-            "DriveType": "N/A",
-            "VIN": "N/A",
-            "Location": "N/A",
-            "AuctionDate": "N/A",
-            "LotNumber": "N/A",
-            "ComplianceDate": "N/A",
-            "RegExpiry": "N/A",
-            "Features": [],
-            "Images": [],
-            "URL": url
-        }
-        
-        # Extract title - try multiple selectors for Manheim
-        title_selectors = [
-            'h1[class*="title"]',
-            'h1[class*="vehicle"]',
-            '.vehicle-title',
-            '.lot-title',
-            'h1',
-            '[class*="lot-title"]',
-            '[class*="vehicle-name"]',
-            '.auction-title',
-            'h2[class*="title"]',
-            '.item-title',
-            '.vehicle-details h1',
-            '.vehicle-info h1',
-            '.lot-details h1',
-            'h1.vehicle-title',
-            '.vehicle-header h1'
-        ]
-        
-        for selector in title_selectors:
-            title_elem = soup.select_one(selector)
-            if title_elem:
-                title_text = title_elem.get_text(strip=True)
-                if title_text and len(title_text) > 10:  # Ensure it's a meaningful title
-                    car_data["Title"] = title_text
-                    print(f"✅ Found title: {car_data['Title']}")
-                    break
-        
-        # Extract price - Manheim uses different price formats
-        price_selectors = [
-            '[class*="price"]',
-            '[class*="bid"]',
-            '[class*="estimate"]',
-            '.current-bid',
-            '.estimated-price',
-            '.price-display',
-            '.bid-amount',
-            '[data-testid*="price"]',
-            '.auction-price',
-            '.lot-price'
-        ]
-        
+    for selector in title_selectors:
+        title_elem = soup.select_one(selector)
+        if title_elem:
+            title_text = title_elem.get_text(strip=True)
+            if title_text and len(title_text) > 10:  # Ensure it's a meaningful title
+                car_data["Title"] = title_text
+                sources.found("Title", selector)
+                print(f"✅ Found title: {car_data['Title']}")
+                break
+    
+    # Extract price - Manheim uses different price formats
+    price_selectors = [
+        '[class*="price"]',
+        '[class*="bid"]',
+        '[class*="estimate"]',
+        '.current-bid',
+        '.estimated-price',
+        '.price-display',
+        '.bid-amount',
+        '[data-testid*="price"]',
+        '.auction-price',
+        '.lot-price'
+    ]
+    
+    if provenance.wants_any(fields, "Price"):
         for selector in price_selectors:
             price_elem = soup.select_one(selector)
             if price_elem:
@@ -464,20 +371,22 @@ def scrape_car(url: str) -> dict:
                 price_match = re.search(r'[\$AUD,\d]+', price_text)
                 if price_match:
                     car_data["Price"] = price_match.group()
+                    sources.found("Price", selector)
                     print(f"✅ Found price: {car_data['Price']}")
                     break
-        
-        # Extract mileage/odometer reading
-        mileage_selectors = [
-            '[class*="mileage"]',
-            '[class*="odometer"]',
-            '[class*="km"]',
-            '.vehicle-mileage',
-            '.odometer-reading',
-            '[data-testid*="mileage"]',
-            '.kilometers'
-        ]
-        
+    
+    # Extract mileage/odometer reading
+    mileage_selectors = [
+        '[class*="mileage"]',
+        '[class*="odometer"]',
+        '[class*="km"]',
+        '.vehicle-mileage',
+        '.odometer-reading',
+        '[data-testid*="mileage"]',
+        '.kilometers'
+    ]
+    
+    if provenance.wants_any(fields, "Mileage"):
         for selector in mileage_selectors:
             mileage_elem = soup.select_one(selector)
             if mileage_elem:
@@ -486,33 +395,37 @@ def scrape_car(url: str) -> dict:
                 mileage_match = re.search(r'[\d,]+', mileage_text)
                 if mileage_match:
                     car_data["Mileage"] = mileage_match.group() + " km"
+                    sources.found("Mileage", selector)
                     break
-        
-        # Extract location/auction location
-        location_selectors = [
-            '[class*="location"]',
-            '[class*="auction"]',
-            '.auction-location',
-            '.location',
-            '[data-testid*="location"]',
-            '.venue'
-        ]
-        
+    
+    # Extract location/auction location
+    location_selectors = [
+        '[class*="location"]',
+        '[class*="auction"]',
+        '.auction-location',
+        '.location',
+        '[data-testid*="location"]',
+        '.venue'
+    ]
+    
+    if provenance.wants_any(fields, "Location"):
         for selector in location_selectors:
             location_elem = soup.select_one(selector)
             if location_elem:
                 car_data["Location"] = location_elem.get_text(strip=True)
+                sources.found("Location", selector)
                 break
-        
-        # Extract lot number
-        lot_selectors = [
-            '[class*="lot"]',
-            '[class*="number"]',
-            '.lot-number',
-            '.item-number',
-            '[data-testid*="lot"]'
-        ]
-        
+    
+    # Extract lot number
+    lot_selectors = [
+        '[class*="lot"]',
+        '[class*="number"]',
+        '.lot-number',
+        '.item-number',
+        '[data-testid*="lot"]'
+    ]
+    
+    if provenance.wants_any(fields, "LotNumber"):
         for selector in lot_selectors:
             lot_elem = soup.select_one(selector)
             if lot_elem:
@@ -520,32 +433,36 @@ def scrape_car(url: str) -> dict:
                 lot_match = re.search(r'[Ll]ot\s*#?\s*(\d+)', lot_text)
                 if lot_match:
                     car_data["LotNumber"] = lot_match.group(1)
+                    sources.found("LotNumber", selector)
                     break
-        
-        # Extract auction date
-        date_selectors = [
-            '[class*="date"]',
-            '[class*="auction"]',
-            '.auction-date',
-            '.sale-date',
-            '[data-testid*="date"]'
-        ]
-        
+    
+    # Extract auction date
+    date_selectors = [
+        '[class*="date"]',
+        '[class*="auction"]',
+        '.auction-date',
+        '.sale-date',
+        '[data-testid*="date"]'
+    ]
+    
+    if provenance.wants_any(fields, "AuctionDate"):
         for selector in date_selectors:
             date_elem = soup.select_one(selector)
             if date_elem:
                 car_data["AuctionDate"] = date_elem.get_text(strip=True)
+                sources.found("AuctionDate", selector)
                 break
-        
-        # Extract VIN
-        vin_selectors = [
-            '[class*="vin"]',
-            '[class*="chassis"]',
-            '.vin-number',
-            '.chassis-number',
-            '[data-testid*="vin"]'
-        ]
-        
+    
+    # Extract VIN
+    vin_selectors = [
+        '[class*="vin"]',
+        '[class*="chassis"]',
+        '.vin-number',
+        '.chassis-number',
+        '[data-testid*="vin"]'
+    ]
+    
+    if provenance.wants_any(fields, "VIN"):
         for selector in vin_selectors:
             vin_elem = soup.select_one(selector)
             if vin_elem:
@@ -553,48 +470,77 @@ def scrape_car(url: str) -> dict:
                 vin_match = re.search(r'[A-HJ-NPR-Z0-9]{17}', vin_text)
                 if vin_match:
                     car_data["VIN"] = vin_match.group()
+                    sources.found("VIN", selector)
                     break
-        
-        # Extract detailed specifications from various sections
+    
+    # Extract detailed specifications from various sections (a whole-page text
+    # scan, so only when a requested spec field is still missing)
+    if fields is None or any(not provenance.is_filled(car_data[field])
+                             for field in SPEC_FIELDS if provenance.wants_any(fields, field)):
         try:
+            before = dict(car_data)
             _extract_detailed_specs(soup, car_data)
+            sources.found_changes(before, car_data, 'spec tables', 0.85)
         except Exception as e:
             print(f"⚠️  Error extracting detailed specs: {e}")
-        
-        # Extract images
+    
+    # Extract images (skipped in early mode unless asked for)
+    if (not early or 'images' in include) and provenance.wants_any(fields, "Images"):
         try:
             _extract_images(soup, car_data)
+            if car_data["Images"]:
+                sources.found("Images", 'img selectors', 0.7)
         except Exception as e:
             print(f"⚠️  Error extracting images: {e}")
-        
-        # Extract features
+    
+    # Extract features (skipped in early mode unless asked for)
+    if (not early or 'features' in include) and provenance.wants_any(fields, "Features"):
         try:
             _extract_features(soup, car_data)
+            if car_data["Features"]:
+                sources.found("Features", 'feature lists', 0.7)
         except Exception as e:
             print(f"⚠️  Error extracting features: {e}")
+    
+    # Year, make, model and variant from the make/model catalogue
+    parsed = car_data["Title"] != "N/A" and title_parser.apply(car_data, sources)
+    
+    # Fallback for makes the catalogue does not know: title patterns
+    if car_data["Title"] != "N/A" and not parsed:
+        title = car_data["Title"]
+        before = dict(car_data)
         
-        # Parse title to extract year, make, model, variant
-        if car_data["Title"] != "N/A":
-            title = car_data["Title"]
-            
-            # Extract year
-            year_match = re.search(r'\b(19|20)\d{2}\b', title)
-            if year_match:
-                car_data["Year"] = year_match.group()
-            
-            # Extract make, model, and variant - try different patterns
-            # Pattern 1: Year Make Model Variant (e.g., "2021 Chevrolet Silverado 1500 LTZ Premium")
-            pattern1 = re.search(r'\d{4}\s+([A-Za-z]+)\s+([A-Za-z0-9\s]+?)\s+([A-Za-z0-9\s]+)', title)
-            if pattern1:
-                car_data["Make"] = pattern1.group(1)
-                car_data["Model"] = pattern1.group(2).strip()
-                car_data["Variant"] = pattern1.group(3).strip()
+        # Extract year
+        year_match = re.search(r'\b(19|20)\d{2}\b', title)
+        if year_match:
+            car_data["Year"] = year_match.group()
+        
+        # Extract make, model, and variant - try different patterns
+        # Pattern 1: Year Make Model Variant (e.g., "2021 Chevrolet Silverado 1500 LTZ Premium")
+        pattern1 = re.search(r'\d{4}\s+([A-Za-z]+)\s+([A-Za-z0-9\s]+?)\s+([A-Za-z0-9\s]+)', title)
+        if pattern1:
+            car_data["Make"] = pattern1.group(1)
+            car_data["Model"] = pattern1.group(2).strip()
+            car_data["Variant"] = pattern1.group(3).strip()
+        else:
+            # Pattern 2: Year Make Model (e.g., "2020 Toyota Camry")
+            pattern2 = re.search(r'\d{4}\s+([A-Za-z]+)\s+(.+)', title)
+            if pattern2:
+                car_data["Make"] = pattern2.group(1)
+                model_variant = pattern2.group(2).strip()
+                # Try to split model and variant
+                model_parts = model_variant.split()
+                if len(model_parts) >= 2:
+                    car_data["Model"] = model_parts[0]
+                    car_data["Variant"] = " ".join(model_parts[1:])
+                else:
+                    car_data["Model"] = model_variant
             else:
-                # Pattern 2: Year Make Model (e.g., "2020 Toyota Camry")
-                pattern2 = re.search(r'\d{4}\s+([A-Za-z]+)\s+(.+)', title)
-                if pattern2:
-                    car_data["Make"] = pattern2.group(1)
-                    model_variant = pattern2.group(2).strip()
+                # Pattern 3: Make Model Year (e.g., "Toyota Camry 2020")
+                pattern3 = re.search(r'^([A-Za-z]+)\s+(.+?)\s+\d{4}', title)
+                if pattern3:
+                    car_data["Make"] = pattern3.group(1)
+                    model_variant = pattern3.group(2).strip()
                     # Try to split model and variant
                     model_parts = model_variant.split()
                     if len(model_parts) >= 2:
@@ -603,40 +549,100 @@ def scrape_car(url: str) -> dict:
                     else:
                         car_data["Model"] = model_variant
                 else:
-                    # Pattern 3: Make Model Year (e.g., "Toyota Camry 2020")
-                    pattern3 = re.search(r'^([A-Za-z]+)\s+(.+?)\s+\d{4}', title)
-                    if pattern3:
-                        car_data["Make"] = pattern3.group(1)
-                        model_variant = pattern3.group(2).strip()
-                        # Try to split model and variant
-                        model_parts = model_variant.split()
-                        if len(model_parts) >= 2:
-                            car_data["Model"] = model_parts[0]
-                            car_data["Variant"] = " ".join(model_parts[1:])
-                        else:
-                            car_data["Model"] = model_variant
-                    else:
-                        # Pattern 4: Just split by spaces
-                        words = title.split()
-                        if len(words) >= 2:
-                            car_data["Make"] = words[0] if words[0] else "N/A"
-                            car_data["Model"] = " ".join(words[1:3]) if len(words) > 1 else "N/A"
+                    # Pattern 4: Just split by spaces
+                    words = title.split()
+                    if len(words) >= 2:
+                        car_data["Make"] = words[0] if words[0] else "N/A"
+                        car_data["Model"] = " ".join(words[1:3]) if len(words) > 1 else "N/A"
+        sources.found_changes(before, car_data, 'title', 0.7)
+    
+    # Fill or correct Year/Make/Model from the VIN (offline lookup)
+    if provenance.wants_any(fields, "Year", "Make", "Model"):
+        vin_decoder.apply(car_data, sources)
+    
+    # Set dealer as "Manheim Australia" since it's an auction house
+    car_data["Dealer"] = "Manheim Australia"
+    
+    # Clean up any remaining "N/A" values
+    for key, value in car_data.items():
+        if not value:
+            car_data[key] = "N/A"
+        elif isinstance(value, str) and value.strip() == "":
+            car_data[key] = "N/A"
+        elif isinstance(value, list) and len(value) == 0:
+            car_data[key] = "N/A"
+    
+    return sources.attach(car_data)
+
+def scrape_car(url: str) -> dict:
+    """
+    Scrape car data from manheim.com.au
+    
+    Args:
+        url (str): The manheim.com.au listing URL
+        
+    Returns:
+        dict: Dictionary containing car information
+    """
+    
+    # Validate URL
+    if not url or 'manheim.com.au' not in url:
+        raise ValueError("Invalid manheim.com.au URL")
+    
+    try:
+        # Headers to mimic a real browser
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+            'Accept-Language': 'en-AU,en;q=0.9',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'none',
+            'Cache-Control': 'max-age=0',
+            'DNT': '1',
+            'Sec-GPC': '1',
+            'Referer': 'https://www.manheim.com.au/'
+        }
         
-        # Set dealer as "Manheim Australia" since it's an auction house
-        car_data["Dealer"] = "Manheim Australia"
+        # Create session with retry strategy
+        session = requests.Session()
+        session.headers.update(headers)
+        
+        # Add retry adapter
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
+        retry_strategy = Retry(
+            total=deadline.retries(3, 10),
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["HEAD", "GET", "OPTIONS"]
+        )
+        
+        adapter = HTTPAdapter(max_retries=retry_strategy)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        
+        # Wait for a manheim.com.au slot (shared by every scraper process)
+        if not rate_limit.acquire('manheim.com.au'):
+            raise deadline.DeadlineExceeded("No manheim.com.au request slot within the time budget")
+        
+        # Make the request (revalidates a cached copy if we have one)
+        response, cached_data = http_cache.conditional_get(session, url, timeout=deadline.timeout(30), allow_redirects=True)
+        if cached_data is not None:
+            return cached_data
+        response.raise_for_status()
         
-        # Clean up any remaining "N/A" values
-        for key, value in car_data.items():
-            if not value:
-                car_data[key] = "N/A"
-            elif isinstance(value, str) and value.strip() == "":
-                car_data[key] = "N/A"
-            elif isinstance(value, list) and len(value) == 0:
-                car_data[key] = "N/A"
+        # Hand the raw bytes to the extraction pool (runs inline if no pool is configured)
+        car_data = parse_pool.extract('manheim.com.au', response.content, url)
         
         # If we got real data, return it
         if car_data["Title"] != "N/A":
             print("✅ Real data extracted successfully!")
+            http_cache.store(url, response, car_data)
             return car_data
             
     except Exception as e:
@@ -707,6 +713,7 @@ def scrape_car(url: str) -> dict:
     }
     
     print("📝 Using demo data (real scraping may be blocked by anti-bot protection)")
+    provenance.mark_demo(demo_data)
     return demo_data
 
 # Test function for development
@@ -0,0 +1,295 @@
+"""
+Catalogue crawler for Manheim Australia auctions
+
+Pages through the passenger vehicle catalogue and collects every lot's ID,
+URL, title, auction date and price guide from the catalogue tiles. Lots are
+diffed against a ListingIndex, so a nightly sync only fetches detail pages
+(via manheim.scrape_car) for lots that are new or whose auction date or
+price changed, and reports lots that dropped out of the catalogue.
+"""
+
+import re
+import sys
+import os
+import time
+import argparse
+from datetime import datetime
+from urllib.parse import urlparse, urlencode, parse_qs, urlunparse, urljoin
+
+import requests
+from bs4 import BeautifulSoup
+
+# Shared scraper modules live one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import parse_pool
+import rate_limit
+import listing_index
+
+SITE = 'manheim.com.au'
+
+CATALOGUE_URL = 'https://www.manheim.com.au/passenger-vehicles'
+
+# Lot fields that trigger a new detail fetch when they change
+FINGERPRINT_FIELDS = ('AuctionDate', 'Price')
+
+RECORDS_PER_PAGE = 120
+
+LOT_LINK_RE = re.compile(r'/passenger-vehicles/(\d+)/')
+DATE_RE = re.compile(
+    r'\b(?:(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun)[a-z]*,?\s+)?\d{1,2}(?:st|nd|rd|th)?\s+'
+    r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?,?\s+\d{4}'
+    r'(?:,?\s+\d{1,2}:\d{2}\s*(?:[AaPp][Mm])?)?'
+    r'|\b\d{1,2}/\d{1,2}/\d{4}(?:\s+\d{1,2}:\d{2}\s*(?:[AaPp][Mm])?)?'
+)
+PRICE_RE = re.compile(r'(?:AUD\s*)?\$\s?[\d,]{3,}')
+
+AUCTION_DATE_FORMATS = (
+    '%d %b %Y %I:%M %p', '%d %b %Y %H:%M', '%d %B %Y %I:%M %p', '%d %B %Y %H:%M',
+    '%d %b %Y', '%d %B %Y', '%d/%m/%Y %I:%M %p', '%d/%m/%Y %H:%M', '%d/%m/%Y',
+)
+
+def parse_auction_date(text: str):
+    """
+    Turn a catalogue auction date ("Tue 21 Oct 2026 10:00 AM", "21/10/2026")
+    into a Unix timestamp (local time), or None if it can't be read
+    """
+    if not text or text == "N/A":
+        return None
+    cleaned = re.sub(r'^(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun)[a-z]*,?\s+', '', text.strip(), flags=re.IGNORECASE)
+    cleaned = re.sub(r'(\d)(?:st|nd|rd|th)\b', r'\1', cleaned)
+    cleaned = re.sub(r'[.,]', '', cleaned)
+    cleaned = re.sub(r'\bSept\b', 'Sep', re.sub(r'\s+', ' ', cleaned), flags=re.IGNORECASE)
+    for fmt in AUCTION_DATE_FORMATS:
+        try:
+            return datetime.strptime(cleaned, fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+def page_url(catalogue_url: str, page: int) -> str:
+    """Return the catalogue URL for a given page"""
+    parsed = urlparse(catalogue_url)
+    query = parse_qs(parsed.query)
+    query['PageNumber'] = [str(page)]
+    query.setdefault('RecordsPerPage', [str(RECORDS_PER_PAGE)])
+    return urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
+
+def _lot_tile(link):
+    """Walk up from a lot link to the largest element that holds only this lot"""
+    lot_id = LOT_LINK_RE.search(link.get('href', '')).group(1)
+    tile = link
+    for parent in link.parents:
+        if parent.name in ('body', 'html', '[document]'):
+            break
+        ids = {LOT_LINK_RE.search(a.get('href', '')).group(1)
+               for a in parent.find_all('a', href=LOT_LINK_RE)}
+        if ids != {lot_id}:
+            break
+        tile = parent
+    return tile
+
+def parse_catalogue_page(content: bytes, url: str) -> list:
+    """
+    Extract lot summaries from a Manheim catalogue page
+
+    Args:
+        content (bytes): Raw HTML of the catalogue page
+        url (str): The catalogue page URL (used to resolve relative links)
+
+    Returns:
+        list: One summary dict per lot
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    lots = {}
+
+    for link in soup.find_all('a', href=LOT_LINK_RE):
+        lot_id = LOT_LINK_RE.search(link['href']).group(1)
+        if lot_id in lots:
+            continue
+
+        tile = _lot_tile(link)
+        text = tile.get_text(' ', strip=True)
+
+        title = link.get_text(strip=True)
+        if len(title) < 10:
+            heading = tile.find(['h2', 'h3', 'h4'])
+            title = heading.get_text(strip=True) if heading else (title or "N/A")
+
+        date_match = DATE_RE.search(text)
+        price_match = PRICE_RE.search(text)
+        lot_match = re.search(r'[Ll]ot\s*#?\s*(\d+)', text)
+
+        lots[lot_id] = {
+            "ListingId": lot_id,
+            "URL": urljoin('https://www.manheim.com.au', link['href'].split('?')[0]),
+            "Title": title,
+            "AuctionDate": date_match.group().strip() if date_match else "N/A",
+            "Price": price_match.group().strip() if price_match else "N/A",
+            "LotNumber": lot_match.group(1) if lot_match else "N/A",
+        }
+
+    return list(lots.values())
+
+def crawl_catalogue(catalogue_url: str = CATALOGUE_URL, index=None, max_pages: int = 100, frontier=None,
+                    enqueue=None, observe_queued: bool = True) -> dict:
+    """
+    Enumerate the auction catalogue and pick out lots that need a detail fetch
+
+    Args:
+        catalogue_url (str): Catalogue listing URL (filters in the query string are kept)
+        index (ListingIndex): Store of previously seen lots (in-memory if None)
+        max_pages (int): Stop after this many catalogue pages
+        frontier (CrawlFrontier): If given, new/changed lots are pushed onto it
+            with their auction date as the deadline
+        enqueue (callable): If given, called with each page's new/changed detail
+            URLs; lots are only recorded in the index once it returns
+        observe_queued (bool): Record new/changed lots in the index during the
+            crawl. With False they are only marked as still listed, and the
+            caller observe()s each one once its detail fetch succeeded
+
+    Returns:
+        dict: 'lots' (all summaries), 'to_scrape' (detail URLs of new or changed
+        lots), 'removed' (lot IDs that left the catalogue since the last full
+        walk), counts and 'pages'
+    """
+    if not catalogue_url or 'manheim.com.au' not in catalogue_url:
+        raise ValueError("Invalid manheim.com.au catalogue URL")
+
+    if index is None:
+        index = listing_index.ListingIndex()
+
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-AU,en;q=0.9',
+        'Referer': 'https://www.manheim.com.au/',
+    })
+
+    started = time.time()
+    result = {'lots': [], 'to_scrape': [], 'removed': [], 'new': 0, 'changed': 0, 'unchanged': 0, 'pages': 0}
+    seen_ids = set()
+    complete = False
+
+    for page in range(1, max_pages + 1):
+        # Wait for a manheim.com.au slot (shared by every scraper process)
+        if not rate_limit.acquire(SITE):
+            print("⏱️  No manheim.com.au request slot within the time budget")
+            break
+
+        url = page_url(catalogue_url, page)
+        print(f"📄 Fetching catalogue page {page}: {url}")
+        try:
+            response = session.get(url, timeout=30, allow_redirects=True)
+            if response.status_code in rate_limit.BLOCKED_STATUSES and rate_limit.backoff(SITE, rate_limit.BLOCKED_BACKOFF):
+                # We were spotted: every process has slowed down on manheim.com.au, try the page once more
+                response = session.get(url, timeout=30, allow_redirects=True)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"❌ Page {page} failed: {e}")
+            break
+
+        lots = parse_pool.extract('manheim.com.au:catalogue', response.content, url)
+        fresh = [lot for lot in lots if lot["ListingId"] not in seen_ids]
+        if not fresh:
+            print("🏁 End of catalogue")
+            complete = True
+            break
+
+        result['pages'] += 1
+        # Queue the page's new/changed lots before the index records them,
+        # so an interrupted crawl finds them new/changed again next time
+        queued = []
+        digests = []
+        for lot in fresh:
+            seen_ids.add(lot["ListingId"])
+            digest = listing_index.fingerprint(lot, FINGERPRINT_FIELDS)
+            digests.append(digest)
+            status = index.status(SITE, lot["ListingId"], digest)
+            result[status] += 1
+            result['lots'].append(lot)
+            if status != listing_index.UNCHANGED:
+                queued.append(lot["URL"])
+                if frontier is not None:
+                    frontier.push(lot["URL"], deadline=parse_auction_date(lot["AuctionDate"]), payload=lot)
+        if enqueue is not None and queued:
+            enqueue(queued)
+        result['to_scrape'].extend(queued)
+        for lot, digest in zip(fresh, digests):
+            if observe_queued or lot["URL"] not in queued:
+                index.observe(SITE, lot["ListingId"], lot["URL"], lot, digest)
+            else:
+                index.touch(SITE, lot["ListingId"])
+
+        print(f"✅ Page {page}: {len(fresh)} lots ({len(result['to_scrape'])} to fetch so far)")
+
+    # Only a full walk can tell which lots have left the catalogue
+    if complete:
+        result['removed'] = index.mark_removed(SITE, started)
+
+    return result
+
+def sync_catalogue(catalogue_url: str = CATALOGUE_URL, index=None, max_pages: int = 100) -> dict:
+    """
+    Crawl the catalogue and scrape detail pages for new or changed lots only
+
+    Detail pages are fetched soonest-auction first. A lot is only recorded in
+    the index once its detail scrape succeeded, so a failed one is new or
+    changed again on the next sync.
+
+    Returns:
+        dict: The crawl result plus 'details', a list of scraped car data dicts
+    """
+    from manheim_com_au.manheim import scrape_car
+    from crawl_frontier import CrawlFrontier
+    import provenance
+
+    if index is None:
+        index = listing_index.ListingIndex()
+    frontier = CrawlFrontier()
+    result = crawl_catalogue(catalogue_url, index, max_pages, frontier=frontier, observe_queued=False)
+    result['details'] = []
+    while True:
+        item = frontier.pop()
+        if item is None:
+            break
+        try:
+            car_data = scrape_car(item.url)
+        except Exception as e:
+            print(f"❌ Detail scrape failed for {item.url}: {e}")
+            continue
+        if provenance.is_demo(car_data):
+            print(f"❌ Detail scrape blocked for {item.url}")
+            continue
+        result['details'].append(car_data)
+        lot = item.payload
+        index.observe(SITE, lot["ListingId"], lot["URL"], lot, listing_index.fingerprint(lot, FINGERPRINT_FIELDS))
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the Manheim Australia auction catalogue")
+    parser.add_argument('--catalogue-url', default=CATALOGUE_URL)
+    parser.add_argument('--index', default='manheim_index.sqlite', help="SQLite file of seen lots")
+    parser.add_argument('--max-pages', type=int, default=100)
+    parser.add_argument('--enqueue', default='manheim_queue.txt',
+                        help="Append detail URLs needing a fetch here (input for bulk_scrape.py)")
+    args = parser.parse_args(argv)
+
+    index = listing_index.ListingIndex(args.index)
+    try:
+        with open(args.enqueue, 'a', encoding='utf-8') as f:
+            def enqueue(urls):
+                f.write(''.join(url + '\n' for url in urls))
+                f.flush()
+                os.fsync(f.fileno())
+            result = crawl_catalogue(args.catalogue_url, index, args.max_pages, enqueue=enqueue)
+    finally:
+        index.close()
+
+    print(f"🎉 {len(result['lots'])} lots on {result['pages']} pages: "
+          f"{result['new']} new, {result['changed']} changed, {result['unchanged']} unchanged, "
+          f"{len(result['removed'])} no longer listed")
+    print(f"📝 Queued {len(result['to_scrape'])} detail URLs in {args.enqueue}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Process pool for CPU-bound HTML extraction
+
+Scrapers fetch pages in the calling thread and hand the raw bytes to
+extract(). When a pool is configured, BeautifulSoup parsing and regex
+extraction run in worker processes, so concurrent API requests are not
+serialized by the GIL. Without a pool, extraction runs inline.
+"""
+
+import os
+import sys
+import threading
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import provenance
+
+# Make the scraper packages importable in worker processes
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Extractor per site: (module, function). Each takes (content: bytes, url: str);
+# listing extractors (keys without a ':' suffix) also take the trace's options
+EXTRACTORS = {
+    'cars.com': ('cars_com.cars_com_real', 'extract_car_data'),
+    'cars.com:search': ('cars_com.cars_com_search', 'parse_search_page'),
+    'manheim.com.au': ('manheim_com_au.manheim', 'extract_car_data'),
+    'manheim.com.au:catalogue': ('manheim_com_au.manheim_catalogue', 'parse_catalogue_page'),
+    'carfax.com': ('carfax_com.carfax', 'parse_page'),
+}
+
+_pool = None
+_max_workers = 0
+_lock = threading.Lock()
+
+def _run_extractor(site: str, content: bytes, url: str, options: dict = None):
+    """Import and run the extractor for a site (executed inside a worker)"""
+    module_name, func_name = EXTRACTORS[site]
+    module = importlib.import_module(module_name)
+    return getattr(module, func_name)(content, url, **(options or {}))
+
+def configure(max_workers: int = None):
+    """
+    Enable the process pool
+
+    Args:
+        max_workers (int): Number of worker processes (defaults to CPU count).
+            Pass 0 to disable the pool and extract inline.
+    """
+    global _max_workers
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    shutdown()
+    with _lock:
+        _max_workers = max_workers
+
+def _get_pool():
+    """Create the pool on first use so importing modules never forks"""
+    global _pool
+    with _lock:
+        if _pool is None and _max_workers > 0:
+            # spawn keeps workers clear of the Flask threads' locks
+            _pool = ProcessPoolExecutor(
+                max_workers=_max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+def shutdown():
+    """Stop the worker processes (the pool is recreated on next use)"""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+def extract(site: str, content: bytes, url: str):
+    """
+    Run the extractor for a site on fetched page bytes
+
+    Args:
+        site (str): Site key from EXTRACTORS (e.g. 'cars.com')
+        content (bytes): Raw HTML of the page
+        url (str): The listing URL
+
+    Returns:
+        Whatever the site's extractor returns (normally a car data dict).
+        Field provenance is moved into the active trace.
+    """
+    if site not in EXTRACTORS:
+        raise ValueError(f"No extractor registered for {site}")
+
+    options = None
+    active = provenance.current()
+    if active is not None and ':' not in site:
+        options = active.options()
+
+    pool = _get_pool()
+    if pool is None:
+        return provenance.absorb(_run_extractor(site, content, url, options))
+
+    try:
+        return provenance.absorb(pool.submit(_run_extractor, site, content, url, options).result())
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a huge page) - rebuild and parse this one inline
+        print("⚠️  Parse pool broke, restarting it and extracting inline")
+        shutdown()
+        return provenance.absorb(_run_extractor(site, content, url, options))
@@ -0,0 +1,332 @@
+"""
+Duplicate listing detection by perceptual photo hashes
+
+The same car is often listed on cars.com and carfax.com, or relisted on
+Manheim under a new lot number, with the same photos. PhotoIndex keeps a
+64-bit pHash of every mirrored listing photo and finds listings whose
+photos are within a few bits of a new scrape's:
+
+    index = PhotoIndex('photos.sqlite')
+    index.match_result(car_data, storage)     # sets DuplicateOf/PhotoMatches, then indexes it
+
+    python photo_index.py mirrored.jsonl --index photos.sqlite --dest ./mirror
+
+pHash: the photo is scaled to 32x32 grey, its 2-D DCT taken and the 8x8
+lowest frequencies thresholded at their median. Recompression, resizing
+and watermark-free crops change only a few of the 64 bits.
+
+Lookups use multi-index hashing: each hash is split into three ~21-bit
+chunks with one table per chunk. Two hashes within max_distance bits
+agree to within max_distance // 3 bits on at least one chunk, so a query
+only probes the table entries that close to its own chunks and checks
+the full distance of what it finds. With the default 8 bits that is
+about 700 dict lookups per photo and, the chunks being about log2 of a
+few million hashes wide, only a handful of candidates to check: around
+0.2 ms per photo at 200k indexed photos. Hashes persist in SQLite and are
+loaded into the tables on open.
+
+Needs Pillow and numpy: pip install pillow numpy
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from itertools import combinations
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    np = Image = None
+
+import image_mirror
+from supabase_sink import canonical_url
+
+HASH_BITS = 64
+
+# (shift, width) of each chunk; wide enough that a table bucket rarely holds more than one hash
+CHUNKS = ((0, 22), (22, 21), (43, 21))
+
+# Photos this many bits apart or closer count as the same photo
+DEFAULT_MAX_DISTANCE = 8
+
+# A listing is a duplicate when this many of its photos match (or all, if it has fewer)
+MIN_MATCHING_PHOTOS = 2
+
+# A photo matching more listings than this is a stock or "no photo" image and proves nothing
+COMMON_PHOTO_LISTINGS = 5
+
+_SIZE = 32
+_DCT = None
+
+def _require_deps():
+    if np is None:
+        raise ImportError("Photo hashing needs Pillow and numpy: pip install pillow numpy")
+
+def _dct_matrix():
+    global _DCT
+    if _DCT is None:
+        n = np.arange(_SIZE)
+        matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * _SIZE))
+        matrix[0] /= np.sqrt(2)
+        _DCT = matrix * np.sqrt(2 / _SIZE)
+    return _DCT
+
+def phash(data: bytes) -> int:
+    """
+    64-bit perceptual hash of an encoded photo
+
+    Args:
+        data (bytes): JPEG/PNG/WebP bytes
+
+    Returns:
+        int: The hash (0 <= hash < 2**64)
+    """
+    _require_deps()
+    image = Image.open(io.BytesIO(data))
+    # JPEGs decode at 1/8 scale or less, which is plenty for 32x32
+    image.draft('L', (_SIZE * 2, _SIZE * 2))
+    pixels = np.asarray(image.convert('L').resize((_SIZE, _SIZE), Image.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix()
+    low = (dct @ pixels @ dct.T)[:8, :8].flatten()
+    bits = low > np.median(low)
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits"""
+    return (a ^ b).bit_count()
+
+def _flip_masks(bits: int, radius: int) -> list:
+    """Every mask of up to radius set bits among the low `bits` bits"""
+    masks = []
+    for count in range(radius + 1):
+        for positions in combinations(range(bits), count):
+            mask = 0
+            for position in positions:
+                mask |= 1 << position
+            masks.append(mask)
+    return masks
+
+def _signed(value: int) -> int:
+    """Hash as SQLite's signed 64-bit INTEGER"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+class PhotoIndex:
+    """pHashes of listing photos with multi-index Hamming lookup"""
+
+    def __init__(self, path: str = ':memory:', max_distance: int = DEFAULT_MAX_DISTANCE):
+        """
+        Args:
+            path (str): SQLite file the hashes persist in
+            max_distance (int): Bits two photos may differ by and still match
+        """
+        self.max_distance = max_distance
+        radius = max_distance // len(CHUNKS)
+        self._probes = [(shift, (1 << width) - 1, _flip_masks(width, radius)) for shift, width in CHUNKS]
+        self._lock = threading.Lock()
+        self._tables = [{} for _ in CHUNKS]           # chunk value -> set of hashes
+        self._listings = {}                           # hash -> set of listing keys
+        self._photo_counts = {}                       # listing key -> number of photos
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS photo_hashes (
+                listing TEXT NOT NULL,
+                hash INTEGER NOT NULL,
+                photo_url TEXT,
+                added REAL NOT NULL,
+                PRIMARY KEY (listing, hash)
+            )
+        """)
+        self._conn.commit()
+        for listing, value in self._conn.execute("SELECT listing, hash FROM photo_hashes"):
+            self._insert(listing, value & ((1 << 64) - 1))
+
+    def _insert(self, listing: str, value: int):
+        listings = self._listings.get(value)
+        if listings is None:
+            listings = self._listings[value] = set()
+            for (shift, mask, _), table in zip(self._probes, self._tables):
+                table.setdefault((value >> shift) & mask, set()).add(value)
+        if listing not in listings:
+            listings.add(listing)
+            self._photo_counts[listing] = self._photo_counts.get(listing, 0) + 1
+
+    def __len__(self):
+        return len(self._listings)
+
+    def add(self, listing: str, hashes, urls=None):
+        """
+        Index the photos of a listing
+
+        Args:
+            listing (str): Listing key (see listing_key())
+            hashes (iterable): pHashes of its photos (None entries are skipped)
+            urls (iterable): Photo URLs, stored alongside for reference
+        """
+        hashes = list(hashes)
+        urls = list(urls) if urls is not None else [None] * len(hashes)
+        now = time.time()
+        rows = [(listing, _signed(value), url, now) for value, url in zip(hashes, urls) if value is not None]
+        with self._lock:
+            for _, value, _, _ in rows:
+                self._insert(listing, value & ((1 << 64) - 1))
+            self._conn.executemany("INSERT OR IGNORE INTO photo_hashes VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def nearest(self, value: int) -> dict:
+        """
+        Indexed photos close to one hash
+
+        Returns:
+            dict: hash -> Hamming distance, for every hash within max_distance
+        """
+        with self._lock:
+            return self._nearest(value)
+
+    def _nearest(self, value: int) -> dict:
+        found = {}
+        for (shift, mask, flips), table in zip(self._probes, self._tables):
+            part = (value >> shift) & mask
+            for flip in flips:
+                candidates = table.get(part ^ flip)
+                if not candidates:
+                    continue
+                for candidate in candidates:
+                    if candidate not in found:
+                        distance = (value ^ candidate).bit_count()
+                        if distance <= self.max_distance:
+                            found[candidate] = distance
+        return found
+
+    def match(self, hashes, exclude: str = None) -> list:
+        """
+        Indexed listings that share photos with a new one
+
+        Args:
+            hashes (iterable): pHashes of the new listing's photos
+            exclude (str): Listing key to leave out (the listing itself)
+
+        Returns:
+            list: {'listing', 'matched', 'distance'} dicts, most matching
+            photos (then smallest mean distance) first; only listings with
+            MIN_MATCHING_PHOTOS matching photos, or all of theirs or the new
+            listing's when either has fewer
+        """
+        hashes = [value for value in dict.fromkeys(hashes) if value is not None]
+        scores = {}
+        with self._lock:
+            for value in hashes:
+                per_listing = {}
+                for candidate, distance in self._nearest(value).items():
+                    for listing in self._listings[candidate]:
+                        if listing != exclude and distance < per_listing.get(listing, HASH_BITS + 1):
+                            per_listing[listing] = distance
+                if len(per_listing) > COMMON_PHOTO_LISTINGS:
+                    continue
+                for listing, distance in per_listing.items():
+                    matched, total = scores.get(listing, (0, 0))
+                    scores[listing] = (matched + 1, total + distance)
+            photo_counts = {listing: self._photo_counts.get(listing, 0) for listing in scores}
+
+        matches = []
+        for listing, (matched, total) in scores.items():
+            needed = min(MIN_MATCHING_PHOTOS, len(hashes), photo_counts[listing])
+            if matched >= needed:
+                matches.append({'listing': listing, 'matched': matched, 'distance': round(total / matched, 2)})
+        matches.sort(key=lambda match: (-match['matched'], match['distance']))
+        return matches
+
+    def match_result(self, car_data: dict, storage=None, add: bool = True) -> list:
+        """
+        Match a mirrored scrape against the index, then index its photos
+
+        Photos are read from storage by their original URLs (SourceImages /
+        source_images left by ImageMirror.mirror_result). On a match the
+        result gets DuplicateOf (the best matching listing) and PhotoMatches
+        (all of them), or duplicate_of/photo_matches for CarRecord dicts.
+
+        Args:
+            car_data (dict): Scraper dict, CarRecord dict or bulk_scrape line
+            storage: image_mirror storage backend (default: open_storage())
+            add (bool): Also index the listing's photos
+
+        Returns:
+            list: match() result
+        """
+        data = car_data.get('data') if 'success' in car_data else car_data
+        if not data:
+            return []
+        record = 'SourceImages' not in data and 'source_images' in data
+        originals = data.get('source_images' if record else 'SourceImages') or []
+        url = data.get('url' if record else 'URL') or car_data.get('url')
+        if not originals or not url:
+            return []
+        storage = storage if storage is not None else image_mirror.open_storage()
+
+        hashes = []
+        for original in originals:
+            try:
+                hashes.append(phash(storage.read(image_mirror.image_key(original))))
+            except Exception as e:
+                print(f"⚠️  Could not hash {original}: {e}")
+                hashes.append(None)
+
+        listing = listing_key(url)
+        matches = self.match(hashes, exclude=listing)
+        if matches:
+            data['duplicate_of' if record else 'DuplicateOf'] = matches[0]['listing']
+            data['photo_matches' if record else 'PhotoMatches'] = matches
+        if add:
+            self.add(listing, hashes, originals)
+        return matches
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def listing_key(url: str) -> str:
+    """Key of a listing in the index: its canonical URL"""
+    return canonical_url(url)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find listings that share photos across sites")
+    parser.add_argument('results', help="JSONL written by image_mirror.py or bulk_scrape.py --mirror-images")
+    parser.add_argument('--index', default='photo_index.sqlite', help="SQLite file of indexed photo hashes")
+    parser.add_argument('--dest', help="Storage the photos were mirrored to (as for image_mirror.py)")
+    parser.add_argument('--max-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help="Differing bits at which two photos still match")
+    args = parser.parse_args(argv)
+
+    storage = image_mirror.open_storage(args.dest)
+    index = PhotoIndex(args.index, args.max_distance)
+    started = time.time()
+    listings = duplicates = 0
+    with open(args.results, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            matches = index.match_result(result, storage)
+            listings += 1
+            if matches:
+                duplicates += 1
+                data = result.get('data') if 'success' in result else result
+                url = data.get('URL') or data.get('url')
+                print(f"🔁 {url} matches {matches[0]['listing']} "
+                      f"({matches[0]['matched']} photos, {matches[0]['distance']} bits)")
+    index.close()
+    print(f"✅ {duplicates} of {listings} listings matched an indexed car "
+          f"({time.time() - started:.1f}s, {args.index})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Per-field provenance for scraped listings
+
+Extractors note, for every field they fill, which tier produced it (the
+static HTML extractor, Selenium, the HTTP cache, demo data, ...), which
+selector or pattern matched, how long the work since the previous field
+took and how much the value can be trusted. Demo data is recorded with
+confidence 0, so a caller can finally tell a real listing from a
+hash-seeded placeholder.
+
+Extractors may run in the parse pool, so they return their notes inside
+the result under PROVENANCE_KEY; parse_pool.extract() moves them into the
+calling thread's trace. A trace also carries the caller's extraction
+options ("early" mode and which optional passes to run anyway):
+
+    with provenance.trace(early=True, include=('images',)) as t:
+        car_data = scrape_car(url)
+    t.fields['Price']  # {'tier': ..., 'selector': ..., 'cost_ms': ..., 'confidence': ...}
+
+A fields= projection (select(), or trace(only=...)) prunes extraction
+stages that only produce fields the caller did not ask for.
+"""
+
+import time
+import contextvars
+from functools import lru_cache
+from contextlib import contextmanager
+
+# Fields a listing is usable with; early mode stops looking once these are filled
+REQUIRED_FIELDS = ('Title', 'Price', 'Mileage', 'VIN')
+
+# Optional extraction passes that early mode skips unless asked for
+OPTIONAL_PASSES = ('images', 'features')
+
+# Key extractors return their notes under (removed before callers see the data)
+PROVENANCE_KEY = '_provenance'
+
+# Field names that mean the same thing on different sites
+FIELD_ALIASES = {'brand': 'make'}
+
+# Set (True) on results that are generated demo data because the site could not be scraped
+DEMO_KEY = 'IsDemo'
+
+class Sources:
+    """Collects provenance while one extractor runs"""
+
+    def __init__(self, tier: str):
+        self.tier = tier
+        self.fields = {}
+        self._mark = time.perf_counter()
+
+    def found(self, field: str, selector: str, confidence: float = None):
+        """Note that a field was filled (cost = time since the previous note)"""
+        now = time.perf_counter()
+        if confidence is None:
+            confidence = selector_confidence(selector)
+        self.fields[field] = {
+            'tier': self.tier,
+            'selector': selector,
+            'cost_ms': round((now - self._mark) * 1000, 2),
+            'confidence': confidence,
+        }
+        self._mark = now
+
+    def found_changes(self, before: dict, car_data: dict, selector: str, confidence: float = None):
+        """Note every field a pass filled or changed (before = copy taken ahead of it)"""
+        changed = [field for field, value in car_data.items()
+                   if is_filled(value) and value != before.get(field)]
+        for field in changed:
+            self.found(field, selector, confidence)
+
+    def attach(self, car_data: dict) -> dict:
+        """Put the notes into the result so they survive the trip back from the pool"""
+        car_data[PROVENANCE_KEY] = self.fields
+        return car_data
+
+def selector_confidence(selector: str) -> float:
+    """Rough trust in a CSS selector: site data attributes beat class guesses"""
+    if 'data-cmp' in selector or 'data-testid' in selector:
+        return 0.95
+    if '*=' in selector:
+        return 0.6
+    if selector.strip() in ('h1', 'h2', 'h3', 'title'):
+        return 0.5
+    return 0.8
+
+def is_filled(value) -> bool:
+    return bool(value) and value != "N/A"
+
+def complete(car_data: dict, fields=REQUIRED_FIELDS) -> bool:
+    """True once every required field has a value"""
+    return all(is_filled(car_data.get(field)) for field in fields)
+
+@lru_cache(maxsize=1024)
+def field_key(name: str) -> str:
+    """Site-independent field key: 'Fuel Type', 'FuelType' and 'fuel_type' all match"""
+    key = ''.join(ch for ch in name.lower() if ch.isalnum())
+    return FIELD_ALIASES.get(key, key)
+
+def parse_fields(fields):
+    """A fields= projection (comma separated string or iterable) as a frozenset of keys, or None"""
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    keys = frozenset(field_key(field) for field in fields if field.strip())
+    return keys or None
+
+def wants_any(fields, *names) -> bool:
+    """Whether a projection (None = everything) asks for any of these fields"""
+    return fields is None or any(field_key(name) in fields for name in names)
+
+def project(car_data: dict, fields) -> dict:
+    """Keep only the projected fields (and URL) of a result"""
+    fields = parse_fields(fields)
+    if fields is None or not isinstance(car_data, dict):
+        return car_data
+    return {key: value for key, value in car_data.items()
+            if key in ('URL', DEMO_KEY) or field_key(key) in fields}
+
+class Trace:
+    """Provenance and extraction options of one scrape_car call"""
+
+    __slots__ = ('fields', 'early', 'include', 'only')
+
+    def __init__(self, early: bool = False, include=(), only=None):
+        self.fields = {}
+        self.early = early
+        self.include = tuple(include or ())
+        self.only = parse_fields(only)
+
+    @property
+    def pruned(self) -> bool:
+        """True when extraction stages may be skipped (early mode or a projection)"""
+        return self.early or self.only is not None
+
+    def wants(self, extraction_pass: str) -> bool:
+        """Whether an optional pass (e.g. 'images') should run"""
+        return not self.early or extraction_pass in self.include
+
+    def options(self) -> dict:
+        """Keyword arguments for extractors that understand them"""
+        options = {'early': True, 'include': self.include} if self.early else {}
+        if self.only is not None:
+            options['fields'] = self.only
+        return options
+
+    def for_data(self, car_data: dict) -> dict:
+        """Provenance of the fields present in the returned data"""
+        return {field: source for field, source in self.fields.items()
+                if field in car_data and is_filled(car_data[field])}
+
+_current = contextvars.ContextVar('scrape_trace', default=None)
+
+@contextmanager
+def trace(early: bool = False, include=(), only=None):
+    """Collect provenance for the scrapes run inside the block"""
+    current = Trace(early, include, only)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def select(fields=None):
+    """
+    Restrict the scrapes inside the block to a fields= projection
+
+    Extractors skip stages that only produce other fields. With fields None
+    the enclosing trace (if any) is left as it is.
+
+    Yields:
+        Trace: The active trace (None if there is none and fields is None)
+    """
+    only = parse_fields(fields)
+    active = _current.get()
+    if only is None:
+        yield active
+        return
+    if active is None:
+        with trace(only=only) as active:
+            yield active
+        return
+    previous = active.only
+    active.only = only
+    try:
+        yield active
+    finally:
+        active.only = previous
+
+def current():
+    """The active Trace, or None"""
+    return _current.get()
+
+def absorb(result):
+    """Move an extractor's notes into the active trace and drop them from the result"""
+    if isinstance(result, dict) and PROVENANCE_KEY in result:
+        fields = result.pop(PROVENANCE_KEY)
+        active = _current.get()
+        if active is not None:
+            active.fields.update(fields)
+    return result
+
+def record_all(car_data: dict, tier: str, confidence: float):
+    """Note every filled field of a result as coming from one tier (demo data, cache, ...)"""
+    active = _current.get()
+    if active is None or not car_data:
+        return
+    for field, value in car_data.items():
+        if field != 'URL' and is_filled(value):
+            active.fields[field] = {'tier': tier, 'selector': None, 'cost_ms': 0, 'confidence': confidence}
+
+def mark_demo(car_data: dict) -> dict:
+    """Flag a result as generated demo data (DEMO_KEY) and note its fields as tier 'demo'"""
+    record_all(car_data, 'demo', 0.0)
+    car_data[DEMO_KEY] = True
+    return car_data
+
+def is_demo(car_data) -> bool:
+    """True for demo data: scraper dicts, CarRecord dicts ('is_demo') and bulk_scrape lines"""
+    if not isinstance(car_data, dict):
+        return False
+    if 'success' in car_data and isinstance(car_data.get('data'), dict):
+        car_data = car_data['data']
+    return bool(car_data.get(DEMO_KEY) or car_data.get('is_demo'))
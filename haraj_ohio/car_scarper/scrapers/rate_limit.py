@@ -0,0 +1,215 @@
+"""
+Per-domain token buckets shared by every scraper process
+
+Each site has one bucket (requests per second plus a burst allowance) for
+the whole fleet instead of each process sleeping on its own, so running
+more API processes or workers never raises the request rate against a
+site. acquire() reserves a token atomically and sleeps only as long as
+that token needs to accrue; backoff() drains a bucket after an anti-bot
+page so every process slows down, not just the one that was blocked.
+
+Backends, chosen with SCRAPER_RATE_LIMIT or configure():
+
+- a SQLite file (default), shared by all processes on the machine; it
+  lives in /dev/shm when available so it is effectively shared memory
+- redis://host:port/db, shared by processes on several machines
+- 'memory', per process (tests and one-off scripts)
+"""
+
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+
+import deadline
+
+# (requests per second, burst) per site
+DOMAIN_RATES = {
+    'cars.com': (1.0, 3),
+    'manheim.com.au': (0.5, 2),
+    'carfax.com': (0.2, 1),
+}
+
+# Used for hosts not listed above
+DEFAULT_RATE = (1.0, 1)
+
+# Responses that mean a site is pushing back, and the fleet-wide pause they cost
+BLOCKED_STATUSES = (403, 429)
+BLOCKED_BACKOFF = 5.0
+
+_shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+DEFAULT_PATH = os.path.join(_shm_dir, 'haraj_rate_limits.sqlite')
+
+class MemoryBackend:
+    """Buckets in this process only"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # domain -> (tokens, updated)
+
+    def reserve(self, domain, rate, burst, cost, max_wait):
+        with self._lock:
+            now = time.time()
+            tokens, updated = self._buckets.get(domain, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate) - cost
+            wait = max(0.0, -tokens / rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._buckets[domain] = (tokens, now)
+            return wait
+
+class SQLiteBackend:
+    """Buckets in a SQLite file shared by every process on the machine"""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                domain TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        """)
+
+    def reserve(self, domain, rate, burst, cost, max_wait):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE domain = ?", (domain,)
+                ).fetchone()
+                tokens, updated = row if row else (burst, now)
+                tokens = min(burst, tokens + (now - updated) * rate) - cost
+                wait = max(0.0, -tokens / rate)
+                if max_wait is not None and wait > max_wait:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (domain, tokens, updated) VALUES (?, ?, ?)",
+                    (domain, tokens, now)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+class RedisBackend:
+    """Buckets on a Redis server, shared across machines (uses the server clock)"""
+
+    # KEYS[1] = bucket; ARGV = rate, burst, cost, max_wait (-1 = none)
+    SCRIPT = """
+        local t = redis.call('TIME')
+        local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+        local rate, burst, cost, max_wait = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(state[1]) or burst
+        local updated = tonumber(state[2]) or now
+        tokens = math.min(burst, tokens + (now - updated) * rate) - cost
+        local wait = math.max(0, -tokens / rate)
+        if max_wait >= 0 and wait > max_wait then
+            return '-1'
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 60)
+        return tostring(wait)
+    """
+
+    def __init__(self, client, prefix: str = 'ratelimit'):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    def reserve(self, domain, rate, burst, cost, max_wait):
+        result = self._script(keys=[f"{self.prefix}:{domain}"],
+                              args=[rate, burst, cost, -1 if max_wait is None else max_wait])
+        wait = float(result)
+        return None if wait < 0 else wait
+
+_backend = None
+_lock = threading.Lock()
+
+def _open(spec: str):
+    if spec == 'memory':
+        return MemoryBackend()
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The Redis rate limiter needs the redis package: pip install redis")
+        return RedisBackend(redis.Redis.from_url(spec))
+    if spec.startswith('sqlite:///'):
+        spec = spec[len('sqlite:///'):]
+    return SQLiteBackend(spec)
+
+def configure(spec: str = None):
+    """
+    Choose the bucket store
+
+    Args:
+        spec (str): 'memory', a SQLite path (or sqlite:///path) or a redis:// URL.
+            None means SCRAPER_RATE_LIMIT, then the shared default file.
+    """
+    global _backend
+    with _lock:
+        _backend = _open(spec or os.environ.get('SCRAPER_RATE_LIMIT', DEFAULT_PATH))
+
+def _get_backend():
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = _open(os.environ.get('SCRAPER_RATE_LIMIT', DEFAULT_PATH))
+        return _backend
+
+def set_rate(domain: str, rate: float, burst: int = 1):
+    """Change a site's rate (requests per second) and burst in this process"""
+    DOMAIN_RATES[domain] = (rate, burst)
+
+def acquire(domain: str, timeout: float = None) -> bool:
+    """
+    Wait for a request slot on a domain
+
+    Args:
+        domain (str): Site key, e.g. 'carfax.com'
+        timeout (float): Give up instead of waiting longer than this
+            (default: whatever is left of the scrape's time budget)
+
+    Returns:
+        bool: True once the request may go out, False if it would take
+        longer than the timeout (no token is used in that case)
+    """
+    rate, burst = DOMAIN_RATES.get(domain, DEFAULT_RATE)
+    if timeout is None:
+        timeout = deadline.remaining()
+    try:
+        wait = _get_backend().reserve(domain, rate, burst, 1, timeout)
+    except Exception as e:
+        # A broken store must not stop scraping; pace this process alone
+        print(f"⚠️  Rate limit store unavailable ({e}), pacing locally")
+        wait = 1.0 / rate
+    if wait is None:
+        deadline.skip(f"{domain} request (rate limited)")
+        return False
+    if wait > 0:
+        time.sleep(wait)
+    return True
+
+def backoff(domain: str, seconds: float) -> bool:
+    """
+    Slow every process down on a domain after it blocked us, then wait for a slot
+
+    Args:
+        domain (str): Site key, e.g. 'carfax.com'
+        seconds (float): Extra pause before the domain's next request, fleet-wide
+    """
+    rate, burst = DOMAIN_RATES.get(domain, DEFAULT_RATE)
+    try:
+        _get_backend().reserve(domain, rate, burst, seconds * rate, None)
+    except Exception as e:
+        print(f"⚠️  Rate limit store unavailable ({e}), backing off locally")
+        time.sleep(seconds)
+    return acquire(domain)
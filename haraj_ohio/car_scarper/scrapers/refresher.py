@@ -0,0 +1,311 @@
+"""
+Change detection and adaptive re-scrape scheduling
+
+Every scrape_car result is fingerprinted on the fields that go stale
+(price, mileage, auction date and the set of images) and compared with the
+previous scrape of the same URL. Each URL keeps its own re-scrape interval:
+it is halved when the listing changed and grows by half when it did not,
+so volatile listings are checked often and static ones drift towards
+MAX_INTERVAL. A listing with an upcoming auction is always checked again
+shortly before the auction starts.
+
+The store is SQLite. Set SCRAPER_REFRESH_DB to a file path to persist it
+(or call configure()); by default it lives in memory for the process:
+
+    python refresher.py --db refresh.sqlite --add urls.txt
+    python refresher.py --db refresh.sqlite --watch
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import listing_index
+import provenance
+
+NEW = listing_index.NEW
+CHANGED = listing_index.CHANGED
+UNCHANGED = listing_index.UNCHANGED
+
+# Fields whose change means the listing moved
+FINGERPRINT_FIELDS = ('Price', 'Mileage', 'AuctionDate', 'Images')
+
+# Re-scrape interval bounds (seconds)
+MIN_INTERVAL = 3600
+DEFAULT_INTERVAL = 24 * 3600
+MAX_INTERVAL = 14 * 24 * 3600
+
+# Interval multipliers after a changed / unchanged scrape
+SHRINK_ON_CHANGE = 0.5
+GROW_ON_UNCHANGED = 1.5
+
+# Check auction lots again this long before the auction starts (seconds)
+PRE_AUCTION_CHECK = 2 * 3600
+
+_conn = None
+_path = None
+_lock = threading.Lock()
+
+def configure(path: str = None):
+    """Use a different SQLite file (None = SCRAPER_REFRESH_DB or memory)"""
+    global _conn, _path
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = None
+        _path = path
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        path = _path or os.environ.get('SCRAPER_REFRESH_DB', ':memory:')
+        _conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS refresh (
+                url TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                interval REAL NOT NULL,
+                next_due REAL NOT NULL,
+                last_checked REAL,
+                last_changed REAL,
+                checks INTEGER NOT NULL DEFAULT 0,
+                changes INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        _conn.execute("CREATE INDEX IF NOT EXISTS refresh_next_due ON refresh (next_due)")
+        _conn.commit()
+    return _conn
+
+def content_fingerprint(car_data: dict) -> str:
+    """
+    Hash the volatile fields of a scraped listing
+
+    The image list is compared as a set, so a site reordering its gallery
+    does not count as a change.
+    """
+    view = {field: car_data.get(field, 'N/A') for field in FINGERPRINT_FIELDS}
+    view['Images'] = '\n'.join(sorted(set(car_data.get('Images') or [])))
+    return listing_index.fingerprint(view, FINGERPRINT_FIELDS)
+
+def _auction_time(car_data: dict):
+    auction_date = car_data.get('AuctionDate')
+    if not auction_date or auction_date == "N/A":
+        return None
+    from manheim_com_au.manheim_catalogue import parse_auction_date
+    return parse_auction_date(auction_date)
+
+def _next_due(now: float, interval: float, car_data: dict) -> float:
+    due = now + interval
+    auction_at = _auction_time(car_data)
+    if auction_at and now < auction_at - PRE_AUCTION_CHECK < due:
+        due = max(auction_at - PRE_AUCTION_CHECK, now + MIN_INTERVAL)
+    return due
+
+def track(url: str, due: float = None) -> bool:
+    """
+    Start tracking a URL that has not been scraped yet
+
+    Returns:
+        bool: False if the URL was already tracked
+    """
+    with _lock:
+        conn = _get_conn()
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO refresh (url, interval, next_due) VALUES (?, ?, ?)",
+            (url, DEFAULT_INTERVAL, due if due is not None else time.time())
+        )
+        conn.commit()
+    return cursor.rowcount == 1
+
+def record(url: str, car_data: dict) -> str:
+    """
+    Record a scrape result and schedule the URL's next check
+
+    Args:
+        url (str): The listing URL
+        car_data (dict): Result of scrape_car
+
+    Returns:
+        str: NEW, CHANGED or UNCHANGED compared with the previous scrape
+    """
+    digest = content_fingerprint(car_data)
+    now = time.time()
+
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute(
+            "SELECT fingerprint, interval FROM refresh WHERE url = ?", (url,)
+        ).fetchone()
+
+        if row is None or row[0] is None:
+            status = NEW
+            interval = row[1] if row else DEFAULT_INTERVAL
+            changed = 0
+        elif row[0] != digest:
+            status = CHANGED
+            interval = max(MIN_INTERVAL, row[1] * SHRINK_ON_CHANGE)
+            changed = 1
+        else:
+            status = UNCHANGED
+            interval = min(MAX_INTERVAL, row[1] * GROW_ON_UNCHANGED)
+            changed = 0
+
+        next_due = _next_due(now, interval, car_data)
+        conn.execute("""
+            INSERT INTO refresh (url, fingerprint, interval, next_due, last_checked, last_changed, checks, changes)
+            VALUES (?, ?, ?, ?, ?, ?, 1, 0)
+            ON CONFLICT (url) DO UPDATE SET
+                fingerprint = excluded.fingerprint,
+                interval = excluded.interval,
+                next_due = excluded.next_due,
+                last_checked = excluded.last_checked,
+                last_changed = CASE WHEN ? THEN excluded.last_checked ELSE COALESCE(last_changed, excluded.last_checked) END,
+                checks = checks + 1,
+                changes = changes + ?
+        """, (url, digest, interval, next_due, now, now, changed, changed))
+        conn.commit()
+    return status
+
+def record_failure(url: str):
+    """Push a failed URL back by its current interval instead of retrying it straight away"""
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "UPDATE refresh SET next_due = ? + MIN(interval, ?) WHERE url = ?",
+            (now, DEFAULT_INTERVAL, url)
+        )
+        conn.commit()
+
+def lookup(url: str):
+    """
+    Get the refresh state of a URL
+
+    Returns:
+        dict: interval, next_due, last_checked, last_changed, checks and
+        changes, or None if the URL is not tracked
+    """
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT interval, next_due, last_checked, last_changed, checks, changes FROM refresh WHERE url = ?",
+            (url,)
+        ).fetchone()
+    if not row:
+        return None
+    keys = ('interval', 'next_due', 'last_checked', 'last_changed', 'checks', 'changes')
+    return dict(zip(keys, row))
+
+def due(now: float = None, limit: int = None) -> list:
+    """URLs whose next check is due, most overdue first, as (url, next_due, last_checked)"""
+    now = time.time() if now is None else now
+    query = "SELECT url, next_due, last_checked FROM refresh WHERE next_due <= ? ORDER BY next_due"
+    params = [now]
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    with _lock:
+        return _get_conn().execute(query, params).fetchall()
+
+def next_due_at():
+    """Unix time of the earliest scheduled check, or None if nothing is tracked"""
+    with _lock:
+        row = _get_conn().execute("SELECT MIN(next_due) FROM refresh").fetchone()
+    return row[0]
+
+def schedule(frontier, limit: int = None) -> int:
+    """
+    Push every due URL onto a crawl frontier
+
+    Returns:
+        int: Number of URLs pushed
+    """
+    pushed = 0
+    for url, next_due, last_checked in due(limit=limit):
+        if frontier.push(url, last_scraped=last_checked, due=next_due):
+            pushed += 1
+    return pushed
+
+def forget(url: str):
+    """Stop tracking a URL"""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("DELETE FROM refresh WHERE url = ?", (url,))
+        conn.commit()
+
+def refresh_due(concurrency: int = 4, limit: int = None) -> dict:
+    """
+    Re-scrape every URL that is due (scrape_car records the new fingerprints)
+
+    Returns:
+        dict: Counts of 'changed', 'unchanged' and 'failed' URLs
+    """
+    from scraper_manager import scrape_car
+    from crawl_frontier import CrawlFrontier
+
+    frontier = CrawlFrontier()
+    schedule(frontier, limit)
+    stats = {'changed': 0, 'unchanged': 0, 'failed': 0}
+    stats_lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = frontier.pop()
+            if item is None:
+                break
+            try:
+                result = scrape_car(item.url)
+                if provenance.is_demo(result):
+                    # Every tier was blocked; scrape_car already recorded the failure
+                    print(f"❌ {item.url}: blocked, got demo data")
+                    key = 'failed'
+                else:
+                    state = lookup(item.url)
+                    key = 'changed' if state and state['last_changed'] == state['last_checked'] else 'unchanged'
+            except Exception as e:
+                print(f"❌ {item.url}: {e}")
+                record_failure(item.url)
+                key = 'failed'
+            with stats_lock:
+                stats[key] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-scrape tracked listings when they are due")
+    parser.add_argument('--db', default='refresh.sqlite', help="SQLite file of fingerprints and schedules")
+    parser.add_argument('--add', metavar='URL_FILE', help="Start tracking the URLs in this file")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="Scrapes in flight at once")
+    parser.add_argument('--watch', action='store_true', help="Keep running, sleeping until the next URL is due")
+    args = parser.parse_args(argv)
+
+    configure(args.db)
+
+    if args.add:
+        from bulk_scrape import read_urls
+        added = sum(track(url) for url in read_urls(args.add))
+        print(f"📝 Tracking {added} new URLs")
+
+    while True:
+        stats = refresh_due(args.concurrency)
+        if any(stats.values()):
+            print(f"✅ Refreshed: {stats['changed']} changed, {stats['unchanged']} unchanged, {stats['failed']} failed")
+        if not args.watch:
+            break
+
+        upcoming = next_due_at()
+        wait = 60 if upcoming is None else min(max(upcoming - time.time(), 1), 3600)
+        print(f"⏳ Next check in {wait:.0f}s")
+        time.sleep(wait)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+"""
+Job broker for a fleet of scrape workers
+
+The API (or any script) submits listing URLs as jobs; scrape_worker.py
+processes on any number of machines claim them, scrape them and post the
+result back. Two backends share one interface:
+
+- SQLiteBroker: a single SQLite file, for local runs and tests
+  (several worker processes on one machine can share it)
+- RedisBroker: a Redis server (or anything speaking its protocol), for
+  workers spread over several machines
+
+The broker does not pace sites itself: every request a worker makes
+waits for a token from rate_limit's per-site buckets, which are shared by
+the whole fleet, so adding workers adds throughput without multiplying
+the request rate against any one site.
+
+    python scrape_broker.py --broker sqlite:///scrape_jobs.sqlite submit urls.txt
+    python scrape_broker.py --broker sqlite:///scrape_jobs.sqlite status
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# A job is given up after this many failed attempts
+MAX_ATTEMPTS = 3
+
+# Running jobs without a result after this long are handed out again, or failed
+# once they have used up MAX_ATTEMPTS (seconds)
+CLAIM_TIMEOUT = 300
+
+STALE_ERROR = f"No result within {CLAIM_TIMEOUT}s (worker crashed or hung)"
+
+# RedisBroker.claim: pop the lowest-scored job across every domain queue and
+# mark it running in one step, so no job is ever out of both queue and
+# running set. KEYS: domains set, running zset, counts hash;
+# ARGV: key prefix, worker ID, now. Returns [id, url, attempts, due_by] or nil.
+CLAIM_SCRIPT = """
+local best_key, best_score
+for _, domain in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    local queue_key = ARGV[1] .. ':queue:' .. domain
+    local head = redis.call('ZRANGE', queue_key, 0, 0, 'WITHSCORES')
+    if head[1] and (best_score == nil or tonumber(head[2]) < best_score) then
+        best_key, best_score = queue_key, tonumber(head[2])
+    end
+end
+if not best_key then
+    return nil
+end
+local job_id = redis.call('ZPOPMIN', best_key)[1]
+local job_key = ARGV[1] .. ':job:' .. job_id
+redis.call('HSET', job_key, 'status', '%s', 'worker', ARGV[2], 'claimed_at', ARGV[3])
+local attempts = redis.call('HINCRBY', job_key, 'attempts', 1)
+redis.call('ZADD', KEYS[2], ARGV[3], job_id)
+redis.call('HINCRBY', KEYS[3], '%s', -1)
+redis.call('HINCRBY', KEYS[3], '%s', 1)
+local fields = redis.call('HMGET', job_key, 'url', 'due_by')
+return {job_id, fields[1], attempts, fields[2]}
+""" % (RUNNING, QUEUED, RUNNING)
+
+def _domain(url: str) -> str:
+    from crawl_frontier import default_domain
+    return default_domain(url)
+
+class SQLiteBroker:
+    """Broker backed by one SQLite file shared by all local processes"""
+
+    def __init__(self, path: str = 'scrape_jobs.sqlite'):
+        self._lock = threading.Lock()
+        # Autocommit mode so claim() can take the write lock with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                result TEXT,
+                error TEXT,
+                elapsed_ms INTEGER,
+                submitted_at REAL NOT NULL,
+                claimed_at REAL,
+                finished_at REAL,
+                due_by REAL,
+                partial INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, domain, priority DESC, submitted_at);
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                stats TEXT NOT NULL,
+                heartbeat REAL NOT NULL
+            );
+        """)
+        # Queue files created before time budgets existed
+        for column in ("due_by REAL", "partial INTEGER NOT NULL DEFAULT 0"):
+            try:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass
+
+    def submit(self, url: str, priority: int = 0, budget_ms: int = None) -> str:
+        """
+        Queue a URL, returns the job ID
+
+        With budget_ms the result is wanted within that many milliseconds
+        of submission; the worker scrapes with whatever is left of it.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        due_by = now + budget_ms / 1000.0 if budget_ms is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, url, domain, priority, status, submitted_at, due_by) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, url, _domain(url), priority, QUEUED, now, due_by)
+            )
+        return job_id
+
+    def claim(self, worker_id: str):
+        """
+        Hand the next job to a worker
+
+        Returns:
+            dict: {'id', 'url', 'attempts', 'due_by'} or None if nothing may run right now
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A job that keeps killing or hanging its worker is given up like any failure
+                self._conn.execute(
+                    "UPDATE jobs SET worker = NULL, "
+                    "status = CASE WHEN attempts < ? THEN ? ELSE ? END, "
+                    "error = ?, finished_at = CASE WHEN attempts < ? THEN finished_at ELSE ? END "
+                    "WHERE status = ? AND claimed_at < ?",
+                    (MAX_ATTEMPTS, QUEUED, FAILED, STALE_ERROR, MAX_ATTEMPTS, now, RUNNING, now - CLAIM_TIMEOUT)
+                )
+                row = self._conn.execute("""
+                    SELECT id, url, attempts, due_by FROM jobs
+                    WHERE status = ?
+                    ORDER BY priority DESC, submitted_at
+                    LIMIT 1
+                """, (QUEUED,)).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+
+                job_id, url, attempts, due_by = row
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, claimed_at = ? WHERE id = ?",
+                    (RUNNING, worker_id, now, job_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {'id': job_id, 'url': url, 'attempts': attempts + 1, 'due_by': due_by}
+
+    def complete(self, job_id: str, data: dict, elapsed_ms: int = None, partial: bool = False,
+                 worker_id: str = None) -> bool:
+        """
+        Store a job's scraped data (partial: cut short by its time budget)
+
+        Only a job still running (and, with worker_id, still claimed by that
+        worker) is updated; a worker whose claim timed out and was handed to
+        another one is ignored.
+
+        Returns:
+            bool: True if the result was stored
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, elapsed_ms = ?, finished_at = ?, partial = ? "
+                "WHERE id = ? AND status = ? AND (? IS NULL OR worker = ?)",
+                (DONE, json.dumps(data, ensure_ascii=False), elapsed_ms, time.time(), int(partial),
+                 job_id, RUNNING, worker_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, error: str, elapsed_ms: int = None, worker_id: str = None) -> bool:
+        """
+        Record a failed attempt; the job is queued again until MAX_ATTEMPTS
+
+        Same ownership rule as complete().
+
+        Returns:
+            bool: True if the failure was recorded
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, "
+                "error = ?, elapsed_ms = ?, finished_at = ?, worker = NULL "
+                "WHERE id = ? AND status = ? AND (? IS NULL OR worker = ?)",
+                (MAX_ATTEMPTS, QUEUED, FAILED, error, elapsed_ms, time.time(),
+                 job_id, RUNNING, worker_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str):
+        """
+        Returns:
+            dict: 'status', 'url', 'attempts', 'data', 'partial', 'error',
+            'elapsed_ms' and 'worker', or None for an unknown job
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, url, attempts, result, error, elapsed_ms, worker, partial FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'url': row[1], 'attempts': row[2],
+                'data': json.loads(row[3]) if row[3] else None, 'partial': bool(row[7]),
+                'error': row[4], 'elapsed_ms': row[5], 'worker': row[6]}
+
+    def counts(self) -> dict:
+        """Number of jobs per status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def heartbeat(self, worker_id: str, stats: dict):
+        """Publish a worker's stats"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workers (worker_id, stats, heartbeat) VALUES (?, ?, ?)",
+                (worker_id, json.dumps(stats), time.time())
+            )
+
+    def workers(self) -> list:
+        """Latest stats of every worker, with 'worker_id' and 'heartbeat' added"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT worker_id, stats, heartbeat FROM workers ORDER BY worker_id"
+            ).fetchall()
+        return [dict(json.loads(stats), worker_id=worker_id, heartbeat=heartbeat)
+                for worker_id, stats, heartbeat in rows]
+
+    def wait(self, job_id: str, timeout: float = 120, poll: float = 0.2):
+        """Block until a job is done or failed; returns get() or None on timeout"""
+        return _wait(self, job_id, timeout, poll)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class RedisBroker:
+    """
+    Broker on a Redis server, for workers on several machines
+
+    Jobs live in one sorted set per domain (highest priority, then oldest,
+    first); running jobs in a sorted set by claim time. claim() runs as one
+    Lua script, so it takes the best job across all domains and a worker
+    dying mid-claim cannot lose it.
+    """
+
+    def __init__(self, client, prefix: str = 'scrape'):
+        """
+        Args:
+            client: redis.Redis (or compatible) client
+            prefix (str): Key prefix, to share a server between fleets
+        """
+        self.client = client
+        self.prefix = prefix
+        self._claim = client.register_script(CLAIM_SCRIPT)
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    def submit(self, url: str, priority: int = 0, budget_ms: int = None) -> str:
+        job_id = uuid.uuid4().hex
+        domain = _domain(url)
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.hset(self._key('job', job_id), mapping={
+            'url': url, 'domain': domain, 'priority': priority, 'status': QUEUED,
+            'attempts': 0, 'submitted_at': now,
+            'due_by': now + budget_ms / 1000.0 if budget_ms is not None else '',
+        })
+        pipe.sadd(self._key('domains'), domain)
+        # Higher priority first, then oldest first
+        pipe.zadd(self._key('queue', domain), {job_id: -priority * 1e10 + now})
+        pipe.hincrby(self._key('counts'), QUEUED, 1)
+        pipe.execute()
+        return job_id
+
+    def claim(self, worker_id: str):
+        now = time.time()
+        self._requeue_stale(now)
+        claimed = self._claim(keys=[self._key('domains'), self._key('running'), self._key('counts')],
+                              args=[self.prefix, worker_id, repr(now)])
+        if not claimed:
+            return None
+        job_id, url, attempts, due_by = [value.decode() if isinstance(value, bytes) else value
+                                         for value in claimed]
+        return {'id': job_id, 'url': url, 'attempts': int(attempts),
+                'due_by': float(due_by) if due_by else None}
+
+    def _requeue_stale(self, now):
+        for raw in self.client.zrangebyscore(self._key('running'), 0, now - CLAIM_TIMEOUT):
+            job_id = raw.decode() if isinstance(raw, bytes) else raw
+            # Removing it from the running set is the lock: only one caller gets 1
+            if not self.client.zrem(self._key('running'), job_id):
+                continue
+            attempts = int(self.client.hget(self._key('job', job_id), 'attempts') or 0)
+            if attempts < MAX_ATTEMPTS:
+                self._requeue(job_id, now)
+            else:
+                self._finish(job_id, FAILED, {'error': STALE_ERROR, 'worker': ''})
+
+    def _requeue(self, job_id, now, fields=None, pipe=None):
+        job_key = self._key('job', job_id)
+        domain, priority = self.client.hmget(job_key, 'domain', 'priority')
+        domain = domain.decode() if isinstance(domain, bytes) else domain
+        own = pipe is None
+        pipe = self.client.pipeline() if own else pipe
+        pipe.hset(job_key, mapping=dict(fields or {}, status=QUEUED, worker=''))
+        pipe.zadd(self._key('queue', domain), {job_id: -int(priority) * 1e10 + now})
+        pipe.hincrby(self._key('counts'), RUNNING, -1)
+        pipe.hincrby(self._key('counts'), QUEUED, 1)
+        if own:
+            pipe.execute()
+
+    def _finish(self, job_id, status, fields, pipe=None):
+        own = pipe is None
+        pipe = self.client.pipeline() if own else pipe
+        pipe.hset(self._key('job', job_id), mapping=dict(fields, status=status, finished_at=time.time()))
+        pipe.zrem(self._key('running'), job_id)
+        pipe.hincrby(self._key('counts'), RUNNING, -1)
+        pipe.hincrby(self._key('counts'), status, 1)
+        if own:
+            pipe.execute()
+
+    def _settle(self, job_id, worker_id, settle) -> bool:
+        """
+        Run settle(pipe, attempts) in a transaction, only while the job is
+        still running (and claimed by worker_id, if given)
+
+        The job hash is WATCHed, so a stale requeue or another worker's
+        claim in between aborts it instead of double counting.
+        """
+        import redis
+
+        job_key = self._key('job', job_id)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(job_key)
+                status, worker, attempts = pipe.hmget(job_key, 'status', 'worker', 'attempts')
+                status = status.decode() if isinstance(status, bytes) else status
+                worker = worker.decode() if isinstance(worker, bytes) else worker
+                if status != RUNNING or (worker_id is not None and worker != worker_id):
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                settle(pipe, int(attempts or 0))
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    def complete(self, job_id: str, data: dict, elapsed_ms: int = None, partial: bool = False,
+                 worker_id: str = None) -> bool:
+        fields = {'result': json.dumps(data, ensure_ascii=False), 'partial': int(partial),
+                  'elapsed_ms': elapsed_ms if elapsed_ms is not None else ''}
+        return self._settle(job_id, worker_id, lambda pipe, attempts: self._finish(job_id, DONE, fields, pipe))
+
+    def fail(self, job_id: str, error: str, elapsed_ms: int = None, worker_id: str = None) -> bool:
+        def settle(pipe, attempts):
+            if attempts < MAX_ATTEMPTS:
+                pipe.zrem(self._key('running'), job_id)
+                self._requeue(job_id, time.time(), {'error': error}, pipe)
+            else:
+                self._finish(job_id, FAILED, {'error': error,
+                                              'elapsed_ms': elapsed_ms if elapsed_ms is not None else ''}, pipe)
+        return self._settle(job_id, worker_id, settle)
+
+    def get(self, job_id: str):
+        raw = self.client.hgetall(self._key('job', job_id))
+        if not raw:
+            return None
+        job = {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+               for k, v in raw.items()}
+        return {'status': job['status'], 'url': job['url'], 'attempts': int(job.get('attempts', 0)),
+                'data': json.loads(job['result']) if job.get('result') else None,
+                'partial': job.get('partial') == '1',
+                'error': job.get('error') or None,
+                'elapsed_ms': int(job['elapsed_ms']) if job.get('elapsed_ms') else None,
+                'worker': job.get('worker') or None}
+
+    def counts(self) -> dict:
+        raw = self.client.hgetall(self._key('counts'))
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for k, v in raw.items():
+            counts[k.decode() if isinstance(k, bytes) else k] = int(v)
+        return counts
+
+    def heartbeat(self, worker_id: str, stats: dict):
+        self.client.hset(self._key('workers'), worker_id,
+                         json.dumps(dict(stats, heartbeat=time.time())))
+
+    def workers(self) -> list:
+        raw = self.client.hgetall(self._key('workers'))
+        workers = []
+        for worker_id, stats in sorted(raw.items()):
+            worker_id = worker_id.decode() if isinstance(worker_id, bytes) else worker_id
+            workers.append(dict(json.loads(stats), worker_id=worker_id))
+        return workers
+
+    def wait(self, job_id: str, timeout: float = 120, poll: float = 0.2):
+        return _wait(self, job_id, timeout, poll)
+
+    def close(self):
+        self.client.close()
+
+def _wait(broker, job_id, timeout, poll):
+    end = time.time() + timeout
+    while True:
+        job = broker.get(job_id)
+        if job is None or job['status'] in (DONE, FAILED):
+            return job
+        if time.time() >= end:
+            return None
+        time.sleep(poll)
+
+def connect(url: str = None):
+    """
+    Open a broker from a URL
+
+    Args:
+        url (str): redis://host:port/db for Redis, sqlite:///path (or a plain
+            file path) for SQLite. Defaults to the SCRAPE_BROKER environment
+            variable, then sqlite:///scrape_jobs.sqlite
+
+    Returns:
+        SQLiteBroker or RedisBroker
+    """
+    url = url or os.environ.get('SCRAPE_BROKER', 'sqlite:///scrape_jobs.sqlite')
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The Redis broker needs the redis package: pip install redis")
+        return RedisBroker(redis.Redis.from_url(url))
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteBroker(url)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Submit scrape jobs and inspect the worker fleet")
+    parser.add_argument('--broker', help="Broker URL (default: $SCRAPE_BROKER or sqlite:///scrape_jobs.sqlite)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    submit = commands.add_parser('submit', help="Queue every URL in a file")
+    submit.add_argument('url_file')
+    submit.add_argument('--priority', type=int, default=0)
+    commands.add_parser('status', help="Show job counts and worker stats")
+    args = parser.parse_args(argv)
+
+    broker = connect(args.broker)
+    if args.command == 'submit':
+        from bulk_scrape import read_urls
+        urls = read_urls(args.url_file)
+        for url in urls:
+            broker.submit(url, args.priority)
+        print(f"📝 Queued {len(urls)} jobs")
+    else:
+        counts = broker.counts()
+        print(f"📊 Jobs: {counts[QUEUED]} queued, {counts[RUNNING]} running, "
+              f"{counts[DONE]} done, {counts[FAILED]} failed")
+        now = time.time()
+        for worker in broker.workers():
+            age = now - worker.get('heartbeat', now)
+            print(f"   {worker['worker_id']}: {worker.get('processed', 0)} done, "
+                  f"{worker.get('failed', 0)} failed, {worker.get('in_flight', 0)} in flight, "
+                  f"avg {worker.get('avg_ms', 0)} ms (seen {age:.0f}s ago)")
+    broker.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Scrape worker for the broker-fed fleet
+
+Claims jobs from a scrape_broker backend, runs them through
+scraper_manager.scrape_car with a fixed number of threads and posts the
+results back. Stats (jobs done/failed, in flight, average time per site)
+are published to the broker every few seconds, so `scrape_broker.py
+status` shows the whole fleet. Start as many workers as you like, on one
+machine or several:
+
+    python scrape_worker.py --broker redis://queue-host:6379/0 -c 8
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scraper_manager import scrape_car
+import scrape_broker
+import parse_pool
+import deadline
+
+# Seconds between stats reports to the broker
+HEARTBEAT_INTERVAL = 5
+
+# Seconds to wait before asking again when the broker has nothing to hand out
+IDLE_POLL = 0.5
+
+class Worker:
+    """One worker process: N threads claiming and scraping jobs"""
+
+    def __init__(self, broker, concurrency: int = 4, worker_id: str = None):
+        """
+        Args:
+            broker: SQLiteBroker or RedisBroker
+            concurrency (int): Scrapes in flight at once
+            worker_id (str): Name shown in fleet stats (default: host-pid)
+        """
+        self.broker = broker
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {
+            'started_at': time.time(), 'concurrency': concurrency,
+            'processed': 0, 'failed': 0, 'in_flight': 0, 'avg_ms': 0, 'sites': {},
+        }
+        self._total_ms = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, sites={site: dict(s) for site, s in self._stats['sites'].items()})
+
+    def _record(self, url, ok, elapsed_ms):
+        from crawl_frontier import default_domain
+        site = default_domain(url)
+        with self._lock:
+            self._stats['in_flight'] -= 1
+            self._stats['processed' if ok else 'failed'] += 1
+            self._total_ms += elapsed_ms
+            self._stats['avg_ms'] = self._total_ms // (self._stats['processed'] + self._stats['failed'])
+            site_stats = self._stats['sites'].setdefault(site, {'processed': 0, 'failed': 0, 'total_ms': 0})
+            site_stats['processed' if ok else 'failed'] += 1
+            site_stats['total_ms'] += elapsed_ms
+
+    def _run_thread(self, drain):
+        while not self._stop.is_set():
+            try:
+                job = self.broker.claim(self.worker_id)
+            except Exception as e:
+                print(f"⚠️  Broker unavailable: {e}")
+                self._stop.wait(IDLE_POLL * 4)
+                continue
+
+            if job is None:
+                if drain and not self.broker.counts()[scrape_broker.QUEUED]:
+                    break
+                self._stop.wait(IDLE_POLL)
+                continue
+
+            with self._lock:
+                self._stats['in_flight'] += 1
+            started = time.time()
+            budget_ms = None
+            if job.get('due_by'):
+                budget_ms = max(0, int((job['due_by'] - started) * 1000))
+            try:
+                with deadline.budget(budget_ms) as active:
+                    data = scrape_car(job['url'])
+                elapsed_ms = int((time.time() - started) * 1000)
+                if not self.broker.complete(job['id'], data, elapsed_ms, partial=bool(active and active.skipped),
+                                            worker_id=self.worker_id):
+                    print(f"⚠️  {job['url']}: claim expired, result discarded")
+                self._record(job['url'], True, elapsed_ms)
+            except Exception as e:
+                elapsed_ms = int((time.time() - started) * 1000)
+                print(f"❌ {job['url']} (attempt {job['attempts']}): {e}")
+                self.broker.fail(job['id'], str(e), elapsed_ms, worker_id=self.worker_id)
+                self._record(job['url'], False, elapsed_ms)
+
+    def _report(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.broker.heartbeat(self.worker_id, self.stats())
+            except Exception as e:
+                print(f"⚠️  Could not report stats: {e}")
+
+    def run(self, drain: bool = False):
+        """
+        Process jobs until stop() is called
+
+        Args:
+            drain (bool): Return once the broker has no queued jobs left
+        """
+        print(f"🚀 Worker {self.worker_id} started with concurrency {self.concurrency}")
+        reporter = threading.Thread(target=self._report, daemon=True)
+        reporter.start()
+        threads = [threading.Thread(target=self._run_thread, args=(drain,), daemon=True)
+                   for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1)
+        finally:
+            self._stop.set()
+            self.broker.heartbeat(self.worker_id, self.stats())
+
+        stats = self.stats()
+        print(f"🏁 Worker {self.worker_id} stopped: {stats['processed']} done, {stats['failed']} failed")
+
+    def stop(self):
+        self._stop.set()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a scrape worker fed by the job broker")
+    parser.add_argument('--broker', help="Broker URL (default: $SCRAPE_BROKER or sqlite:///scrape_jobs.sqlite)")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="Scrapes in flight at once")
+    parser.add_argument('--worker-id', help="Name shown in fleet stats (default: host-pid)")
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count() or 1,
+                        help="Processes for HTML extraction (0 = parse inline)")
+    parser.add_argument('--drain', action='store_true', help="Exit once the queue is empty")
+    args = parser.parse_args(argv)
+
+    parse_pool.configure(args.parse_workers)
+    if os.environ.get('SCRAPER_UPSTREAM'):
+        import fake_upstream
+        fake_upstream.route(os.environ['SCRAPER_UPSTREAM'])
+    broker = scrape_broker.connect(args.broker)
+    worker = Worker(broker, args.concurrency, args.worker_id)
+    try:
+        worker.run(drain=args.drain)
+    except KeyboardInterrupt:
+        print("\n⏸️  Stopping worker")
+        worker.stop()
+    finally:
+        parse_pool.shutdown()
+        broker.close()
+
+if __name__ == "__main__":
+    main()
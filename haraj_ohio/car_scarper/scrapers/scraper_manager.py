@@ -4,22 +4,86 @@ Main scraper manager that handles multiple car websites
 
 import sys
 import os
+import threading
 from urllib.parse import urlparse
 
 # Add the scrapers directory to the path
 sys.path.append(os.path.dirname(__file__))
 
-def scrape_car(url: str) -> dict:
+import deadline
+import provenance
+
+_frontier = None
+_frontier_lock = threading.Lock()
+
+def scrape_car(url: str, budget_ms: int = None, fields=None) -> dict:
     """
     Main scraper function that detects the website and calls the appropriate scraper
     
     Args:
         url (str): The car listing URL
+        budget_ms (int): Optional time budget in milliseconds. Retries, pauses
+            and slow fallbacks are cut to fit and the best result found in
+            time is returned (see deadline.py). To get per-field provenance or
+            stop early once the key fields are found, call inside
+            provenance.trace()
+        fields: Optional projection ("Price,Mileage" or a list). Only these
+            fields (and URL) are returned and extraction stages that fill
+            nothing requested are skipped
         
     Returns:
         dict: Dictionary containing car information
     """
     
+    site = get_site(url)
+    
+    with deadline.budget(budget_ms) as active, provenance.select(fields) as trace:
+        # Route to the appropriate scraper based on site
+        if site == 'cars.com':
+            from cars_com.cars_com import scrape_car as cars_com_scraper
+            car_data = cars_com_scraper(url)
+        
+        elif site == 'manheim.com.au':
+            from manheim_com_au.manheim import scrape_car as manheim_scraper
+            car_data = manheim_scraper(url)
+        
+        else:
+            from carfax_com.carfax import scrape_car as carfax_scraper
+            car_data = carfax_scraper(url)
+        
+        partial = active is not None and bool(active.skipped)
+        
+        # Early mode and projections skip stages, so the result is not a full listing
+        pruned = trace is not None and trace.pruned
+        if trace is not None and trace.only is not None:
+            car_data = provenance.project(car_data, trace.only)
+    
+    # Fingerprint the result so the refresher can adapt this URL's re-scrape interval
+    # (a result cut short by the budget or pruned says nothing about whether the listing changed,
+    # and demo data stands in for a blocked fetch, so it only pushes the next check back)
+    if not partial and not pruned:
+        try:
+            import refresher
+            if provenance.is_demo(car_data):
+                refresher.record_failure(url)
+            else:
+                refresher.record(url, car_data)
+        except Exception as e:
+            print(f"⚠️  Could not record refresh state for {url}: {e}")
+    
+    return car_data
+
+def get_site(url: str) -> str:
+    """
+    Work out which supported site a URL belongs to
+    
+    Args:
+        url (str): The car listing URL
+        
+    Returns:
+        str: The site key, e.g. 'cars.com'
+    """
+    
     if not url:
         raise ValueError("URL is required")
     
@@ -27,22 +91,24 @@ def scrape_car(url: str) -> dict:
     parsed_url = urlparse(url)
     domain = parsed_url.netloc.lower()
     
-    # Route to the appropriate scraper based on domain
-    if 'cars.com' in domain:
-        from cars_com.cars_com import scrape_car as cars_com_scraper
-        return cars_com_scraper(url)
+    for site in get_supported_sites():
+        if site in domain:
+            return site
     
-    elif 'manheim.com.au' in domain:
-        from manheim_com_au.manheim import scrape_car as manheim_scraper
-        return manheim_scraper(url)
-    
-    elif 'carfax.com' in domain:
-        from carfax_com.carfax import scrape_car as carfax_scraper
-        return carfax_scraper(url)
-    
-    else:
-        supported_sites = ', '.join(get_supported_sites())
-        raise ValueError(f"Unsupported website: {domain}. Supported sites: {supported_sites}")
+    supported_sites = ', '.join(get_supported_sites())
+    raise ValueError(f"Unsupported website: {domain}. Supported sites: {supported_sites}")
+
+def get_frontier():
+    """
+    Returns the crawl frontier shared by everything in this process
+    (API, bulk CLI, crawlers), created on first use
+    """
+    global _frontier
+    with _frontier_lock:
+        if _frontier is None:
+            from crawl_frontier import CrawlFrontier
+            _frontier = CrawlFrontier()
+        return _frontier
 
 def get_supported_sites():
     """
@@ -0,0 +1,317 @@
+"""
+Batched upserts of scraped cars into the Supabase `cars` table
+
+The Flutter app adds cars one request at a time (SupabaseService.addCar).
+For bulk ingestion CarSink buffers scraped listings and writes them as
+multi-row PostgREST upserts, so 10k listings take a few dozen round-trips:
+
+    with CarSink(batch_size=500, flush_interval=5) as sink:
+        for car_data in results:
+            sink.add(car_data)
+
+    python supabase_sink.py results.jsonl            # import a bulk_scrape output
+
+Rows are keyed by VIN when the listing has one and by the canonical listing
+URL (cars.source_url) otherwise; both need the unique indexes from
+lib/supabase/sql/cammnds/add_upsert_keys.sql. VIN-keyed rows leave
+source_url out, so an upsert only ever meets the one index it resolves. A
+listing seen twice in the same batch is written once (last one wins), and a
+listing already in the table is updated in place instead of duplicated.
+
+A batch the server rejects outright (4xx other than 408/429) is retried row
+by row, and the rows that still fail are dead-lettered (counted in
+stats['rejected'] and appended to rejects_path) instead of being retried on
+every flush; other failures keep the rows buffered for the next flush.
+
+SUPABASE_URL and SUPABASE_KEY (a service key, or any key allowed to insert
+and update cars) configure the target; a local PostgREST in front of
+lib/supabase/sql/schema.sql works the same way.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from decimal import Decimal
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import batch_normalize
+import provenance
+from car_record import CarRecord
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+# Upsert targets: rows with a VIN conflict on vin, the rest on source_url
+KEY_COLUMNS = ('vin', 'source_url')
+
+# Client errors that are worth retrying (timeout, rate limit)
+RETRYABLE_STATUSES = (408, 429)
+
+class UpsertError(RuntimeError):
+    """A PostgREST upsert answered with an error status"""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def permanent(self) -> bool:
+        """True when sending the same rows again cannot succeed"""
+        return 400 <= self.status < 500 and self.status not in RETRYABLE_STATUSES
+
+def canonical_url(url: str) -> str:
+    """Listing URL without query, fragment, www. or trailing slash"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return urlunsplit(('https', host, parts.path.rstrip('/') or '/', '', ''))
+
+def to_row(car) -> dict:
+    """
+    A `cars` row for a scraped listing
+
+    Args:
+        car: Scraper dict, bulk_scrape line, CarRecord dict or CarRecord
+
+    Returns:
+        dict: Row with source_url (that of the matched car for a listing with
+        DuplicateOf) and a normalized VIN (None unless 17 characters), or None
+        for a failed scrape, demo data or a listing without a price
+    """
+    duplicate_of = None
+    if not isinstance(car, CarRecord):
+        unwrapped = batch_normalize.unwrap([car])
+        if not unwrapped:
+            return None
+        car = unwrapped[0]
+        if provenance.is_demo(car):
+            return None
+        duplicate_of = car.get('DuplicateOf') or car.get('duplicate_of')
+        car = CarRecord.from_dict(car) if 'URL' not in car and 'url' in car else CarRecord.from_scraped(car)
+    row = car.to_supabase()
+    if row is None:
+        return None
+    vin = (row.get('vin') or '').replace(' ', '').upper()
+    # Placeholders ("N/A", partial VINs) would all collide on the vin index
+    row['vin'] = vin if len(vin) == 17 else None
+    # A listing photo_index matched to a car already stored updates that car's row
+    source_url = duplicate_of or car.url
+    row['source_url'] = canonical_url(source_url) if source_url else None
+    return row
+
+def upsert_row(row: dict) -> tuple:
+    """
+    The key column of a row and the row as sent for that key
+
+    A VIN-keyed row drops source_url: another car may already hold that URL
+    (e.g. imported before its VIN was known), and an upsert on vin cannot
+    resolve a conflict on the source_url index.
+    """
+    if row['vin']:
+        return 'vin', {name: value for name, value in row.items() if name != 'source_url'}
+    return 'source_url', row
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+class CarSink:
+    """Buffers scraped cars and upserts them in batches"""
+
+    def __init__(self, url: str = None, key: str = None, table: str = 'cars',
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, session=None,
+                 rejects_path: str = None):
+        """
+        Args:
+            url (str): Supabase project or PostgREST URL (default: SUPABASE_URL)
+            key (str): API key (default: SUPABASE_KEY)
+            table (str): Target table
+            batch_size (int): Rows per upsert request
+            flush_interval (float): Seconds a row may wait in the buffer; a
+                background thread flushes partial batches (0 disables it)
+            session: requests.Session to reuse (default: a new one)
+            rejects_path (str): JSONL file rows the server rejects are appended
+                to, with the status and error (default: only counted)
+        """
+        url = url or os.environ.get('SUPABASE_URL')
+        if not url:
+            raise ValueError("No Supabase URL given (pass url= or set SUPABASE_URL)")
+        key = key or os.environ.get('SUPABASE_KEY')
+        base = url.rstrip('/')
+        # A Supabase project serves PostgREST under /rest/v1, a local PostgREST at its root
+        if urlsplit(base).netloc.endswith('.supabase.co') and not base.endswith('/rest/v1'):
+            base += '/rest/v1'
+        self.endpoint = f"{base}/{table}"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session = session or requests.Session()
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Prefer': 'resolution=merge-duplicates,return=minimal',
+        })
+        if key:
+            self.session.headers.update({'apikey': key, 'Authorization': f'Bearer {key}'})
+        self.rejects_path = rejects_path
+        self.stats = {'added': 0, 'skipped': 0, 'upserted': 0, 'rejected': 0, 'requests': 0}
+        self._buffers = {column: {} for column in KEY_COLUMNS}
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = None
+        if flush_interval:
+            self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._timer.start()
+
+    def add(self, car) -> bool:
+        """
+        Queue one scraped listing, flushing when a batch is full
+
+        Returns:
+            bool: False if the listing was skipped (failed scrape, demo data, no price, no VIN or URL)
+        """
+        row = to_row(car)
+        column = None
+        if row is not None:
+            column, row = upsert_row(row)
+        with self._lock:
+            if row is None or row[column] is None:
+                self.stats['skipped'] += 1
+                return False
+            buffer = self._buffers[column]
+            buffer[row[column]] = row
+            self.stats['added'] += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(buffer) >= self.batch_size
+        if full:
+            self.flush(column)
+        return True
+
+    def flush(self, column: str = None) -> int:
+        """
+        Upsert everything buffered (or only the rows keyed on column)
+
+        Returns:
+            int: Rows written (rejected rows are not counted)
+        """
+        written = 0
+        with self._flush_lock:
+            for key_column in ([column] if column else KEY_COLUMNS):
+                with self._lock:
+                    rows, self._buffers[key_column] = self._buffers[key_column], {}
+                    if not any(self._buffers.values()):
+                        self._oldest = None
+                items = list(rows.items())
+                try:
+                    for start in range(0, len(items), self.batch_size):
+                        chunk = items[start:start + self.batch_size]
+                        try:
+                            self._upsert(key_column, [row for _, row in chunk])
+                            written += len(chunk)
+                        except UpsertError as e:
+                            if not e.permanent:
+                                raise
+                            written += self._upsert_each(key_column, chunk, e)
+                        for key, _ in chunk:
+                            del rows[key]
+                except Exception:
+                    # Put back what was not written; rows added meanwhile are newer and win
+                    with self._lock:
+                        for key, row in rows.items():
+                            self._buffers[key_column].setdefault(key, row)
+                        if self._oldest is None:
+                            self._oldest = time.monotonic()
+                    raise
+        return written
+
+    def _upsert(self, column: str, rows: list):
+        body = json.dumps(rows, default=_default)
+        response = self.session.post(self.endpoint, params={'on_conflict': column},
+                                     data=body.encode('utf-8'), timeout=60)
+        self.stats['requests'] += 1
+        if response.status_code >= 400:
+            raise UpsertError(f"Upsert of {len(rows)} rows failed ({response.status_code}): {response.text[:300]}",
+                              response.status_code)
+        self.stats['upserted'] += len(rows)
+
+    def _upsert_each(self, column: str, chunk: list, error: UpsertError) -> int:
+        """Retry a rejected batch row by row and dead-letter the rows that still fail"""
+        if len(chunk) == 1:
+            self._reject(chunk[0][1], error)
+            return 0
+        written = 0
+        for _, row in chunk:
+            try:
+                self._upsert(column, [row])
+                written += 1
+            except UpsertError as e:
+                if not e.permanent:
+                    raise
+                self._reject(row, e)
+        return written
+
+    def _reject(self, row: dict, error: UpsertError):
+        self.stats['rejected'] += 1
+        print(f"⚠️ Rejected {row.get('vin') or row.get('source_url')}: {error}")
+        if self.rejects_path:
+            with open(self.rejects_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'status': error.status, 'error': str(error), 'row': row},
+                                   default=_default, ensure_ascii=False) + '\n')
+
+    def _flush_periodically(self):
+        while not self._closed.wait(min(self.flush_interval, 1.0)):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"⚠️ Periodic flush failed: {e}")
+
+    def close(self):
+        """Stop the flush thread and write what is left"""
+        self._closed.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upsert bulk scrape results into the Supabase cars table")
+    parser.add_argument('results', help="JSONL output of bulk_scrape.py")
+    parser.add_argument('--url', help="Supabase/PostgREST URL (default: SUPABASE_URL)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per upsert request")
+    parser.add_argument('--rejects', help="JSONL file for rows the server rejects (default: <results>.rejects)")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    rejects_path = args.rejects or args.results + '.rejects'
+    with CarSink(args.url, batch_size=args.batch_size, flush_interval=0, rejects_path=rejects_path) as sink, \
+            open(args.results, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                sink.add(json.loads(line))
+    stats = sink.stats
+    print(f"✅ Upserted {stats['upserted']} cars in {stats['requests']} requests "
+          f"({stats['skipped']} skipped, {stats['rejected']} rejected, {time.time() - started:.1f}s)")
+    if stats['rejected']:
+        print(f"📄 Rejected rows: {rejects_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Catalogue-based listing title parsing
+
+Splits titles like "2021 Mercedes-Benz GLC 300 4MATIC" or "Used 2019 Land
+Rover Range Rover Sport HSE" into year, make, model and variant using the
+bundled catalogue in data/makes_models.tsv instead of guessing from word
+positions. The catalogue is loaded once into token tries (makes, and the
+models of each make), so a title is segmented in one left-to-right walk:
+the longest make starting within the first few words, then the longest of
+its models right after it, and the rest is the variant.
+
+    parse_title("2021 Land Rover Range Rover Sport HSE")
+    # {'year': 2021, 'make': 'Land Rover', 'make_id': 'land-rover',
+    #  'model': 'Range Rover Sport', 'model_id': 'land-rover/range-rover-sport',
+    #  'variant': 'HSE'}
+
+    apply(car_data, sources)   # set Year/Make (Brand)/Model/Variant/MakeId/ModelId of a scrape
+
+make_id/model_id are slugs of the canonical names, stable across sites, so
+listings can be grouped and joined on them.
+"""
+
+import os
+import re
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import provenance
+
+CATALOGUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'makes_models.tsv')
+
+# The make has to start within this many words ("Used 2019 Certified Toyota ...")
+MAX_MAKE_START = 5
+
+_TOKEN = re.compile(r'[A-Za-z0-9]+')
+_YEAR = re.compile(r'(?:19|20)\d{2}')
+
+# Trie node key holding the entry that ends at that node
+_END = ''
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+def slug(name: str) -> str:
+    """'Land Rover' -> 'land-rover'"""
+    return '-'.join(token.lower() for token in _TOKEN.findall(name))
+
+def _tokens(text: str) -> list:
+    return [token.lower() for token in _TOKEN.findall(text)]
+
+def _insert(trie: dict, name: str, entry):
+    node = trie
+    for token in _tokens(name):
+        node = node.setdefault(token, {})
+    node[_END] = entry
+
+def _longest(trie: dict, tokens: list, start: int):
+    """(entry, end index) of the longest name in trie starting at tokens[start]"""
+    node = trie
+    best = None, start
+    for index in range(start, len(tokens)):
+        node = node.get(tokens[index])
+        if node is None:
+            break
+        if _END in node:
+            best = node[_END], index + 1
+    return best
+
+def load_catalogue(path: str = CATALOGUE_PATH) -> dict:
+    """
+    Build the make trie (each make entry carrying its model trie)
+
+    Returns:
+        dict: Token trie of makes; entries are dicts with name, id and models
+    """
+    makes = {}
+    make = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            indented = line.startswith('\t')
+            name, _, aliases = line.strip('\n').strip('\t').partition('\t')
+            names = [name] + [alias for alias in aliases.split('|') if alias.strip()]
+            if not indented:
+                make = {'name': name, 'id': slug(name), 'models': {}}
+                for spelling in names:
+                    _insert(makes, spelling, make)
+            elif make is not None:
+                model = {'name': name, 'id': f"{make['id']}/{slug(name)}"}
+                for spelling in names:
+                    _insert(make['models'], spelling, model)
+    return makes
+
+def _get_catalogue() -> dict:
+    global _catalogue
+    with _catalogue_lock:
+        if _catalogue is None:
+            _catalogue = load_catalogue()
+        return _catalogue
+
+def parse_title(title: str):
+    """
+    Segment a listing title
+
+    Args:
+        title (str): e.g. "2020 Toyota Camry SE" or "Toyota Camry SE 2020"
+
+    Returns:
+        dict: year (int or None), make, make_id, model, model_id (None for a
+        model missing from the catalogue, whose name is then the next word)
+        and variant (None if nothing follows), or None when no catalogue make
+        appears at the start of the title
+    """
+    if not provenance.is_filled(title):
+        return None
+    matches = list(_TOKEN.finditer(title))
+    tokens = [match.group().lower() for match in matches]
+    makes = _get_catalogue()
+
+    year = None
+    for start in range(min(len(tokens), MAX_MAKE_START)):
+        make, end = _longest(makes, tokens, start)
+        if make is not None:
+            break
+        if year is None and _YEAR.fullmatch(tokens[start]):
+            year = int(tokens[start])
+    else:
+        return None
+
+    model, model_end = _longest(make['models'], tokens, end)
+    if model is not None:
+        model_name, model_id = model['name'], model['id']
+    elif end < len(tokens) and not _YEAR.fullmatch(tokens[end]):
+        # Not in the catalogue: fall back to the next word, as sites usually put the model there
+        model_name, model_id, model_end = matches[end].group(), None, end + 1
+    else:
+        model_name, model_id, model_end = None, None, end
+
+    variant_words = []
+    if model_end < len(tokens):
+        for word in title[matches[model_end].start():].split():
+            if _YEAR.fullmatch(word.strip(',.')):
+                if year is None:
+                    year = int(word.strip(',.'))
+                continue
+            variant_words.append(word)
+    variant = ' '.join(variant_words).strip(' -,|') or None
+
+    return {
+        'year': year,
+        'make': make['name'],
+        'make_id': make['id'],
+        'model': model_name,
+        'model_id': model_id,
+        'variant': variant,
+    }
+
+def apply(car_data: dict, sources=None, title: str = None):
+    """
+    Set the title-derived fields of a scrape from the catalogue
+
+    Year, Make (Brand where the result uses that key), Model, Variant (only
+    where the result has that key), MakeId and ModelId are set from the
+    parsed title. Nothing changes when no catalogue make is found, so
+    callers can keep their old guess as a fallback.
+
+    Args:
+        car_data (dict): Scraped fields, changed in place
+        sources (provenance.Sources): Notes the fields the catalogue filled
+        title (str): Title to parse (default: car_data['Title'])
+
+    Returns:
+        dict: The parse_title() result, or None if the title was not matched
+    """
+    parsed = parse_title(title if title is not None else car_data.get('Title'))
+    if parsed is None:
+        return None
+
+    def set_field(field, value, confidence):
+        car_data[field] = value
+        if sources is not None:
+            sources.found(field, 'title catalogue', confidence)
+
+    model_confidence = 0.9 if parsed['model_id'] else 0.6
+    if parsed['year']:
+        set_field('Year', str(parsed['year']), 0.8)
+    set_field('Brand' if 'Brand' in car_data else 'Make', parsed['make'], 0.9)
+    set_field('Model', parsed['model'] or 'N/A', model_confidence)
+    if 'Variant' in car_data:
+        set_field('Variant', parsed['variant'] or 'N/A', model_confidence)
+    car_data['MakeId'] = parsed['make_id']
+    car_data['ModelId'] = parsed['model_id'] or 'N/A'
+    return parsed
@@ -0,0 +1,464 @@
+"""
+Offline VIN decoding
+
+Decodes what a 17-character VIN says about the car without any network
+call: the make from the World Manufacturer Identifier (positions 1-3), the
+model for the few prefixes listed with their VDS characters, the model
+year from position 10 and whether the ISO 3779 check digit (position 9)
+adds up.
+
+The prefixes live in data/vin_wmi.tsv. On first use they are compiled into
+a compact binary index (sorted fixed-width records plus a name table) that
+is memory-mapped, so a lookup is a handful of binary-search probes into the
+page cache and every process shares the same pages:
+
+    decode('5YJ3E1EA2KF317000')
+    # {'vin': ..., 'make': 'Tesla', 'model': 'Model 3', 'year': 2019, 'check_digit_ok': True, ...}
+
+    apply(car_data, sources)   # fill/verify Year, Make/Brand and Model of a scrape
+    extract_vin(page_text)     # best VIN on a page: one scan, check digit, label proximity
+
+    python vin_decoder.py 1HGCM82633A004352    # decode from the command line
+    python vin_decoder.py --build              # rebuild the index
+
+SCRAPER_VIN_INDEX overrides where the compiled index is kept (default:
+next to the .tsv, or the temp directory when that is read-only).
+"""
+
+import os
+import re
+import sys
+import mmap
+import time
+import bisect
+import struct
+import tempfile
+import argparse
+import threading
+from functools import lru_cache
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import provenance
+import title_parser
+
+SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'vin_wmi.tsv')
+
+VIN_LENGTH = 17
+
+# Characters allowed in a VIN (I, O and Q never appear)
+VIN_CHARS = frozenset('ABCDEFGHJKLMNPRSTUVWXYZ0123456789')
+
+# ISO 3779 / 49 CFR 565 check digit: letter values and position weights
+TRANSLITERATION = {
+    **{str(digit): digit for digit in range(10)},
+    'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'G': 7, 'H': 8,
+    'J': 1, 'K': 2, 'L': 3, 'M': 4, 'N': 5, 'P': 7, 'R': 9,
+    'S': 2, 'T': 3, 'U': 4, 'V': 5, 'W': 6, 'X': 7, 'Y': 8, 'Z': 9,
+}
+WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+
+# Position 10 codes: the i-th code is 1980 + i, repeating every 30 years
+YEAR_CODES = 'ABCDEFGHJKLMNPRSTVWXY123456789'
+YEAR_CYCLE = 30
+
+# Regions that mandate the check digit (North America, China); elsewhere
+# position 9 may be any character
+CHECK_DIGIT_REGIONS = ('1', '2', '3', '4', '5', 'L')
+
+# Index layout: header, then fixed-width records sorted by key, then names
+_MAGIC = b'VINX'
+_HEADER = struct.Struct('<4sHI')       # magic, record count, names offset
+_RECORD = struct.Struct('<6sHH')       # space-padded prefix, make id, model id
+_KEY_WIDTH = 6
+
+# Short names sites use for a make (as provenance.field_key) -> the decoded make's key
+MAKE_ALIASES = {
+    'mercedes': 'mercedesbenz',
+    'benz': 'mercedesbenz',
+    'vw': 'volkswagen',
+    'chevy': 'chevrolet',
+    'rangerover': 'landrover',
+    'alfa': 'alfaromeo',
+}
+
+# One pass over page text finds both VIN labels and 17-character VIN-alphabet runs
+_VIN_SCAN = re.compile(
+    r'(?<![A-Za-z0-9])(?:(?P<vin>[A-HJ-NPR-Z0-9]{17})'
+    r'|(?P<label>(?i:VIN|V\.I\.N\.?|Chassis(?:\s+(?:No\.?|Number))?|Vehicle\s+Identification\s+Number)))'
+    r'(?![A-Za-z0-9])'
+)
+
+# A label counts as "next to" a VIN within this many characters before it
+LABEL_NEAR = 40
+LABEL_FAR = 200
+
+_index = None
+_index_lock = threading.Lock()
+
+def check_digit(vin: str) -> str:
+    """
+    The check digit a VIN should carry in position 9
+
+    Returns:
+        str: '0'-'9' or 'X', or None if the VIN has characters outside VIN_CHARS
+    """
+    total = 0
+    for char, weight in zip(vin.upper(), WEIGHTS):
+        value = TRANSLITERATION.get(char)
+        if value is None:
+            return None
+        total += value * weight
+    remainder = total % 11
+    return 'X' if remainder == 10 else str(remainder)
+
+def is_well_formed(vin: str) -> bool:
+    """17 VIN characters, no I/O/Q"""
+    return isinstance(vin, str) and len(vin) == VIN_LENGTH and all(char in VIN_CHARS for char in vin.upper())
+
+def check_digit_required(vin: str) -> bool:
+    """Whether the VIN's region mandates a valid check digit"""
+    return vin[:1].upper() in CHECK_DIGIT_REGIONS
+
+def is_valid(vin: str) -> bool:
+    """Well-formed, with a correct check digit wherever one is mandatory"""
+    if not is_well_formed(vin):
+        return False
+    vin = vin.upper()
+    return not check_digit_required(vin) or vin[8] == check_digit(vin)
+
+def model_year(vin: str, hint: int = None):
+    """
+    Model year from position 10
+
+    Only North American and Chinese VINs must carry it; elsewhere most
+    makers follow the same scheme but some use position 10 for the serial.
+    The code repeats every 30 years. North American cars and light trucks
+    from 2010 on carry a letter in position 7, which picks the later cycle;
+    for other VINs the cycle closest to hint (e.g. the year in the title) is
+    used, or the latest one that is not in the future.
+
+    Returns:
+        int: The model year, or None if position 10 is not a year code
+    """
+    code = vin[9:10].upper()
+    index = YEAR_CODES.find(code) if code else -1
+    if index < 0:
+        return None
+    candidates = [1980 + index + YEAR_CYCLE * cycle for cycle in range(3)]
+    if vin[:1] in '12345':
+        return candidates[1] if vin[6:7].isalpha() else candidates[0]
+    if hint:
+        return min(candidates, key=lambda year: abs(year - hint))
+    latest = time.gmtime().tm_year + 1
+    return max(year for year in candidates if year <= latest)
+
+def _read_source(path: str) -> list:
+    """(prefix, make, model) rows of the .tsv"""
+    rows = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            parts = line.split('\t')
+            prefix = parts[0].strip().upper()
+            if not 2 <= len(prefix) <= _KEY_WIDTH:
+                raise ValueError(f"Bad VIN prefix {prefix!r} in {path}")
+            rows.append((prefix, parts[1].strip(), parts[2].strip() if len(parts) > 2 else ''))
+    return rows
+
+def build_index(source: str = SOURCE_PATH, path: str = None) -> str:
+    """
+    Compile the .tsv into the binary index
+
+    Returns:
+        str: Path of the written index
+    """
+    path = path or index_path(source)
+    rows = sorted(_read_source(source))
+    names = ['']
+    ids = {'': 0}
+    for _, make, model in rows:
+        for name in (make, model):
+            if name not in ids:
+                ids[name] = len(names)
+                names.append(name)
+
+    records = b''.join(_RECORD.pack(prefix.ljust(_KEY_WIDTH).encode('ascii'), ids[make], ids[model])
+                       for prefix, make, model in rows)
+    names_offset = _HEADER.size + len(records)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(rows), names_offset))
+        f.write(records)
+        f.write('\n'.join(names).encode('utf-8'))
+    os.replace(tmp_path, path)
+    return path
+
+def index_path(source: str = SOURCE_PATH) -> str:
+    """Where the compiled index for source is kept"""
+    if os.environ.get('SCRAPER_VIN_INDEX'):
+        return os.environ['SCRAPER_VIN_INDEX']
+    directory = os.path.dirname(source)
+    if not os.access(directory, os.W_OK):
+        directory = tempfile.gettempdir()
+    return os.path.join(directory, os.path.splitext(os.path.basename(source))[0] + '.idx')
+
+class _Index:
+    """The memory-mapped index"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, names_offset = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a VIN index")
+        self.names = self._map[names_offset:].decode('utf-8').split('\n')
+        self._keys = _Keys(self._map, self.count)
+
+    def _find(self, prefix: str, low: int = 0):
+        """Record position of an exact prefix, or None"""
+        key = prefix.ljust(_KEY_WIDTH).encode('ascii', 'replace')
+        position = bisect.bisect_left(self._keys, key, low)
+        if position < self.count and self._keys[position] == key:
+            return position
+        return None
+
+    def lookup(self, vin: str):
+        """(make, model) of the longest listed prefix of vin, or (None, None)"""
+        position = self._find(vin[:3])
+        if position is None:
+            position = self._find(vin[:2])
+        elif position + 1 < self.count and self._keys[position + 1][:3] == self._keys[position][:3]:
+            # Padding sorts first, so the WMI's longer (VDS) prefixes follow it directly
+            for length in range(_KEY_WIDTH, 3, -1):
+                longer = self._find(vin[:length], position + 1)
+                if longer is not None:
+                    position = longer
+                    break
+        if position is None:
+            return None, None
+        _, make, model = _RECORD.unpack_from(self._map, _HEADER.size + position * _RECORD.size)
+        return self.names[make] or None, self.names[model] or None
+
+class _Keys:
+    """Sequence view of the record keys for bisect, read straight from the map"""
+
+    def __init__(self, data, count: int):
+        self._data = data
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, position: int) -> bytes:
+        start = _HEADER.size + position * _RECORD.size
+        return self._data[start:start + _KEY_WIDTH]
+
+def _get_index() -> _Index:
+    """Open (building or rebuilding it if stale) the shared index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            path = index_path()
+            if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(SOURCE_PATH):
+                build_index(SOURCE_PATH, path)
+            _index = _Index(path)
+        return _index
+
+@lru_cache(maxsize=4096)
+def decode(vin: str, hint_year: int = None):
+    """
+    Decode a VIN
+
+    Args:
+        vin (str): The VIN (case and surrounding spaces ignored)
+        hint_year (int): Year the listing claims, to pick the 30-year cycle
+
+    Returns:
+        dict: vin, wmi, make, model, year, check_digit_ok and
+        check_digit_required, or None if vin is not a well-formed VIN
+    """
+    if not isinstance(vin, str):
+        return None
+    vin = vin.strip().upper()
+    if not is_well_formed(vin):
+        return None
+    make, model = _get_index().lookup(vin)
+    return {
+        'vin': vin,
+        'wmi': vin[:3],
+        'make': make,
+        'model': model,
+        'year': model_year(vin, hint_year),
+        'check_digit_ok': vin[8] == check_digit(vin),
+        'check_digit_required': check_digit_required(vin),
+    }
+
+@lru_cache(maxsize=4096)
+def _assess(vin: str):
+    """
+    What a 17-character run says on its own
+
+    Returns:
+        tuple: (plausible without a label, plausible with one, check digit ok, make)
+    """
+    if vin.isdigit() or vin.isalpha() or sum(char.isdigit() for char in vin) < 3:
+        return False, False, False, None
+    check_ok = vin[8] == check_digit(vin)
+    make = _get_index().lookup(vin)[0]
+    if check_digit_required(vin):
+        # Mandatory check digit, model year code and numeric serial tail
+        plausible = check_ok and vin[9] in YEAR_CODES and vin[-3:].isdigit()
+        return plausible, plausible, check_ok, make
+    # No check digit to lean on: a known manufacturer, or a VIN label right before it
+    return make is not None, True, check_ok, make
+
+def find_vins(text: str) -> list:
+    """
+    All plausible VINs in a page's text, best first
+
+    Labels ("VIN", "Chassis No.", ...) and 17-character runs are collected in
+    one regex scan. Runs that fail the check digit where it is mandatory, or
+    that look like IDs (all digits, hardly any digits, unknown maker with no
+    label), are dropped. The rest are ranked by check digit, known maker and
+    how close a VIN label precedes them.
+
+    Args:
+        text (str): Page text (e.g. soup.get_text())
+
+    Returns:
+        list: One dict per distinct VIN: vin, position, label_distance (None
+        without a label before it), check_digit_ok, make, score, confidence
+    """
+    found = {}
+    label_end = None
+    for match in _VIN_SCAN.finditer(text or ''):
+        if match.group('label'):
+            label_end = match.end()
+            continue
+        vin = match.group('vin')
+        distance = match.start() - label_end if label_end is not None else None
+        near = distance is not None and distance <= LABEL_NEAR
+        plausible, plausible_near_label, check_ok, make = _assess(vin)
+        if not (plausible_near_label if near else plausible):
+            continue
+        score = (2 if check_ok else 0) + (1 if make else 0)
+        if near:
+            score += 3
+        elif distance is not None and distance <= LABEL_FAR:
+            score += 1
+        if vin in found and found[vin]['score'] >= score:
+            continue
+        if near and check_ok:
+            confidence = 0.9
+        elif check_ok or near:
+            confidence = 0.7
+        else:
+            confidence = 0.5
+        found[vin] = {
+            'vin': vin,
+            'position': match.start(),
+            'label_distance': distance,
+            'check_digit_ok': check_ok,
+            'make': make,
+            'score': score,
+            'confidence': confidence,
+        }
+    return sorted(found.values(), key=lambda candidate: (
+        -candidate['score'],
+        candidate['label_distance'] if candidate['label_distance'] is not None else float('inf'),
+        candidate['position'],
+    ))
+
+def extract_vin(text: str):
+    """The best VIN candidate in text (see find_vins), or None"""
+    candidates = find_vins(text)
+    return candidates[0] if candidates else None
+
+def _same_make(scraped: str, decoded: str) -> bool:
+    scraped = provenance.field_key(scraped)
+    return MAKE_ALIASES.get(scraped, scraped) == provenance.field_key(decoded)
+
+def apply(car_data: dict, sources=None) -> dict:
+    """
+    Fill or correct Year, Make (Brand on cars.com) and Model from the VIN
+
+    Missing fields are filled (Year only from VINs that must encode it). A
+    make that contradicts the VIN (title guesses like "Used", or "Land" for
+    Land Rover) is replaced and the model is cut to what follows the real
+    make. A VIN whose mandatory check digit is wrong is ignored.
+
+    Args:
+        car_data (dict): Scraped fields, changed in place
+        sources (provenance.Sources): Notes the fields the VIN filled
+
+    Returns:
+        dict: car_data
+    """
+    vin = car_data.get('VIN')
+    if not provenance.is_filled(vin):
+        return car_data
+    year = car_data.get('Year')
+    hint = int(year) if isinstance(year, str) and year.isdigit() else None
+    decoded = decode(vin, hint)
+    if decoded is None or (decoded['check_digit_required'] and not decoded['check_digit_ok']):
+        return car_data
+    confidence = 0.95 if decoded['check_digit_ok'] else 0.8
+
+    def set_field(field, value):
+        car_data[field] = value
+        if sources is not None:
+            sources.found(field, 'vin', confidence)
+
+    # Position 10 is only mandated to be the model year where the check digit is
+    if decoded['year'] and decoded['check_digit_required'] and not provenance.is_filled(year):
+        set_field('Year', str(decoded['year']))
+
+    make_key = 'Brand' if 'Brand' in car_data else 'Make'
+    make = car_data.get(make_key)
+    if decoded['make'] and not (provenance.is_filled(make) and _same_make(make, decoded['make'])):
+        model = car_data.get('Model')
+        if provenance.is_filled(make) and provenance.is_filled(model):
+            # Title guesses split the make wrongly: Brand "Used" + Model "Toyota Camry",
+            # or Make "Land" + Model "Rover Discovery"; keep only what follows the real make
+            make_words = len(decoded['make'].replace('-', ' ').split())
+            for words in (model.split(), f"{make} {model}".split()):
+                if len(words) > make_words and _same_make(' '.join(words[:make_words]), decoded['make']):
+                    set_field('Model', ' '.join(words[make_words:]))
+                    break
+                if len(words) == make_words and _same_make(' '.join(words), decoded['make']) \
+                        and provenance.is_filled(car_data.get('Variant')):
+                    # The whole guessed model was the rest of the make: the variant holds the model
+                    set_field('Model', car_data['Variant'])
+                    car_data['Variant'] = 'N/A'
+                    break
+        set_field(make_key, decoded['make'])
+        if 'MakeId' in car_data:
+            car_data['MakeId'] = title_parser.slug(decoded['make'])
+            car_data['ModelId'] = 'N/A'
+
+    if decoded['model'] and not provenance.is_filled(car_data.get('Model')):
+        set_field('Model', decoded['model'])
+    return car_data
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decode VINs offline")
+    parser.add_argument('vins', nargs='*', help="VINs to decode")
+    parser.add_argument('--build', action='store_true', help="Rebuild the lookup index from the .tsv")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        path = build_index()
+        print(f"✅ Built {path}")
+    for vin in args.vins:
+        decoded = decode(vin)
+        if decoded is None:
+            print(f"❌ {vin}: not a VIN")
+            continue
+        status = "✅" if decoded['check_digit_ok'] else ("❌" if decoded['check_digit_required'] else "⚠️")
+        print(f"{status} {decoded['vin']}: {decoded['year']} {decoded['make'] or '?'} {decoded['model'] or ''}".rstrip())
+
+if __name__ == "__main__":
+    main()
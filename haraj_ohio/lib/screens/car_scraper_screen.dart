@@ -228,7 +228,9 @@ class _CarScraperState extends State<CarScraper> {
 
     // Contact and VIN
     _dealerController.text = scrapedData['Dealer']?.toString() ?? '';
-    _vinController.text = scrapedData['VIN']?.toString() ?? '';
+    // Scrapers report a missing VIN as "N/A"; leave the field empty instead
+    final vinStr = scrapedData['VIN']?.toString().trim() ?? '';
+    _vinController.text = vinStr.toUpperCase() == 'N/A' ? '' : vinStr;
 
     setState(() {});
   }
@@ -391,7 +393,7 @@ class _CarScraperState extends State<CarScraper> {
         mainImage: mainImageUrl,
         otherImages: otherImageUrls.isNotEmpty ? otherImageUrls : null,
         contact: dealer.isNotEmpty ? dealer : 'Contact seller',
-        vin: vin.isNotEmpty ? vin : null,
+        vin: vin.isNotEmpty && vin.toUpperCase() != 'N/A' ? vin : null,
         status: _selectedStatus,
         createdAt: DateTime.now(),
         updatedAt: DateTime.now(),
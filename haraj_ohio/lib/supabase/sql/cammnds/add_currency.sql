@@ -0,0 +1,11 @@
+-- =============================================
+-- ADD PRICE CURRENCY
+-- =============================================
+-- Imported listings come priced in different currencies (cars.com and
+-- Carfax in USD, Manheim in AUD); this column records which one a row's
+-- price is in. The bulk importer (car_scarper/scrapers/supabase_sink.py)
+-- writes it, and writes mileage in km.
+-- Run this in your Supabase SQL Editor
+
+-- ISO currency code of price (NULL for cars added in the app)
+ALTER TABLE cars ADD COLUMN IF NOT EXISTS currency TEXT;
@@ -0,0 +1,22 @@
+-- =============================================
+-- ADD UPSERT KEYS FOR BULK IMPORTS
+-- =============================================
+-- This script adds the columns and unique indexes the bulk importer
+-- (car_scarper/scrapers/supabase_sink.py) upserts on:
+--   - vin: one row per VIN
+--   - source_url: one row per listing URL, for listings without a VIN
+-- Run this in your Supabase SQL Editor
+
+-- Canonical URL of the listing a car was imported from (NULL for cars added in the app)
+ALTER TABLE cars ADD COLUMN IF NOT EXISTS source_url TEXT;
+
+-- Empty and placeholder VINs ('', 'N/A', anything that is not 17 characters)
+-- would collide with each other, store them as NULL
+UPDATE cars SET vin = NULL WHERE vin IS NOT NULL AND length(btrim(vin)) <> 17;
+
+-- Check for existing duplicate VINs before creating the index:
+-- SELECT vin, COUNT(*) FROM cars WHERE vin IS NOT NULL GROUP BY vin HAVING COUNT(*) > 1;
+
+-- Unique indexes (NULLs never conflict, so cars without VIN/URL are unaffected)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cars_vin_unique ON cars(vin);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cars_source_url_unique ON cars(source_url);
@@ -14,6 +14,7 @@ CREATE TABLE IF NOT EXISTS cars (
     car_id UUID DEFAULT gen_random_uuid() UNIQUE NOT NULL,
     description TEXT,
     price NUMERIC NOT NULL,
+    currency TEXT,
     brand TEXT NOT NULL,
     model TEXT NOT NULL,
     year INTEGER NOT NULL,
@@ -31,6 +32,7 @@ CREATE TABLE IF NOT EXISTS cars (
     other_images TEXT[],
     contact TEXT NOT NULL,
     vin TEXT,
+    source_url TEXT,
     show_at TIMESTAMP WITH TIME ZONE,
     un_show_at TIMESTAMP WITH TIME ZONE,
     auction_start_at TIMESTAMP WITH TIME ZONE,
@@ -107,6 +109,10 @@ CREATE INDEX IF NOT EXISTS idx_cars_model ON cars(model);
 CREATE INDEX IF NOT EXISTS idx_cars_year ON cars(year);
 CREATE INDEX IF NOT EXISTS idx_cars_status ON cars(status);
 
+-- Upsert keys for bulk imports (car_scarper/scrapers/supabase_sink.py)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cars_vin_unique ON cars(vin);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_cars_source_url_unique ON cars(source_url);
+
 -- Brands table indexes
 CREATE INDEX IF NOT EXISTS idx_brands_name ON brands(name);
 